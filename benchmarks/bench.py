@@ -0,0 +1,282 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from benchmarks.generate import generate_lot
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SHAPE = {'parts': 2000, 'sites': 4, 'ptr_tests': 50, 'mpr_tests': 5, 'ftr_tests': 5, 'mpr_pins': 8,
+         'text_len': 16, 'limits': 'first'}
+TOLERANCE = 0.25
+# peak RSS differences below this many MB are noise from the interpreter and imports
+RSS_SLACK_MB = 16
+
+
+# Every case prepares its input untimed and returns the timed part, a callable that
+# returns (records, bytes) handled.
+
+def case_read(stdf_file, mode):
+    from stdf.stdf_reader import Reader
+
+    def run():
+        rd = Reader()
+        rd.load_stdf_file(stdf_file, mode=mode)
+        return sum(1 for _ in rd), os.path.getsize(stdf_file)
+    return run
+
+
+def case_read_memory(stdf_file):
+    return case_read(stdf_file, 'memory')
+
+
+def case_read_mmap(stdf_file):
+    return case_read(stdf_file, 'mmap')
+
+
+def case_read_stream(stdf_file):
+    return case_read(stdf_file, 'stream')
+
+
+def case_read_selected(stdf_file):
+    from stdf.stdf_reader import Reader
+
+    def run():
+        rd = Reader(records=['PTR'], fields={'PTR': ['TEST_NUM', 'SITE_NUM', 'RESULT']})
+        rd.load_stdf_file(stdf_file, mode='mmap')
+        return sum(1 for _ in rd), os.path.getsize(stdf_file)
+    return run
+
+
+def case_read_lazy(stdf_file):
+    from stdf.stdf_reader import Reader
+
+    def run():
+        rd = Reader(lazy=True)
+        rd.load_stdf_file(stdf_file, mode='mmap')
+        n = 0
+        for rec_name, header, body in rd:
+            if rec_name == 'PTR':
+                body['RESULT']
+            n += 1
+        return n, os.path.getsize(stdf_file)
+    return run
+
+
+def case_to_arrays(stdf_file):
+    from stdf.stdf_reader import Reader
+
+    def run():
+        rd = Reader()
+        rd.load_stdf_file(stdf_file, mode='mmap')
+        arrays = rd.to_arrays(rec_names=('PTR', 'MPR', 'FTR'))
+        return sum(len(columns['TEST_NUM']) for columns in arrays.values()), os.path.getsize(stdf_file)
+    return run
+
+
+def case_census(stdf_file):
+    from stdf.stdf_census import census
+
+    def run():
+        return sum(census(stdf_file)['records'].values()), os.path.getsize(stdf_file)
+    return run
+
+
+def case_pack_record(stdf_file):
+    from stdf.stdf_reader import Reader
+    from stdf.stdf_writer import Writer
+
+    rd = Reader()
+    rd.load_stdf_file(stdf_file)
+    records = [(rec_name, body) for rec_name, header, body in rd if rec_name != 'FAR']
+
+    def run():
+        pack = Writer().pack_record
+        return len(records), sum(len(pack(rec_name, body)) for rec_name, body in records)
+    return run
+
+
+def case_pack_records(stdf_file):
+    from stdf.stdf_reader import Reader
+    from stdf.stdf_writer import Writer
+
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    columns = rd.to_arrays(rec_names=('PTR',), fields={'PTR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG',
+                                                               'PARM_FLG', 'RESULT', 'TEST_TXT']})['PTR']
+
+    def run():
+        data = Writer().pack_records('PTR', columns)
+        return len(columns['TEST_NUM']), len(data)
+    return run
+
+
+def case_pack_fixed_records(stdf_file):
+    from stdf.stdf_reader import Reader
+    from stdf.stdf_writer import Writer
+
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    columns = rd.to_arrays(rec_names=('PTR',), fields={'PTR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG',
+                                                               'PARM_FLG', 'RESULT']})['PTR']
+
+    def run():
+        data = Writer().pack_records('PTR', columns)
+        return len(columns['TEST_NUM']), len(data)
+    return run
+
+
+def case_rewrite(stdf_file):
+    from stdf.stdf_reader import Reader
+    from stdf.stdf_writer import RecordSink
+
+    def run():
+        rd = Reader()
+        rd.load_stdf_file(stdf_file, mode='mmap')
+        with RecordSink(io.BytesIO()) as sink:
+            sink.write_records(rd)
+            sink.flush()
+            return sink.records, sink.bytes
+    return run
+
+
+CASES = {name[len('case_'):]: func for name, func in sorted(globals().items()) if name.startswith('case_')}
+del CASES['read']
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / (1 << 10)
+
+
+def _run_case(name, stdf_file, repeat):
+    run = CASES[name](stdf_file)
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        records, n_bytes = run()
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    return {'records': records, 'bytes': n_bytes, 'seconds': round(best, 4),
+            'records_per_s': round(records / best), 'mb_per_s': round(n_bytes / best / 1e6, 2),
+            'peak_rss_mb': _peak_rss_mb()}
+
+
+def run_benchmarks(stdf_file, cases=None, repeat=5):
+    # every case runs in a fresh process, so that its peak RSS is its own
+    results = {}
+    for name in cases or CASES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results[name] = executor.submit(_run_case, name, stdf_file, repeat).result()
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # -> messages for every case slower, or using more memory, than its baseline allows
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['records_per_s'] < base['records_per_s'] * (1 - tolerance):
+            regressions.append('{}: {} records/s, baseline {}'.format(
+                name, result['records_per_s'], base['records_per_s']))
+        if result['peak_rss_mb'] is not None and base['peak_rss_mb'] is not None and \
+                result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance) + RSS_SLACK_MB:
+            regressions.append('{}: peak RSS {:.0f} MB, baseline {:.0f} MB'.format(
+                name, result['peak_rss_mb'], base['peak_rss_mb']))
+    return regressions
+
+
+def print_results(results, baseline):
+    print('{:<20}{:>12}{:>14}{:>10}{:>10}{:>10}'.format('case', 'records', 'records/s', 'MB/s', 'RSS MB', 'change'))
+    for name, r in results.items():
+        base = baseline.get(name)
+        change = '{:+.0%}'.format(r['records_per_s'] / base['records_per_s'] - 1) if base else ''
+        print('{:<20}{:>12}{:>14}{:>10}{:>10.0f}{:>10}'.format(
+            name, r['records'], r['records_per_s'], r['mb_per_s'], r['peak_rss_mb'] or 0, change))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Reader and Writer throughput on a synthetic lot.')
+    parser.add_argument('cases', nargs='*', choices=[[]] + list(CASES), help='cases to run (default: all)')
+    parser.add_argument('--stdf-file', help='benchmark this file instead of a synthetic lot')
+    parser.add_argument('--big-endian', action='store_true', help='write the synthetic lot big-endian')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case, the fastest counts')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown as a fraction of the baseline')
+    for key, value in SHAPE.items():
+        parser.add_argument('--' + key.replace('_', '-'), type=type(value), default=value)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    shape = {key: getattr(args, key) for key in SHAPE}
+    shape['endian'] = '>' if args.big_endian else '<'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stdf_file = args.stdf_file
+        if stdf_file is None:
+            stdf_file = os.path.join(tmp, 'synthetic.stdf')
+            generate_lot(stdf_file, **shape)
+        results = run_benchmarks(stdf_file, args.cases, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            saved = json.load(fp)
+        if args.stdf_file is None and saved['shape'] == shape:
+            baseline = saved['results']
+        else:
+            print('baseline {} is of another lot, not comparing'.format(args.baseline))
+
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, mode='w') as fp:
+            json.dump({'shape': shape, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, fp, indent=1)
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print('REGRESSION ' + message)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
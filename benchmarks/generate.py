@@ -0,0 +1,162 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import sys
+import argparse
+
+import numpy as np
+
+from stdf.stdf_writer import Writer, RecordSink
+
+# fields of the first PTR/MPR of a test, which later records may leave out (see stdf_defaults)
+PTR_LIMITS = {'ALARM_ID': '', 'OPT_FLAG': 0x0C, 'RES_SCAL': 0, 'LLM_SCAL': 0, 'HLM_SCAL': 0,
+              'LO_LIMIT': -3.0, 'HI_LIMIT': 3.0, 'UNITS': 'V', 'C_RESFMT': '', 'C_LLMFMT': '',
+              'C_HLMFMT': '', 'LO_SPEC': 0.0, 'HI_SPEC': 0.0}
+MPR_LIMITS = {'ALARM_ID': '', 'OPT_FLAG': 0x0C, 'RES_SCAL': 0, 'LLM_SCAL': 0, 'HLM_SCAL': 0,
+              'LO_LIMIT': -3.0, 'HI_LIMIT': 3.0, 'START_IN': 0.0, 'INCR_IN': 0.0}
+FTR_FIXED = {'OPT_FLAG': 0xFF, 'CYCL_CNT': 0, 'REL_VADR': 0, 'REPT_CNT': 0, 'NUM_FAIL': 0, 'XFAIL_AD': 0,
+             'YFAIL_AD': 0, 'VECT_OFF': 0, 'RTN_ICNT': 0, 'PGM_ICNT': 0}
+LIMITS = 3.0
+
+
+def generate_lot(stdf_file, parts=1000, sites=4, ptr_tests=100, mpr_tests=0, ftr_tests=0, mpr_pins=8,
+                 text_len=16, endian='<', limits='first', seed=0):
+    # Writes a synthetic lot: MIR, then per touchdown of `sites` parts a PIR per site, every
+    # PTR, MPR and FTR of the test program for all sites, and a PRR per site, then TSR, HBR,
+    # SBR, PCR and MRR. Test results are normal(0, 1) and a part fails when one is outside
+    # +-LIMITS. limits='first' writes the limits, units and scaling with the first record of
+    # each test only, like most testers, limits='all' with every record. -> record counts
+    rng = np.random.default_rng(seed)
+    w = Writer()
+    w.e = endian
+    counts = dict.fromkeys(('MIR', 'PIR', 'PTR', 'MPR', 'FTR', 'PRR', 'TSR', 'HBR', 'SBR', 'PCR', 'MRR'), 0)
+    text = 'x' * text_len
+    ptr_nums = np.arange(1000, 1000 + ptr_tests, dtype=np.uint32)
+    mpr_nums = np.arange(2000, 2000 + mpr_tests, dtype=np.uint32)
+    ftr_nums = np.arange(3000, 3000 + ftr_tests, dtype=np.uint32)
+    exec_cnt = np.zeros(ptr_tests + mpr_tests + ftr_tests, dtype=np.int64)
+    fail_cnt = np.zeros_like(exec_cnt)
+    good = 0
+
+    with RecordSink(stdf_file, w) as sink:
+        def write(rec_name, columns):
+            if len(next(v for v in columns.values() if isinstance(v, np.ndarray))):
+                sink.write_columns(rec_name, columns)
+                counts[rec_name] += len(next(v for v in columns.values() if isinstance(v, np.ndarray)))
+
+        sink.write('MIR', {'SETUP_T': 1, 'START_T': 2, 'STAT_NUM': 1, 'MODE_COD': b'P', 'RTST_COD': b' ',
+                           'PROT_COD': b' ', 'BURN_TIM': 65535, 'CMOD_COD': b' ', 'LOT_ID': 'LOT0001',
+                           'PART_TYP': 'SYNTH', 'NODE_NAM': 'node', 'TSTR_TYP': 'synthetic',
+                           'JOB_NAM': 'bench', 'JOB_REV': '1'})
+        counts['MIR'] += 1
+
+        for first in range(0, parts, sites):
+            n_sites = min(sites, parts - first)
+            site_ids = np.arange(n_sites, dtype=np.uint8)
+            full = limits == 'all' or first == 0
+            write('PIR', {'HEAD_NUM': 1, 'SITE_NUM': site_ids})
+
+            test_site = {'HEAD_NUM': 1, 'SITE_NUM': np.tile(site_ids, ptr_tests),
+                         'TEST_NUM': np.repeat(ptr_nums, n_sites)}
+            results = rng.standard_normal(ptr_tests * n_sites).astype(np.float32)
+            failed = np.abs(results) > LIMITS
+            ptr = dict(test_site, TEST_FLG=np.where(failed, 0x80, 0).astype(np.uint8), PARM_FLG=0,
+                       RESULT=results, TEST_TXT=text)
+            if full:
+                ptr.update(PTR_LIMITS)
+            write('PTR', ptr)
+            part_failed = failed.reshape(ptr_tests, n_sites).any(axis=0)
+            exec_cnt[:ptr_tests] += n_sites
+            fail_cnt[:ptr_tests] += failed.reshape(ptr_tests, n_sites).sum(axis=1)
+
+            n = mpr_tests * n_sites
+            results = rng.standard_normal((n, mpr_pins)).astype(np.float32)
+            failed = (np.abs(results) > LIMITS).any(axis=1)
+            mpr = {'TEST_NUM': np.repeat(mpr_nums, n_sites), 'HEAD_NUM': 1, 'SITE_NUM': np.tile(site_ids, mpr_tests),
+                   'TEST_FLG': np.where(failed, 0x80, 0).astype(np.uint8), 'PARM_FLG': 0,
+                   'RTN_ICNT': mpr_pins, 'RSLT_CNT': mpr_pins, 'RTN_STAT': [[0] * mpr_pins] * n,
+                   'RTN_RSLT': list(results), 'TEST_TXT': text}
+            if full:
+                mpr.update(MPR_LIMITS, RTN_INDX=list(range(1, mpr_pins + 1)), UNITS='V', UNITS_IN='',
+                           C_RESFMT='', C_LLMFMT='', C_HLMFMT='', LO_SPEC=0.0, HI_SPEC=0.0)
+                mpr['RTN_INDX'] = [mpr['RTN_INDX']] * n
+            write('MPR', mpr)
+            if mpr_tests:
+                part_failed |= failed.reshape(mpr_tests, n_sites).any(axis=0)
+                exec_cnt[ptr_tests:ptr_tests + mpr_tests] += n_sites
+                fail_cnt[ptr_tests:ptr_tests + mpr_tests] += failed.reshape(mpr_tests, n_sites).sum(axis=1)
+
+            n = ftr_tests * n_sites
+            ftr = dict(FTR_FIXED, TEST_NUM=np.repeat(ftr_nums, n_sites), HEAD_NUM=1,
+                       SITE_NUM=np.tile(site_ids, ftr_tests), TEST_FLG=0, RTN_INDX=[[]] * n, RTN_STAT=[[]] * n,
+                       PGM_INDX=[[]] * n, PGM_STAT=[[]] * n, FAIL_PIN=0, VECT_NAM='', TIME_SET='',
+                       OP_CODE='', TEST_TXT=text)
+            write('FTR', ftr)
+            exec_cnt[ptr_tests + mpr_tests:] += n_sites
+
+            good += int((~part_failed).sum())
+            part_ids = [str(first + i + 1) for i in range(n_sites)]
+            write('PRR', {'HEAD_NUM': 1, 'SITE_NUM': site_ids,
+                          'PART_FLG': np.where(part_failed, 0x08, 0).astype(np.uint8),
+                          'NUM_TEST': ptr_tests + mpr_tests + ftr_tests,
+                          'HARD_BIN': np.where(part_failed, 2, 1).astype(np.uint16),
+                          'SOFT_BIN': np.where(part_failed, 2, 1).astype(np.uint16),
+                          'X_COORD': np.arange(first, first + n_sites, dtype=np.int16), 'Y_COORD': 0,
+                          'TEST_T': 100, 'PART_ID': part_ids})
+
+        test_nums = np.concatenate([ptr_nums, mpr_nums, ftr_nums])
+        test_typ = [b'P'] * ptr_tests + [b'M'] * mpr_tests + [b'F'] * ftr_tests
+        write('TSR', {'HEAD_NUM': 255, 'SITE_NUM': 0, 'TEST_TYP': test_typ, 'TEST_NUM': test_nums,
+                      'EXEC_CNT': exec_cnt.astype(np.uint32), 'FAIL_CNT': fail_cnt.astype(np.uint32),
+                      'ALRM_CNT': 0, 'TEST_NAM': text})
+        for rec_name, prefix in (('HBR', 'HBIN_'), ('SBR', 'SBIN_')):
+            write(rec_name, {'HEAD_NUM': 255, 'SITE_NUM': 0, prefix + 'NUM': np.array([1, 2], dtype=np.uint16),
+                             prefix + 'CNT': np.array([good, parts - good], dtype=np.uint32),
+                             prefix + 'PF': [b'P', b'F'], prefix + 'NAM': ['pass', 'fail']})
+        sink.write('PCR', {'HEAD_NUM': 255, 'SITE_NUM': 0, 'PART_CNT': parts, 'RTST_CNT': 0, 'ABRT_CNT': 0,
+                           'GOOD_CNT': good, 'FUNC_CNT': 0})
+        sink.write('MRR', {'FINISH_T': 3, 'DISP_COD': b' ', 'USR_DESC': '', 'EXC_DESC': ''})
+        counts['PCR'] += 1
+        counts['MRR'] += 1
+
+    return counts
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Write a synthetic STDF lot.')
+    parser.add_argument('stdf_file')
+    parser.add_argument('--parts', type=int, default=1000)
+    parser.add_argument('--sites', type=int, default=4)
+    parser.add_argument('--ptr', type=int, default=100, help='PTR tests per part')
+    parser.add_argument('--mpr', type=int, default=0, help='MPR tests per part')
+    parser.add_argument('--ftr', type=int, default=0, help='FTR tests per part')
+    parser.add_argument('--mpr-pins', type=int, default=8)
+    parser.add_argument('--text-len', type=int, default=16, help='length of TEST_TXT')
+    parser.add_argument('--big-endian', action='store_true')
+    parser.add_argument('--limits', choices=('first', 'all'), default='first')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    counts = generate_lot(args.stdf_file, args.parts, args.sites, args.ptr, args.mpr, args.ftr, args.mpr_pins,
+                          args.text_len, '>' if args.big_endian else '<', args.limits)
+    print(counts)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
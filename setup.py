@@ -81,10 +81,11 @@ setup(
     # dependencies). You can install these using the following syntax,
     # for example:
     # $ pip install -e .[dev,test]
-    # extras_require={
-    #     'dev': ['check-manifest'],
-    #     'test': ['coverage'],
-    # },
+    extras_require={
+        'numpy': ['numpy'],
+        'pandas': ['numpy', 'pandas'],
+        'parquet': ['pyarrow'],
+    },
 
     # If there are data files included in your packages that need to be
     # installed, specify them here.  If using Python 2.6 or less, then these
@@ -105,7 +106,7 @@ setup(
     # pip to create the appropriate form of executable for the target platform.
     entry_points={
         'console_scripts': [
-            'stdf=stdf_reader:Reader',
+            'stdf=stdf.stdf_cli:main',
         ],
     },
 )
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import json
+import glob
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from stdf.stdf_reader import Reader
+from stdf.stdf_schema import get_schema
+
+OUTPUTS = ('summary', 'arrays')
+STDF_PATTERNS = tuple('*' + suffix + ext for suffix in ('.stdf', '.std') for ext in ('', '.gz', '.bz2', '.xz')) + ('*.zip',)
+
+# fields the per-file summary needs; every other record is only counted
+SUMMARY_FIELDS = {
+    'MIR': ['SETUP_T', 'START_T', 'STAT_NUM', 'LOT_ID', 'PART_TYP', 'NODE_NAM', 'TSTR_TYP', 'JOB_NAM'],
+    'PRR': ['PART_FLG', 'HARD_BIN', 'SOFT_BIN'],
+}
+PART_FAILED = 0x08
+PART_FLG_INVALID = 0x10
+
+log = logging.getLogger('stdf_batch')
+
+_worker_reader = None
+
+
+def find_stdf_files(inputs, patterns=STDF_PATTERNS):
+    # inputs: a directory, a glob pattern, a file, or a list of these -> sorted file names
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in patterns:
+                files.update(glob.glob(os.path.join(item, pattern)))
+        elif os.path.isfile(item):
+            files.add(item)
+        else:
+            files.update(f for f in glob.glob(item, recursive=True) if os.path.isfile(f))
+    return sorted(files)
+
+
+def _init_worker(schema, output):
+    # one Reader per worker process, reused for every file it is given
+    global _worker_reader
+    fields = None
+    if output == 'summary':
+        fields = {rec_name: SUMMARY_FIELDS.get(rec_name, []) for rec_name in schema.stdf_type}
+    _worker_reader = Reader(schema, fields=fields)
+
+
+def _text(value):
+    return value.decode('latin-1') if isinstance(value, bytes) else value
+
+
+def summarize(rd):
+    # record census, MIR identification and part/bin counts of the rest of the loaded file
+    records = Counter()
+    hard_bins, soft_bins = Counter(), Counter()
+    mir = {}
+    parts = good = 0
+
+    for rec_name, header, body in rd:
+        records[rec_name] += 1
+        if rec_name == 'PRR':
+            parts += 1
+            flag = body.get('PART_FLG', 0)
+            if not flag & (PART_FAILED | PART_FLG_INVALID):
+                good += 1
+            hard_bins[body.get('HARD_BIN')] += 1
+            soft_bins[body.get('SOFT_BIN')] += 1
+        elif rec_name == 'MIR':
+            mir = {field: _text(value) for field, value in body.items()}
+
+    return {
+        'records': dict(records),
+        'mir': mir,
+        'parts': parts,
+        'good_parts': good,
+        'hard_bins': {str(k): v for k, v in sorted(hard_bins.items())},
+        'soft_bins': {str(k): v for k, v in sorted(soft_bins.items())},
+    }
+
+
+def _output_file(stdf_file, out_dir, ext):
+    return os.path.join(out_dir, os.path.basename(stdf_file) + ext)
+
+
+def _ingest_file(stdf_file, output, out_dir, rec_names, mode):
+    rd = _worker_reader
+    result = {'file': stdf_file, 'size': 0, 'records': 0, 'seconds': 0.0, 'output': None, 'error': None}
+    t0 = time.perf_counter()
+
+    try:
+        result['size'] = os.path.getsize(stdf_file)
+        rd.load_stdf_file(stdf_file, mode=mode)
+
+        if output == 'summary':
+            summary = summarize(rd)
+            result['records'] = sum(summary['records'].values())
+            result['summary'] = summary
+            if out_dir is not None:
+                result['output'] = _output_file(stdf_file, out_dir, '.json')
+                with open(result['output'], mode='w') as fp:
+                    json.dump(dict(summary, file=stdf_file), fp, indent=1)
+
+        else:
+            from stdf.stdf_columns import require_numpy
+            np = require_numpy()
+            arrays = rd.to_arrays(rec_names)
+            result['records'] = sum(len(next(iter(columns.values()), ())) for columns in arrays.values())
+            if out_dir is not None:
+                result['output'] = _output_file(stdf_file, out_dir, '.npz')
+                np.savez(result['output'], **{'{}.{}'.format(rec_name, field): column
+                                             for rec_name, columns in arrays.items()
+                                             for field, column in columns.items()})
+
+    except Exception as e:
+        result['error'] = '{}: {}'.format(e.__class__.__name__, e)
+
+    finally:
+        rd.close()
+
+    result['seconds'] = time.perf_counter() - t0
+    return result
+
+
+def ingest(inputs, output='summary', out_dir=None, workers=None, stdf_ver_json=None,
+           rec_names=('PTR', 'MPR', 'FTR'), mode='mmap', progress=None):
+    # Processes every STDF file of inputs (see find_stdf_files) over a process pool and
+    # yields one result dict per file as it finishes: file, size, records, seconds,
+    # output (the file written to out_dir, if any), error, and for output='summary' the
+    # summary itself. output='arrays' writes the to_arrays() columns of rec_names as .npz.
+    # The record definition is compiled once here and handed to the workers as a Schema.
+    # progress(result, done, total) is called after every file.
+    if output not in OUTPUTS:
+        raise ValueError('output must be one of {}, not {!r}'.format(OUTPUTS, output))
+
+    files = find_stdf_files(inputs)
+    schema = get_schema(stdf_ver_json)
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    log.info('ingesting {} files'.format(len(files)))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(schema, output)) as executor:
+        futures = [executor.submit(_ingest_file, f, output, out_dir, rec_names, mode) for f in files]
+
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result['error']:
+                log.error('{}: {}'.format(result['file'], result['error']))
+            else:
+                seconds = result['seconds'] or float('inf')
+                log.info('{}: {} records in {:.3f}s, {:.0f} rec/s, {:.1f} MB/s'.format(
+                    result['file'], result['records'], result['seconds'],
+                    result['records'] / seconds, result['size'] / seconds / 1e6))
+            if progress is not None:
+                progress(result, done, len(files))
+            yield result
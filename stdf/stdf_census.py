@@ -0,0 +1,215 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import io
+import os
+import mmap
+import struct
+import logging
+from collections import Counter
+
+from stdf.stdf_reader import Reader
+from stdf.stdf_decoder import decode
+from stdf.stdf_compression import detect_compression, open_decompressed, ThreadedDecompressor
+
+# REC_LEN and REC_TYP/REC_SUB read as one u2 key, which saves building a tuple per record
+HEADER = {e: struct.Struct(e + 'HH') for e in '<>'}
+PIR_TYP_SUB = (5, 10)
+PRR_TYP_SUB = (5, 20)
+# records whose body the census decodes in full; every other body is skipped unread
+# except for the head, site and PART_FLG bytes of PIR/PRR
+DECODED_RECORDS = ('MIR', 'WIR', 'MRR')
+# PRR PART_FLG bits: part failed, pass/fail flag invalid
+PART_FAILED = 0x08
+PART_FLG_INVALID = 0x10
+
+log = logging.getLogger('stdf_census')
+
+
+class Census:
+    # Tally of one header scan; only the bodies of FAR, PIR, PRR and DECODED_RECORDS
+    # are handed to add_body()
+
+    def __init__(self, stdf_file, rd):
+        self.stdf_file = stdf_file
+        self.rd = rd
+        self.decoded = {(rd.STDF_TYPE[rec_name]['rec_typ'], rd.STDF_TYPE[rec_name]['rec_sub']): rec_name
+                        for rec_name in DECODED_RECORDS}
+        wanted = set(self.decoded) | {PIR_TYP_SUB, PRR_TYP_SUB, Reader.FAR_TYP_SUB}
+        self.wanted = {e: {header_key(typ_sub, e) for typ_sub in wanted} for e in '<>'}
+        # a big-endian FAR header before its CPU_TYPE is known
+        self.far_swapped = header_key(Reader.FAR_TYP_SUB, '<')
+
+        self.e = '<'
+        self.counts = {e: Counter() for e in '<>'}
+        self.sites = set()
+        self.wafers = []
+        self.bodies = {}
+        self.parts = self.good_parts = 0
+        self.truncated = False
+        self.end_offset = 0
+
+    def add_body(self, key, body):
+        # -> byte order of the headers that follow
+        typ_sub = typ_sub_of(key, self.e)
+        if typ_sub == PIR_TYP_SUB:
+            self.sites.add((body[0], body[1]))
+        elif typ_sub == PRR_TYP_SUB:
+            self.parts += 1
+            if len(body) > 2 and not body[2] & (PART_FAILED | PART_FLG_INVALID):
+                self.good_parts += 1
+        elif typ_sub == Reader.FAR_TYP_SUB:
+            self.e = '>' if body[0] == 1 else '<'
+        else:
+            rec_name = self.decoded[typ_sub]
+            values = decode(self.rd.PLANS[self.e][rec_name], body, self.e)
+            if rec_name == 'WIR':
+                self.wafers.append(_text(values.get('WAFER_ID')))
+            else:
+                self.bodies[rec_name] = values
+        return self.e
+
+    def scan_buffer(self, buf):
+        # plain files: headers unpacked in place from the mapped file
+        size = len(buf)
+        add_body, far_swapped = self.add_body, self.far_swapped
+        e = self.e
+        unpack, counts, wanted = HEADER[e].unpack_from, self.counts[e], self.wanted[e]
+        pos = 0
+
+        while pos + Reader.HEADER_SIZE <= size:
+            rec_len, key = unpack(buf, pos)
+            start = pos + Reader.HEADER_SIZE
+            if key in wanted:
+                if key == far_swapped and rec_len == Reader.FAR_SWAPPED_HEADER[0]:
+                    rec_len = Reader.FAR_HEADER[0]
+                if start + rec_len > size:
+                    break
+                counts[key] += 1
+                e = add_body(key, buf[start:start + rec_len])
+                unpack, counts, wanted = HEADER[e].unpack_from, self.counts[e], self.wanted[e]
+            elif start + rec_len > size:
+                break
+            else:
+                counts[key] += 1
+            pos = start + rec_len
+
+        self.truncated = pos < size
+        self.end_offset = pos
+
+    def scan_stream(self, fp):
+        # compressed files: bodies that are not needed are skipped by a forward seek
+        read, seek = fp.read, fp.seek
+        add_body, far_swapped = self.add_body, self.far_swapped
+        e = self.e
+        unpack, counts, wanted = HEADER[e].unpack, self.counts[e], self.wanted[e]
+        pos = 0
+
+        while True:
+            header = read(Reader.HEADER_SIZE)
+            if len(header) < Reader.HEADER_SIZE:
+                self.truncated = len(header) > 0
+                break
+
+            rec_len, key = unpack(header)
+            if key in wanted:
+                if key == far_swapped and rec_len == Reader.FAR_SWAPPED_HEADER[0]:
+                    rec_len = Reader.FAR_HEADER[0]
+                body = read(rec_len)
+                if len(body) < rec_len:
+                    self.truncated = True
+                    break
+                counts[key] += 1
+                e = add_body(key, body)
+                unpack, counts, wanted = HEADER[e].unpack, self.counts[e], self.wanted[e]
+            elif seek(rec_len, io.SEEK_CUR) < pos + Reader.HEADER_SIZE + rec_len:
+                self.truncated = True
+                break
+            else:
+                counts[key] += 1
+            pos += Reader.HEADER_SIZE + rec_len
+
+        self.end_offset = pos
+
+    def record_counts(self):
+        # -> {(rec_typ, rec_sub): count}
+        counts = Counter()
+        for e, by_key in self.counts.items():
+            for key, n in by_key.items():
+                counts[typ_sub_of(key, e)] += n
+        return counts
+
+    def result(self):
+        if self.truncated:
+            log.warning('{} ends inside the record at offset {}'.format(self.stdf_file, self.end_offset))
+
+        mir, mrr = self.bodies.get('MIR', {}), self.bodies.get('MRR', {})
+        return {
+            'file': self.stdf_file,
+            'size': os.path.getsize(self.stdf_file),
+            'endian': 'big' if self.e == '>' else 'little',
+            'records': {self.rd.REC_NAME.get(typ_sub, '{}/{}'.format(*typ_sub)): n
+                        for typ_sub, n in sorted(self.record_counts().items())},
+            'parts': self.parts,
+            'good_parts': self.good_parts,
+            'sites': sorted(self.sites),
+            'wafers': self.wafers,
+            'lot_id': _text(mir.get('LOT_ID')),
+            'part_typ': _text(mir.get('PART_TYP')),
+            'job_nam': _text(mir.get('JOB_NAM')),
+            'start_t': mir.get('START_T'),
+            'finish_t': mrr.get('FINISH_T'),
+            'truncated': self.truncated,
+            'complete': 'MRR' in self.bodies and not self.truncated,
+            'end_offset': self.end_offset,
+        }
+
+
+def census(stdf_file, stdf_ver_json=None):
+    # One pass over the record headers of stdf_file, plain or compressed: record counts,
+    # parts and good parts, head/site pairs, wafers, lot and whether the file ends early.
+    tally = Census(stdf_file, Reader(stdf_ver_json))
+
+    compression = detect_compression(stdf_file) if os.path.getsize(stdf_file) else None
+    if compression is not None:
+        fp = ThreadedDecompressor(open_decompressed(stdf_file, compression))
+        try:
+            tally.scan_stream(fp)
+        finally:
+            fp.close()
+    elif os.path.getsize(stdf_file):
+        with open(stdf_file, mode='rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            tally.scan_buffer(mm)
+
+    return tally.result()
+
+
+def header_key(typ_sub, e):
+    # REC_TYP and REC_SUB as the u2 that the header struct reads them as
+    rec_typ, rec_sub = typ_sub
+    return rec_typ << 8 | rec_sub if e == '>' else rec_sub << 8 | rec_typ
+
+
+def typ_sub_of(key, e):
+    return (key >> 8, key & 0xFF) if e == '>' else (key & 0xFF, key >> 8)
+
+
+def _text(value):
+    # Cn fields decode to bytes, or to 0 when empty
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return None if value is None else ''
@@ -0,0 +1,169 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import sys
+import json
+import argparse
+import logging
+
+from stdf.stdf_census import census
+from stdf.stdf_schema import Schema
+from stdf.stdf_raw import split, merge, filter_file
+from stdf.stdf_patch import Patcher
+
+
+def cmd_census(args):
+    failed = 0
+    for stdf_file in args.stdf_files:
+        result = census(stdf_file, args.stdf_ver_json)
+        failed += result['truncated']
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_census(result)
+    return 1 if failed else 0
+
+
+def cmd_schema(args):
+    schema = Schema.from_json(args.stdf_ver_json)
+    schema.save(args.cache_file)
+    print('{}: {} records'.format(args.cache_file, len(schema.stdf_type)))
+    return 0
+
+
+def cmd_split(args):
+    try:
+        paths = split(args.stdf_file, args.out_dir, by=args.by, overwrite=args.overwrite,
+                      stdf_ver_json=args.stdf_ver_json)
+    except FileExistsError as err:
+        raise SystemExit('{}: {} exists, use --overwrite to replace it'.format(args.stdf_file, err.filename))
+    for path in paths.values():
+        print(path)
+    return 0
+
+
+def cmd_merge(args):
+    n = merge(args.stdf_files, args.output)
+    print('{}: {} records'.format(args.output, n))
+    return 0
+
+
+def cmd_filter(args):
+    n = filter_file(args.stdf_file, args.output, records=args.records, heads=args.heads, sites=args.sites,
+                    stdf_ver_json=args.stdf_ver_json)
+    print('{}: {} records'.format(args.output, n))
+    return 0
+
+
+def cmd_patch(args):
+    with Patcher(args.stdf_file, args.stdf_ver_json) as patcher:
+        values = parse_assignments(patcher, args.rec_name, args.assignments)
+        where = parse_assignments(patcher, args.rec_name, args.where or [])
+        try:
+            n = patcher.patch(args.rec_name, values, where=where, limit=args.limit)
+        except ValueError as err:
+            raise SystemExit('{}: {}'.format(args.stdf_file, err))
+    print('{}: {} {} records patched'.format(args.stdf_file, n, args.rec_name))
+    return 0
+
+
+def parse_assignments(patcher, rec_name, assignments):
+    # ['FIELD=VALUE', ...] -> {field: value}, each value converted for the field's format
+    values = {}
+    for assignment in assignments:
+        field, sep, value = assignment.partition('=')
+        if not sep:
+            raise SystemExit('expected FIELD=VALUE, not {!r}'.format(assignment))
+        try:
+            code = patcher.field_slot(rec_name, field)[1].format[-1]
+            values[field] = float(value) if code in 'fd' else value.encode('latin-1') if code == 'c' else int(value, 0)
+        except ValueError as err:
+            raise SystemExit('{}: {}'.format(assignment, err))
+    return values
+
+
+def print_census(result):
+    print('{file}: {size} bytes, {endian} endian'.format(**result))
+    if result['lot_id'] is not None:
+        print('  lot {lot_id}, part type {part_typ}, job {job_nam}'.format(**result))
+    sites = ', '.join('{}/{}'.format(*head_site) for head_site in result['sites']) or '-'
+    print('  parts {} ({} good), head/sites {}'.format(result['parts'], result['good_parts'], sites))
+    if result['wafers']:
+        print('  wafers {}'.format(', '.join(result['wafers'])))
+    for rec_name, n in result['records'].items():
+        print('  {:<6}{:>10}'.format(rec_name, n))
+    if result['truncated']:
+        print('  truncated: ends inside the record at offset {end_offset}'.format(**result))
+    elif not result['complete']:
+        print('  incomplete: no MRR')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='stdf', description='Tools for STDF v4 files.')
+    parser.add_argument('--stdf-ver-json', default=None, help='record definition json (default: STDF v4)')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('census', help='count records, parts, sites and wafers from the record headers')
+    p.add_argument('stdf_files', nargs='+', metavar='STDF_FILE')
+    p.add_argument('--json', action='store_true', help='one json object per file')
+    p.set_defaults(func=cmd_census)
+
+    p = commands.add_parser('schema', help='compile the record definition into a cache file for fast startup')
+    p.add_argument('cache_file', metavar='CACHE_FILE')
+    p.set_defaults(func=cmd_schema)
+
+    p = commands.add_parser('split', help='split a file per wafer or per head/site, copying records unchanged')
+    p.add_argument('stdf_file', metavar='STDF_FILE')
+    p.add_argument('out_dir', metavar='OUT_DIR')
+    p.add_argument('--by', choices=('wafer', 'site'), default='wafer')
+    p.add_argument('--overwrite', action='store_true', help='replace output files that already exist')
+    p.set_defaults(func=cmd_split)
+
+    p = commands.add_parser('merge', help='concatenate files of the same byte order, copying records unchanged')
+    p.add_argument('stdf_files', nargs='+', metavar='STDF_FILE')
+    p.add_argument('-o', '--output', required=True)
+    p.set_defaults(func=cmd_merge)
+
+    p = commands.add_parser('filter', help='keep records by type, head and site, copying them unchanged')
+    p.add_argument('stdf_file', metavar='STDF_FILE')
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--records', nargs='+', metavar='REC_NAME', help='record types to keep (default: all)')
+    p.add_argument('--heads', nargs='+', type=int, metavar='HEAD_NUM')
+    p.add_argument('--sites', nargs='+', type=int, metavar='SITE_NUM')
+    p.set_defaults(func=cmd_filter)
+
+    p = commands.add_parser('patch', help='overwrite fixed-width fields of records in place')
+    p.add_argument('stdf_file', metavar='STDF_FILE')
+    p.add_argument('rec_name', metavar='REC_NAME')
+    p.add_argument('assignments', nargs='+', metavar='FIELD=VALUE')
+    p.add_argument('--where', nargs='+', metavar='FIELD=VALUE', help='patch only the records with these values')
+    p.add_argument('--limit', type=int, help='stop after this many records, e.g. 1 for MIR')
+    p.set_defaults(func=cmd_patch)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+from stdf.stdf_decoder import OP_FIXED, OP_CN, OP_SN, OP_BN, OP_DN, OP_NIBBLE, OP_ARRAY, OP_VN, \
+    plan_fields, unpack_var, decode_array, decode_vn
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# struct format character -> numpy type code
+NUMPY_CODE = {
+    'B': 'u1',
+    'H': 'u2',
+    'I': 'u4',
+    'Q': 'u8',
+    'b': 'i1',
+    'h': 'i2',
+    'i': 'i4',
+    'q': 'i8',
+    'f': 'f4',
+    'd': 'f8',
+    'c': 'S1',
+}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError('numpy is required for columnar output, install it with: pip install stdf[numpy]')
+    return np
+
+
+def fill_value(dtype):
+    # value used for fields that a record omitted
+    if dtype.kind == 'f':
+        return np.nan
+    elif dtype.kind == 'S':
+        return b''
+    else:
+        return 0
+
+
+class ColumnCollector:
+    # Collects one record type into numpy columns. add() only remembers where each record
+    # body starts and ends; flush() walks the record layout for all bodies of a buffer at
+    # once, advancing a vector of positions over the variable-length fields, and gathers
+    # every requested fixed-width field in one indexing step. Requested variable-length
+    # fields (Cn, arrays, ...) and K arrays of Cn/Bn elements are decoded record by record.
+
+    def __init__(self, rec_name, plans, fields=None):
+        require_numpy()
+        self.rec_name = rec_name
+        self.plans = plans
+        self.fields = self._check_fields(fields)
+
+        self.columns = {field: [] for field in self.fields}
+        self._layouts = {}
+        self._starts = []
+        self._ends = []
+
+    def _check_fields(self, fields):
+        known = plan_fields(self.plans['<'])
+        if fields is None:
+            return [field for step in self.plans['<'] if step[0] == OP_FIXED for field in step[2]]
+
+        unknown = [field for field in fields if field not in known]
+        if unknown:
+            raise ValueError('{} has no field(s) {}'.format(self.rec_name, unknown))
+        return [field for field in known if field in fields]
+
+    def _layout(self, e):
+        layout = self._layouts.get(e)
+        if layout is None:
+            layout = self._layouts[e] = self._compile_layout(self.plans[e], e)
+        return layout
+
+    def _compile_layout(self, plan, e):
+        # -> steps up to the last one holding a requested field, and the numpy dtype of
+        # every fixed-width field as (run index, offset in run, dtype)
+        wanted = set(self.fields)
+        steps, fixed = [], {}
+        last = 0
+
+        for step in plan:
+            op = step[0]
+            if op == OP_FIXED:
+                offset = 0
+                for field, single in step[3]:
+                    fixed.setdefault(field, (len(steps), offset, np.dtype(e + NUMPY_CODE[single.format[-1]])))
+                    offset += single.size
+                steps.append((OP_FIXED, step, offset))
+                if wanted.intersection(step[2]):
+                    last = len(steps)
+
+            else:
+                steps.append((op, step, array_item_size(step) if op == OP_ARRAY else None))
+                if wanted.intersection(step[1:3] if op == OP_NIBBLE else step[1:2]):
+                    last = len(steps)
+
+        return steps[:last], fixed
+
+    def add(self, buf, pos, end, e):
+        self._starts.append(pos)
+        self._ends.append(end)
+
+    def flush(self, buf, e):
+        if not self._ends:
+            return
+
+        steps, fixed = self._layout(e)
+        u8 = np.frombuffer(buf, dtype=np.uint8)
+        pos = np.array(self._starts, dtype=np.int64)
+        ends = np.array(self._ends, dtype=np.int64)
+        wanted = set(self.fields)
+        run_starts = {}
+        values = {}
+
+        for i, (op, step, size) in enumerate(steps):
+            alive = pos < ends
+
+            if op == OP_FIXED:
+                run_starts[i] = np.where(alive, pos, -1)
+                pos = pos + size
+
+            elif op == OP_CN or op == OP_BN:
+                if step[1] in wanted:
+                    values[step[1]], _ = self._decode_each(op, step, buf, pos, alive, e)
+                pos = np.where(alive, pos + 1 + _gather(u8, pos, np.dtype('u1')), pos)
+
+            elif op == OP_SN or op == OP_DN:
+                if step[1] in wanted:
+                    values[step[1]], _ = self._decode_each(op, step, buf, pos, alive, e)
+                n = _gather(u8, pos, np.dtype(e + 'u2')).astype(np.int64)
+                pos = np.where(alive, pos + 2 + (n if op == OP_SN else (n + 7) // 8), pos)
+
+            elif op == OP_NIBBLE:
+                nibble = _gather(u8, pos, np.dtype('u1'))
+                for field, value in ((step[1], nibble & 0xF), (step[2], nibble >> 4)):
+                    if field in wanted:
+                        values[field] = np.where(alive, value, 0)
+                pos = np.where(alive, pos + 1, pos)
+
+            elif op == OP_ARRAY:
+                count = self._count(step, fixed, run_starts, u8, ends)
+                if step[1] in wanted or size is None:
+                    data, pos = self._decode_arrays(step, buf, pos, alive, count, e)
+                    if step[1] in wanted:
+                        values[step[1]] = data
+                elif step[3] == OP_NIBBLE:
+                    pos = np.where(alive, pos + (count + 1) // 2, pos)
+                else:
+                    pos = np.where(alive, pos + count * size, pos)
+
+            else:
+                data, pos = self._decode_each(op, step, buf, pos, alive, e)
+                if step[1] in wanted:
+                    values[step[1]] = data
+
+        for field in self.fields:
+            if field in values:
+                self.columns[field].append(values[field])
+            else:
+                run, offset, dtype = fixed[field]
+                starts = run_starts[run]
+                present = (starts >= 0) & (starts + offset + dtype.itemsize <= ends)
+                column = _gather(u8, starts + offset, dtype).astype(dtype.newbyteorder('='))
+                column[~present] = fill_value(column.dtype)
+                self.columns[field].append(column)
+
+        del u8
+        self._starts, self._ends = [], []
+
+    def _count(self, step, fixed, run_starts, u8, ends):
+        if step[2] is None or step[2] not in fixed:
+            raise ValueError(step[1])
+        run, offset, dtype = fixed[step[2]]
+        starts = run_starts[run]
+        present = (starts >= 0) & (starts + offset + dtype.itemsize <= ends)
+        return np.where(present, _gather(u8, starts + offset, dtype).astype(np.int64), 0)
+
+    def _decode_each(self, op, step, buf, pos, alive, e):
+        # decodes a single variable-length field record by record; records that
+        # ended before it get None
+        column = np.empty(len(pos), dtype=object)
+        ends = pos.copy()
+        for i in np.flatnonzero(alive):
+            p = int(pos[i])
+            if op == OP_VN:
+                body = {}
+                ends[i] = decode_vn(step[1], body, buf, p, e)
+                column[i] = body[step[1]]
+            else:
+                column[i], ends[i] = unpack_var(op, buf, p, e)
+                if op == OP_CN and column[i] == 0:
+                    column[i] = b''
+        return column, ends
+
+    def _decode_arrays(self, step, buf, pos, alive, count, e):
+        column = np.empty(len(pos), dtype=object)
+        ends = pos.copy()
+        for i in np.flatnonzero(alive):
+            body = {step[2]: int(count[i])}
+            ends[i] = decode_array(step, body, buf, int(pos[i]), e)
+            column[i] = body[step[1]]
+        return column, ends
+
+    def finish(self):
+        steps, fixed = self._layout('<')
+        return {field: np.concatenate(chunks) if chunks else
+                np.empty(0, dtype=fixed[field][2].newbyteorder('=') if field in fixed else object)
+                for field, chunks in self.columns.items()}
+
+
+def array_item_size(step):
+    # bytes per element of a K array (nibble arrays count as 1 byte per 2 elements),
+    # None when the elements are variable-length
+    if step[3] == OP_FIXED:
+        return np.dtype(NUMPY_CODE[step[4]]).itemsize
+    elif step[3] == OP_NIBBLE:
+        return 1
+    return None
+
+
+def _gather(u8, starts, dtype):
+    # reads one value of dtype at every offset in starts; out-of-range offsets read garbage
+    # that the caller masks out
+    index = np.clip(starts, 0, max(len(u8) - dtype.itemsize, 0))[:, None] + np.arange(dtype.itemsize)
+    return u8[index].view(dtype).reshape(-1)
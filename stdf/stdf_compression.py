@@ -0,0 +1,173 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import io
+import bz2
+import gzip
+import lzma
+import queue
+import zipfile
+import threading
+
+# leading bytes of every supported container
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+)
+STDF_SUFFIXES = ('.stdf', '.std')
+
+
+def detect_compression(stdf_file):
+    # -> 'gzip', 'bz2', 'xz', 'zip', or None for a plain STDF file
+    with open(stdf_file, mode='rb') as fp:
+        magic = fp.read(6)
+    for prefix, compression in COMPRESSION_MAGIC:
+        if magic.startswith(prefix):
+            return compression
+    return None
+
+
+def open_decompressed(stdf_file, compression):
+    # file object yielding the decompressed STDF bytes of stdf_file
+    if compression == 'gzip':
+        return gzip.open(stdf_file, mode='rb')
+    elif compression == 'bz2':
+        return bz2.open(stdf_file, mode='rb')
+    elif compression == 'xz':
+        return lzma.open(stdf_file, mode='rb')
+    elif compression == 'zip':
+        with zipfile.ZipFile(stdf_file) as zf:
+            # the open member keeps the archive file open after zf is closed
+            return zf.open(_zip_member(zf, stdf_file))
+    raise ValueError('unknown compression {!r}'.format(compression))
+
+
+def _zip_member(zf, stdf_file):
+    members = [info for info in zf.infolist() if not info.is_dir()]
+    stdf_members = [info for info in members if info.filename.lower().endswith(STDF_SUFFIXES)]
+    if len(members) == 1:
+        return members[0]
+    elif len(stdf_members) == 1:
+        return stdf_members[0]
+    raise ValueError('{} must hold a single STDF file, found {}'.format(
+        stdf_file, [info.filename for info in members]))
+
+
+class ThreadedDecompressor:
+    # Read-only, forward-only file object over a decompressing file object. A background
+    # thread decompresses chunk_size blocks into a queue of at most queue_size blocks, so
+    # decompression overlaps with record decoding (zlib, bz2 and lzma release the GIL)
+    # while memory stays bounded. Forward seeks are served by skipping data.
+
+    CHUNK_SIZE = 1 << 20
+    QUEUE_SIZE = 4
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._chunk = b''
+        self._offset = 0
+        self._pos = 0
+        self._eof = False
+        self.closed = False
+
+        self._thread = threading.Thread(target=self._decompress, name='stdf-decompress', daemon=True)
+        self._thread.start()
+
+    def _decompress(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._fp.read(self._chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _next_chunk(self):
+        # -> False at the end of the stream
+        if self._eof:
+            return False
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            self._eof = True
+            raise item
+        if not item:
+            self._eof = True
+            return False
+        self._chunk = item
+        self._offset = 0
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = float('inf')
+
+        parts = []
+        while size > 0:
+            if self._offset >= len(self._chunk) and not self._next_chunk():
+                break
+            end = min(len(self._chunk), self._offset + size)
+            parts.append(self._chunk[self._offset:end])
+            size -= end - self._offset
+            self._pos += end - self._offset
+            self._offset = end
+
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('cannot seek from the end of a compressed stream')
+        if offset < self._pos:
+            raise io.UnsupportedOperation('cannot seek backwards in a compressed stream, '
+                                          'load it with mode=\'memory\' instead')
+
+        skip = offset - self._pos
+        while skip > 0:
+            if self._offset >= len(self._chunk) and not self._next_chunk():
+                break
+            n = min(len(self._chunk) - self._offset, skip)
+            self._offset += n
+            self._pos += n
+            skip -= n
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._stop.set()
+        self._thread.join()
+        self._fp.close()
+        self._chunk = b''
@@ -0,0 +1,423 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import struct
+
+# A decoder plan is the list of steps needed to turn one record body into a dict.
+# Runs of fixed-width fields are merged into one precompiled struct.Struct; the
+# variable-length fields (Cn, Sn, Bn, Dn, nibbles, K arrays and Vn) get a step each.
+# A projected plan (see project_plan) steps over the fields nobody asked for: unwanted
+# fixed-width fields become pad bytes and unwanted variable-length ones an OP_SKIP step.
+OP_FIXED, OP_CN, OP_SN, OP_BN, OP_DN, OP_NIBBLE, OP_ARRAY, OP_VN, OP_SKIP = range(9)
+
+VAR_OPS = {
+    'Cn': OP_CN,
+    'Sn': OP_SN,
+    'Bn': OP_BN,
+    'Dn': OP_DN,
+    'N1': OP_NIBBLE,
+}
+
+VN_MAP = ['B0', 'U1', 'U2', 'U4', 'I1', 'I2',
+          'I4', 'R4', 'R8', 'Cn', 'Bn', 'Dn', 'N1']
+
+VN_FMT = {
+    'U1': 'B',
+    'U2': 'H',
+    'U4': 'I',
+    'I1': 'b',
+    'I2': 'h',
+    'I4': 'i',
+    'R4': 'f',
+    'R8': 'd',
+}
+
+# which count field gives the length of a K array, by array field name
+ARRAY_COUNT_FIELDS = {
+    'SITE_NUM': ('SITE_CNT',),  # SDR (1, 80)
+    'PMR_INDX': ('INDX_CNT', 'LOCM_CNT'),  # PGR (1, 62), NMR (1, 91)
+    'GRP_INDX': ('GRP_CNT',),  # PLR (1, 63)
+    'GRP_MODE': ('GRP_CNT',),
+    'GRP_RADX': ('GRP_CNT',),
+    'PGM_CHAR': ('GRP_CNT',),
+    'RTN_CHAR': ('GRP_CNT',),
+    'PGM_CHAL': ('GRP_CNT',),
+    'RTN_CHAL': ('GRP_CNT',),
+    'RTN_INDX': ('RTN_ICNT',),  # FTR (15, 20), MPR (15, 15)
+    'RTN_STAT': ('RTN_ICNT',),
+    'PGM_INDX': ('PGM_ICNT',),  # FTR (15, 20)
+    'PGM_STAT': ('PGM_ICNT',),
+    'RTN_RSLT': ('RSLT_CNT',),  # MPR (15, 15)
+    'UPD_NAM': ('UPD_CNT',),  # VUR (0, 30)
+    'PAT_BGN': ('LOCP_CNT',),  # PSR (1, 90)
+    'PAT_END': ('LOCP_CNT',),
+    'PAT_FILE': ('LOCP_CNT',),
+    'PAT_LBL': ('LOCP_CNT',),
+    'FILE_UID': ('LOCP_CNT',),
+    'ATPG_DSC': ('LOCP_CNT',),
+    'SRC_ID': ('LOCP_CNT',),
+    'ATPG_NAM': ('LOCM_CNT',),  # NMR (1, 91)
+    'CHN_LIST': ('CHN_CNT',),  # SSR (1, 93)
+    'M_CLKS': ('MSTR_CNT',),  # CDR (1, 94)
+    'S_CLKS': ('SLAV_CNT',),
+    'CELL_LST': ('LST_CNT',),
+}
+
+
+def array_count_field(field, previous_fields):
+    for count_field in ARRAY_COUNT_FIELDS.get(field, ()):
+        if count_field in previous_fields:
+            return count_field
+
+    # custom schemas: fall back to the nearest preceding *CNT field
+    for name in reversed(previous_fields):
+        if name.endswith('CNT'):
+            return name
+
+    return None
+
+
+def compile_plan(body_def, fmt_map, e):
+    steps = []
+    run = []
+    previous_fields = []
+    pending_nibble = None
+
+    def flush_run():
+        if run:
+            s = struct.Struct(e + ''.join(fmt_map[fmt_raw] for _, fmt_raw in run))
+            names = tuple(field for field, _ in run)
+            singles = tuple((field, struct.Struct(e + fmt_map[fmt_raw])) for field, fmt_raw in run)
+            steps.append((OP_FIXED, s, names, singles))
+            del run[:]
+
+    for field, fmt_raw in body_def:
+        if fmt_raw == 'N1':
+            flush_run()
+            if pending_nibble is None:
+                # low nibble of a new byte; the next N1 field, if any, takes the high nibble
+                pending_nibble = [OP_NIBBLE, field, None]
+                steps.append(pending_nibble)
+            else:
+                pending_nibble[2] = field
+                pending_nibble = None
+
+        else:
+            pending_nibble = None
+
+            if fmt_raw in fmt_map:
+                run.append((field, fmt_raw))
+
+            elif fmt_raw.startswith('K'):
+                flush_run()
+                fmt_act = fmt_raw[2:]
+                count_field = array_count_field(field, previous_fields)
+                if fmt_act in VAR_OPS:
+                    steps.append((OP_ARRAY, field, count_field, VAR_OPS[fmt_act], None))
+                else:
+                    steps.append((OP_ARRAY, field, count_field, OP_FIXED, fmt_map[fmt_act]))
+
+            elif fmt_raw.startswith('V'):
+                flush_run()
+                steps.append((OP_VN, field))
+
+            elif fmt_raw in VAR_OPS:
+                flush_run()
+                steps.append((VAR_OPS[fmt_raw], field))
+
+            else:
+                raise ValueError('unknown field format', field, fmt_raw)
+
+        previous_fields.append(field)
+
+    flush_run()
+    return [tuple(step) for step in steps]
+
+
+def compile_plans(stdf_type, fmt_map, e):
+    return {rec_name: compile_plan(v['body'], fmt_map, e) for rec_name, v in stdf_type.items()}
+
+
+def plan_fields(plan):
+    fields = []
+    for step in plan:
+        if step[0] == OP_FIXED:
+            fields.extend(step[2])
+        elif step[0] == OP_NIBBLE:
+            fields.extend(field for field in step[1:] if field is not None)
+        else:
+            fields.append(step[1])
+    return fields
+
+
+def project_plan(plan, fields):
+    # -> (plan decoding only fields, count fields it has to decode on top of them)
+    unknown = set(fields).difference(plan_fields(plan))
+    if unknown:
+        raise ValueError('unknown field(s) {}'.format(sorted(unknown)))
+
+    keep = set(fields)
+    last = 0
+    for i, step in enumerate(plan):
+        names = step[2] if step[0] == OP_FIXED else step[1:3] if step[0] == OP_NIBBLE else step[1:2]
+        if keep.intersection(names):
+            last = i + 1
+
+    # arrays in front of the last requested field still need their count to be stepped over
+    extra = set(step[2] for step in plan[:last] if step[0] == OP_ARRAY) - keep
+    keep |= extra
+
+    projected = []
+    for step in plan[:last]:
+        op = step[0]
+        if op == OP_FIXED:
+            e = step[1].format[0]
+            fmt = ''.join(single.format[1:] if field in keep else 'x' * single.size
+                          for field, single in step[3])
+            names = tuple(field for field in step[2] if field in keep)
+            singles = tuple((field if field in keep else None, single) for field, single in step[3])
+            projected.append((OP_FIXED, struct.Struct(e + fmt), names, singles))
+
+        elif op == OP_NIBBLE and keep.intersection(step[1:]):
+            projected.append((OP_NIBBLE,) + tuple(field if field in keep else None for field in step[1:]))
+
+        elif op != OP_NIBBLE and step[1] in keep:
+            projected.append(step)
+
+        else:
+            projected.append((OP_SKIP, step))
+
+    return projected, tuple(sorted(extra))
+
+
+def unpack_var(op, buf, pos, e):
+    # returns (value, new_pos) for a single Cn/Sn/Bn/Dn/N1 item
+    if op == OP_CN:
+        n = buf[pos]
+        pos += 1
+        return (bytes(buf[pos:pos + n]) if n else 0), pos + n
+
+    elif op == OP_SN:
+        n, = struct.unpack_from(e + 'H', buf, pos)
+        pos += 2
+        return (bytes(buf[pos:pos + n]) if n else 0), pos + n
+
+    elif op == OP_BN or op == OP_DN:
+        if op == OP_BN:
+            n = buf[pos]
+            pos += 1
+        else:
+            bits, = struct.unpack_from(e + 'H', buf, pos)
+            n = (bits + 7) // 8
+            pos += 2
+
+        if n == 0:
+            return 0, pos
+        elif n == 1:
+            return buf[pos], pos + 1
+        else:
+            return tuple(buf[pos:pos + n]), pos + n
+
+    else:
+        return buf[pos] & 0xF, pos + 1
+
+
+def decode(plan, buf, e):
+    body = {}
+    pos = 0
+    end = len(buf)
+
+    try:
+        for step in plan:
+            if pos >= end:
+                break
+
+            op = step[0]
+            if op == OP_FIXED:
+                s = step[1]
+                if pos + s.size <= end:
+                    body.update(zip(step[2], s.unpack_from(buf, pos)))
+                    pos += s.size
+                else:
+                    # record ends inside this run: the trailing fields were omitted
+                    for field, single in step[3]:
+                        if pos >= end:
+                            break
+                        if field is not None:
+                            body[field], = single.unpack_from(buf, pos)
+                        pos += single.size
+
+            elif op == OP_CN:
+                n = buf[pos]
+                pos += 1
+                body[step[1]] = bytes(buf[pos:pos + n]) if n else 0
+                pos += n
+
+            elif op == OP_SKIP:
+                pos = skip(step[1], body, buf, pos, e)
+
+            elif op == OP_NIBBLE:
+                nibble = buf[pos]
+                if step[1] is not None:
+                    body[step[1]] = nibble & 0xF
+                if step[2] is not None:
+                    body[step[2]] = nibble >> 4
+                pos += 1
+
+            elif op == OP_ARRAY:
+                pos = decode_array(step, body, buf, pos, e)
+
+            elif op == OP_VN:
+                pos = decode_vn(step[1], body, buf, pos, e)
+
+            else:
+                body[step[1]], pos = unpack_var(op, buf, pos, e)
+
+    except IndexError:
+        raise struct.error('record body ended inside a field, at offset {}'.format(pos))
+
+    if pos > end:
+        raise struct.error('record body ended inside a field, at offset {}'.format(end))
+
+    return body
+
+
+def field_ends(plan, buf, e):
+    # -> offsets in buf where the fields of a full plan end, unpacking only the fixed-width
+    # runs (which hold the array counts); the last one is short of len(buf) when data follows
+    # the last field
+    body = {}
+    ends = []
+    pos = 0
+    end = len(buf)
+
+    try:
+        for step in plan:
+            if pos >= end:
+                break
+
+            if step[0] == OP_FIXED:
+                s = step[1]
+                if pos + s.size <= end:
+                    body.update(zip(step[2], s.unpack_from(buf, pos)))
+                    for field, single in step[3]:
+                        pos += single.size
+                        ends.append(pos)
+                else:
+                    for field, single in step[3]:
+                        if pos >= end:
+                            break
+                        if field is not None:
+                            body[field], = single.unpack_from(buf, pos)
+                        pos += single.size
+                        ends.append(pos)
+            else:
+                pos = skip(step, body, buf, pos, e)
+                ends.append(pos)
+
+    except (IndexError, KeyError):
+        raise struct.error('record body ended inside a field, at offset {}'.format(pos))
+
+    if pos > end:
+        raise struct.error('record body ended inside a field, at offset {}'.format(end))
+    return ends
+
+
+def skip(step, body, buf, pos, e):
+    # position after the field of a plan step, without building its value
+    op = step[0]
+    if op == OP_CN or op == OP_BN:
+        return pos + 1 + buf[pos]
+
+    elif op == OP_SN or op == OP_DN:
+        n, = struct.unpack_from(e + 'H', buf, pos)
+        return pos + 2 + (n if op == OP_SN else (n + 7) // 8)
+
+    elif op == OP_NIBBLE:
+        return pos + 1
+
+    elif op == OP_ARRAY:
+        _, field, count_field, item_op, code = step
+        if count_field is None:
+            raise ValueError(field)
+        n = body[count_field]
+
+        if item_op == OP_FIXED:
+            return pos + n * struct.calcsize(e + code)
+        elif item_op == OP_NIBBLE:
+            return pos + (n + 1) // 2
+        else:
+            for i in range(n):
+                pos = skip((item_op,), body, buf, pos, e)
+            return pos
+
+    else:
+        return decode_vn(step[1], {}, buf, pos, e)
+
+
+def decode_array(step, body, buf, pos, e):
+    _, field, count_field, op, code = step
+    if count_field is None:
+        raise ValueError(field)
+    n = body[count_field]
+
+    if op == OP_FIXED:
+        fmt = '{}{}{}'.format(e, n, code)
+        body[field] = list(struct.unpack_from(fmt, buf, pos))
+        return pos + struct.calcsize(fmt)
+
+    elif op == OP_NIBBLE:
+        size = (n + 1) // 2
+        data = []
+        for nibble in buf[pos:pos + size]:
+            data.append(nibble & 0xF)
+            data.append(nibble >> 4)
+        if pos + size > len(buf):
+            raise IndexError
+        body[field] = data[:n]
+        return pos + size
+
+    else:
+        data = []
+        for i in range(n):
+            value, pos = unpack_var(op, buf, pos, e)
+            data.append(value)
+        body[field] = data
+        return pos
+
+
+def decode_vn(field, body, buf, pos, e):
+    n, = struct.unpack_from(e + 'H', buf, pos)
+    pos += 2
+
+    data = []
+    for i in range(n):
+        fmt_vn = VN_MAP[buf[pos]]
+        pos += 1
+
+        if fmt_vn == 'B0':
+            continue  # pad byte, carries no data
+        elif fmt_vn in VAR_OPS:
+            value, pos = unpack_var(VAR_OPS[fmt_vn], buf, pos, e)
+        else:
+            fmt = e + VN_FMT[fmt_vn]
+            value, = struct.unpack_from(fmt, buf, pos)
+            pos += struct.calcsize(fmt)
+        data.append(value)
+
+    body[field] = data
+    return pos
@@ -0,0 +1,102 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+# Per the STDF spec the first PTR (MPR) of a test sets its default limits, units and
+# formats; later ones may leave them out, or flag them invalid in OPT_FLAG, meaning
+# "use the default". These are the fields taken from the first record of a test.
+DEFAULT_FIELDS = {
+    'PTR': ('TEST_TXT', 'OPT_FLAG', 'RES_SCAL', 'LLM_SCAL', 'HLM_SCAL', 'LO_LIMIT', 'HI_LIMIT',
+            'UNITS', 'C_RESFMT', 'C_LLMFMT', 'C_HLMFMT', 'LO_SPEC', 'HI_SPEC'),
+    'MPR': ('TEST_TXT', 'OPT_FLAG', 'RES_SCAL', 'LLM_SCAL', 'HLM_SCAL', 'LO_LIMIT', 'HI_LIMIT',
+            'START_IN', 'INCR_IN', 'RTN_INDX', 'UNITS', 'UNITS_IN', 'C_RESFMT', 'C_LLMFMT', 'C_HLMFMT',
+            'LO_SPEC', 'HI_SPEC'),
+}
+# Cn fields decode to 0 when empty, which also means "use the default"
+TEXT_FIELDS = frozenset(('TEST_TXT', 'UNITS', 'UNITS_IN', 'C_RESFMT', 'C_LLMFMT', 'C_HLMFMT'))
+# OPT_FLAG bit -> fields it marks invalid, which the first record of the test then supplies
+OPT_FLAG_INVALID = {
+    'PTR': ((0x01, ('RES_SCAL',)), (0x10, ('LO_LIMIT', 'LLM_SCAL')), (0x20, ('HI_LIMIT', 'HLM_SCAL'))),
+}
+OPT_FLAG_INVALID['MPR'] = OPT_FLAG_INVALID['PTR'] + ((0x02, ('START_IN', 'INCR_IN')),)
+# OPT_FLAG bit -> fields the record says do not exist (no spec or test limit); these are
+# neither filled in nor taken as defaults, whatever else OPT_FLAG says about them
+OPT_FLAG_ABSENT = ((0x04, ('LO_SPEC',)), (0x08, ('HI_SPEC',)),
+                   (0x40, ('LO_LIMIT', 'LLM_SCAL')), (0x80, ('HI_LIMIT', 'HLM_SCAL')))
+
+_MISSING = object()
+
+
+class DefaultsCache:
+    # Test definitions by (TEST_NUM, HEAD_NUM, SITE_NUM), falling back to the first
+    # definition of the TEST_NUM on any head/site. apply() fills the default fields a
+    # record left out, empty or invalid, and replaces values equal to the cached ones
+    # by the cached objects, so every record of a test shares one copy of them.
+
+    def __init__(self, fields=None):
+        # fields: {rec_name: [field, ...]} decoded by the Reader; only these get filled
+        self.fields = {}
+        for rec_name, default_fields in DEFAULT_FIELDS.items():
+            if fields and rec_name in fields:
+                default_fields = tuple(f for f in default_fields if f in fields[rec_name])
+            self.fields[rec_name] = default_fields
+        self.clear()
+
+    def clear(self):
+        self._defs = {rec_name: {} for rec_name in DEFAULT_FIELDS}
+        self._by_test = {rec_name: {} for rec_name in DEFAULT_FIELDS}
+
+    def definition(self, rec_name, test_num, head_num=None, site_num=None):
+        defs = self._defs[rec_name].get((test_num, head_num, site_num))
+        if defs is None:
+            defs = self._by_test[rec_name].get(test_num)
+        return defs
+
+    def apply(self, rec_name, body):
+        test_num = body.get('TEST_NUM')
+        key = (test_num, body.get('HEAD_NUM'), body.get('SITE_NUM'))
+        defs = self._defs[rec_name].get(key)
+        if defs is None:
+            by_test = self._by_test[rec_name].setdefault(test_num, {})
+            defs = self._defs[rec_name][key] = dict(by_test)
+        else:
+            by_test = None
+
+        invalid = absent = ()
+        opt_flag = body.get('OPT_FLAG')
+        if opt_flag:
+            invalid = [field for bit, fields in OPT_FLAG_INVALID[rec_name] if opt_flag & bit for field in fields]
+            absent = [field for bit, fields in OPT_FLAG_ABSENT if opt_flag & bit for field in fields]
+
+        for field in self.fields[rec_name]:
+            if field in absent:
+                continue
+            value = body.get(field, _MISSING)
+            if value is _MISSING or field in invalid or (value == 0 and field in TEXT_FIELDS):
+                cached = defs.get(field, _MISSING)
+                if cached is not _MISSING:
+                    body[field] = cached
+                continue
+
+            cached = defs.get(field, _MISSING)
+            if cached is _MISSING:
+                defs[field] = value
+                if by_test is not None:
+                    by_test.setdefault(field, value)
+            elif cached == value:
+                body[field] = cached
+
+        return body
@@ -0,0 +1,172 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import struct
+
+from stdf.stdf_decoder import OP_FIXED, OP_CN, OP_SN, OP_BN, OP_DN, OP_NIBBLE, OP_ARRAY, OP_VN, plan_fields
+
+# Encoding runs the decoder plans (see stdf_decoder) backwards: every run of fixed-width
+# fields is packed by its precompiled struct.Struct, variable-length fields by pack_var.
+# Accepted values are what the decoder returns, plus the Writer's conventions:
+#   Cn/Sn: str or bytes, (str, length) pads or cuts the string to length, 0 or None is empty
+#   Bn:    sequence of byte values or bytes, a single int is one byte, except 0 which,
+#          like for the decoder, is empty
+#   Dn:    as Bn, 8 bits per byte, or (bytes, bit count) with a bytes object first for
+#          any other bit count (the decoder rounds the bit count up to whole bytes)
+#   N1:    int, only the low nibble is written
+
+
+def pack_var(op, value, e):
+    if op == OP_CN or op == OP_SN:
+        if isinstance(value, tuple):
+            value, length = value
+            value = value.encode() if isinstance(value, str) else bytes(value)
+            value = value[:length].ljust(length, b'\x00')
+        elif isinstance(value, str):
+            value = value.encode()
+        elif not value:
+            value = b''
+        if op == OP_CN:
+            return bytes((len(value),)) + value
+        return struct.pack(e + 'H', len(value)) + value
+
+    elif op == OP_BN:
+        value = _bits(value)
+        return bytes((len(value),)) + value
+
+    elif op == OP_DN:
+        if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], (bytes, bytearray)):
+            value, bits = value
+        else:
+            value = _bits(value)
+            bits = 8 * len(value)
+        return struct.pack(e + 'H', bits) + bytes(value)
+
+    else:
+        return bytes((value & 0xF,))
+
+
+def _bits(value):
+    if isinstance(value, int):
+        return bytes((value,)) if value else b''
+    return bytes(value)
+
+
+def pack_array(step, items, n, e):
+    _, field, count_field, item_op, code = step
+    items = items[:n]
+    if len(items) != n:
+        raise ValueError('{} has {} items, {} says {}'.format(field, len(items), count_field, n))
+
+    if item_op == OP_FIXED:
+        return struct.pack('{}{}{}'.format(e, n, code), *items)
+    elif item_op == OP_NIBBLE:
+        # two items per byte, the first one in the low nibble
+        return bytes((items[i] & 0xF) | ((items[i + 1] & 0xF) << 4 if i + 1 < n else 0) for i in range(0, n, 2))
+    else:
+        return b''.join(pack_var(item_op, item, e) for item in items)
+
+
+def truncate_plan(plan, fields):
+    # -> plan writing every field up to the last one in fields; a record may omit trailing
+    # fields, but not fields in front of one it holds
+    known = plan_fields(plan)
+    unknown = set(fields).difference(known)
+    if unknown:
+        raise ValueError('unknown field(s) {}'.format(sorted(unknown)))
+
+    last = max(known.index(field) for field in fields) + 1 if fields else 0
+    missing = [field for field in known[:last] if field not in fields]
+    if missing:
+        raise ValueError('missing field(s) {} in front of {}'.format(missing, known[last - 1]))
+
+    truncated = []
+    for step in plan:
+        if step[0] == OP_FIXED:
+            n = len([field for field in step[2] if field in fields])
+            if n < len(step[2]):
+                if n:
+                    e = step[1].format[0]
+                    singles = step[3][:n]
+                    fmt = ''.join(single.format[1:] for _, single in singles)
+                    truncated.append((OP_FIXED, struct.Struct(e + fmt), step[2][:n], singles))
+                break
+        elif step[0] == OP_NIBBLE:
+            if step[1] not in fields:
+                break
+            if step[2] is not None and step[2] not in fields:
+                # the high nibble is written as 0
+                step = (OP_NIBBLE, step[1], None)
+        elif step[1] not in fields:
+            break
+        truncated.append(step)
+
+    return truncated
+
+
+def encode(plan, body, e):
+    # -> packed record body of the fields of plan, taken from the dict body
+    parts = []
+    for step in plan:
+        op = step[0]
+        if op == OP_FIXED:
+            parts.append(step[1].pack(*[body[field] for field in step[2]]))
+
+        elif op == OP_NIBBLE:
+            high = body[step[2]] & 0xF if step[2] is not None else 0
+            parts.append(bytes(((body[step[1]] & 0xF) | high << 4,)))
+
+        elif op == OP_ARRAY:
+            parts.append(pack_array(step, body[step[1]], body[step[2]], e))
+
+        elif op == OP_VN:
+            raise ValueError('writing {} (Vn) is not supported'.format(step[1]))
+
+        else:
+            parts.append(pack_var(op, body[step[1]], e))
+
+    return b''.join(parts)
+
+
+def encode_columns(plan, columns, n, e):
+    # -> packed bodies of n records, from {field: list of n values}; every plan step
+    # is run over all records at once
+    parts = []
+    for step in plan:
+        op = step[0]
+        if op == OP_FIXED:
+            pack = step[1].pack
+            parts.append([pack(*values) for values in zip(*[columns[field] for field in step[2]])])
+
+        elif op == OP_NIBBLE:
+            low = columns[step[1]]
+            high = columns[step[2]] if step[2] is not None else [0] * n
+            parts.append([bytes(((lo & 0xF) | (hi & 0xF) << 4,)) for lo, hi in zip(low, high)])
+
+        elif op == OP_ARRAY:
+            parts.append([pack_array(step, items, count, e)
+                          for items, count in zip(columns[step[1]], columns[step[2]])])
+
+        elif op == OP_VN:
+            raise ValueError('writing {} (Vn) is not supported'.format(step[1]))
+
+        else:
+            parts.append([pack_var(op, value, e) for value in columns[step[1]]])
+
+    if len(parts) == 1:
+        return parts[0]
+    return [b''.join(record) for record in zip(*parts)]
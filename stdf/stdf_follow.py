@@ -0,0 +1,206 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import json
+import time
+import struct
+import asyncio
+import logging
+
+from stdf.stdf_reader import Reader
+from stdf.stdf_compression import detect_compression
+
+POLL_INTERVAL = 1.0
+READ_SIZE = 1 << 20
+MRR_TYP_SUB = (1, 20)
+
+log = logging.getLogger('stdf_follow')
+
+
+def state_path(stdf_file):
+    return stdf_file + '.offset'
+
+
+class Follower:
+    # Follows an STDF file that a tester is still writing, like tail -f: the file is kept open
+    # and every complete record appended to it is decoded once; a record that is only partly
+    # written waits for the next poll. The offset after the last record handed out is saved to
+    # state_file after each batch, so a restarted follower carries on where it stopped (records
+    # of a batch that was cut short are handed out again). The records, fields and body types
+    # are those of reader, e.g. Reader(records=['PRR']).
+
+    def __init__(self, stdf_file, state_file=None, reader=None, poll_interval=POLL_INTERVAL):
+        self.stdf_file = stdf_file
+        self.state_file = state_file
+        self.rd = reader if reader is not None else Reader()
+        self.poll_interval = poll_interval
+
+        self.offset = 0
+        self.finished = False
+        self._inode = None
+        self._fp = None
+        self._buf = bytearray()
+        self.load_state()
+
+    def load_state(self):
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file) as fp:
+            state = json.load(fp)
+        self.offset = state['offset']
+        self.rd.e = state['endian']
+        self.finished = state['finished']
+        self._inode = state['inode']
+        log.info('resuming {} at offset {}'.format(self.stdf_file, self.offset))
+
+    def save_state(self):
+        if self.state_file is None:
+            return
+        state = {'file': self.stdf_file, 'offset': self.offset, 'endian': self.rd.e,
+                 'finished': self.finished, 'inode': self._inode}
+        with open(self.state_file + '.tmp', mode='w') as fp:
+            json.dump(state, fp)
+        os.replace(self.state_file + '.tmp', self.state_file)
+
+    def _open(self):
+        # -> False while the tester has not created the file yet
+        if self._fp is not None:
+            return True
+        if not os.path.exists(self.stdf_file):
+            return False
+
+        st = os.stat(self.stdf_file)
+        if st.st_size and detect_compression(self.stdf_file) is not None:
+            raise ValueError('{} is compressed and cannot be followed'.format(self.stdf_file))
+        if self._inode is not None and (self._inode != st.st_ino or st.st_size < self.offset):
+            log.warning('{} was replaced, following it from the start'.format(self.stdf_file))
+            self._restart()
+
+        self._fp = open(self.stdf_file, mode='rb')
+        self._fp.seek(self.offset)
+        self._inode = st.st_ino
+        return True
+
+    def _restart(self):
+        self.offset = 0
+        self.finished = False
+        self.rd.e = '<'
+        if self.rd.TEST_DEFAULTS is not None:
+            self.rd.TEST_DEFAULTS.clear()
+        self._buf = bytearray()
+
+    def read_new(self):
+        # yields the complete records appended since the last call, without waiting
+        if not self._open():
+            return
+
+        if os.fstat(self._fp.fileno()).st_size < self.offset + len(self._buf):
+            log.warning('{} was truncated, following it from the start'.format(self.stdf_file))
+            self._restart()
+            self._fp.seek(0)
+
+        while True:
+            chunk = self._fp.read(READ_SIZE)
+            if not chunk:
+                return
+            self._buf += chunk
+            yield from self._split()
+
+    def _split(self):
+        buf = self._buf
+        rd = self.rd
+        rec_filter = rd.REC_FILTER
+        pos = 0
+
+        try:
+            while len(buf) - pos >= rd.HEADER_SIZE:
+                header = struct.unpack_from(rd.e + 'HBB', buf, pos)
+                if header == rd.FAR_SWAPPED_HEADER:
+                    header = rd.FAR_HEADER
+                end = pos + rd.HEADER_SIZE + header[0]
+                if end > len(buf):
+                    break
+
+                typ_sub = (header[1], header[2])
+                selected = rec_filter is None or typ_sub in rec_filter
+                if selected or typ_sub == rd.FAR_TYP_SUB:
+                    # decoding FAR also sets the byte order of the records that follow
+                    r = rd._decode_record(header, bytes(buf[pos + rd.HEADER_SIZE:end]))
+                else:
+                    r = None
+
+                self.offset += end - pos
+                pos = end
+                if typ_sub == MRR_TYP_SUB:
+                    self.finished = True
+                if selected:
+                    yield r
+        finally:
+            del buf[:pos]
+
+    def records(self, idle_timeout=None, stop_at_mrr=True):
+        # yields records as they are written, polling every poll_interval seconds; stops after
+        # MRR (the end of the lot) or after idle_timeout seconds without a new record
+        idle = 0.0
+        while not (stop_at_mrr and self.finished):
+            n = 0
+            for r in self.read_new():
+                n += 1
+                yield r
+            if n:
+                idle = 0.0
+                self.save_state()
+            elif idle_timeout is not None and idle >= idle_timeout:
+                break
+            else:
+                time.sleep(self.poll_interval)
+                idle += self.poll_interval
+
+    async def arecords(self, idle_timeout=None, stop_at_mrr=True):
+        # records() for asyncio: waits between polls without blocking the event loop
+        idle = 0.0
+        while not (stop_at_mrr and self.finished):
+            n = 0
+            for r in self.read_new():
+                n += 1
+                yield r
+            if n:
+                idle = 0.0
+                self.save_state()
+            elif idle_timeout is not None and idle >= idle_timeout:
+                break
+            else:
+                await asyncio.sleep(self.poll_interval)
+                idle += self.poll_interval
+
+    def __iter__(self):
+        return self.records()
+
+    def __aiter__(self):
+        return self.arecords()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,284 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import sys
+import struct
+import logging
+from array import array
+
+KEY_FIELDS = ('HEAD_NUM', 'SITE_NUM', 'TEST_NUM', 'PART_ID', 'WAFER_ID')
+
+# sidecar layout: magic, header, one little-endian column per entry attribute, string table
+INDEX_MAGIC = b'STDFIDX\x01'
+INDEX_HEADER = struct.Struct('<QqQIc')
+INDEX_COLUMNS = (
+    ('offset', 'Q'),
+    ('rec_typ', 'B'),
+    ('rec_sub', 'B'),
+    ('head_num', 'B'),
+    ('site_num', 'B'),
+    ('flags', 'B'),
+    ('test_num', 'I'),
+    ('part', 'i'),
+    ('wafer', 'i'),
+)
+HAS_HEAD_SITE = 0x01
+HAS_TEST_NUM = 0x02
+
+log = logging.getLogger('RecordIndex')
+
+
+def index_path(stdf_file):
+    return stdf_file + '.idx'
+
+
+def _source_stamp(stdf_file):
+    st = os.stat(stdf_file)
+    return st.st_size, st.st_mtime_ns
+
+
+def restamp(stdf_file, old_stamp, index_file=None):
+    # marks the index of stdf_file built for old_stamp (size, mtime_ns) as up to date, for
+    # changes that keep every record in place and no key field, e.g. in-place patching.
+    # -> True if the index was restamped
+    index_file = index_file or index_path(stdf_file)
+    if not os.path.exists(index_file):
+        return False
+
+    with open(index_file, mode='r+b') as fp:
+        if fp.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return False
+        size, mtime_ns, n, n_strings, e = INDEX_HEADER.unpack(fp.read(INDEX_HEADER.size))
+        if (size, mtime_ns) != tuple(old_stamp):
+            return False
+        fp.seek(len(INDEX_MAGIC))
+        fp.write(INDEX_HEADER.pack(*_source_stamp(stdf_file), n, n_strings, e))
+    return True
+
+
+class RecordIndex:
+    # Offset, rec_typ/rec_sub and key fields of every record of one STDF file. Records
+    # between PIR and PRR of a head/site carry the PRR PART_ID, and records between WIR
+    # and WRR carry the WAFER_ID, so a part or a wafer can be fetched as a whole. find()
+    # starts from the entries of the rarest key given, looked up in per-key tables.
+
+    def __init__(self, endian='<', source_size=0, source_mtime_ns=0):
+        self.e = endian
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        self.columns = {name: array(code) for name, code in INDEX_COLUMNS}
+        self.strings = []
+        self._string_idx = {}
+        self._keys = None
+
+    def __len__(self):
+        return len(self.columns['offset'])
+
+    def _intern(self, value):
+        if not value:
+            return -1
+        idx = self._string_idx.get(value)
+        if idx is None:
+            idx = self._string_idx[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+    @classmethod
+    def build(cls, stdf_file, stdf_ver_json=None):
+        from stdf.stdf_reader import Reader
+
+        rd = Reader(stdf_ver_json)
+        rd.select_fields({rec_name: [field for field, _ in v['body'] if field in KEY_FIELDS]
+                          for rec_name, v in rd.STDF_TYPE.items()})
+        rd.load_stdf_file(stdf_file, mode='mmap')
+
+        size, mtime_ns = _source_stamp(stdf_file)
+        index = cls(source_size=size, source_mtime_ns=mtime_ns)
+        c = index.columns
+        offset, rec_typ, rec_sub = c['offset'].append, c['rec_typ'].append, c['rec_sub'].append
+        head_num, site_num, flags = c['head_num'].append, c['site_num'].append, c['flags'].append
+        test_num, part, wafer = c['test_num'].append, c['part'].append, c['wafer'].append
+
+        wafer_idx = -1
+        open_parts = {}
+        for i, (rec_name, header, body) in enumerate(rd):
+            offset(rd.body_start - rd.HEADER_SIZE)
+            rec_typ(header[1])
+            rec_sub(header[2])
+
+            if rec_name == 'WIR':
+                wafer_idx = index._intern(body.get('WAFER_ID'))
+
+            head_site = None
+            flag = 0
+            if 'HEAD_NUM' in body and 'SITE_NUM' in body and not isinstance(body['SITE_NUM'], list):
+                head_site = (body['HEAD_NUM'], body['SITE_NUM'])
+                flag |= HAS_HEAD_SITE
+            head_num(head_site[0] if head_site else 0)
+            site_num(head_site[1] if head_site else 0)
+            test_num(body.get('TEST_NUM', 0))
+            if 'TEST_NUM' in body:
+                flag |= HAS_TEST_NUM
+            flags(flag)
+            part(-1)
+            wafer(wafer_idx)
+
+            if rec_name == 'PIR':
+                open_parts[head_site] = [i]
+            elif head_site in open_parts:
+                open_parts[head_site].append(i)
+
+            if rec_name == 'PRR':
+                part_idx = index._intern(body.get('PART_ID'))
+                for j in open_parts.pop(head_site, [i]):
+                    c['part'][j] = part_idx
+            elif rec_name == 'WRR':
+                wafer_idx = -1
+
+        index.e = rd.e
+        log.info('indexed {} records of {}'.format(len(index), stdf_file))
+        return index
+
+    def save(self, index_file):
+        with open(index_file, mode='wb') as fp:
+            fp.write(INDEX_MAGIC)
+            fp.write(INDEX_HEADER.pack(self.source_size, self.source_mtime_ns, len(self),
+                                       len(self.strings), self.e.encode()))
+            for name, _ in INDEX_COLUMNS:
+                column = self.columns[name]
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(fp)
+            for value in self.strings:
+                fp.write(struct.pack('<H', len(value)) + value)
+
+    @classmethod
+    def load(cls, index_file):
+        with open(index_file, mode='rb') as fp:
+            if fp.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError('{} is not an STDF record index'.format(index_file))
+
+            size, mtime_ns, n, n_strings, e = INDEX_HEADER.unpack(fp.read(INDEX_HEADER.size))
+            index = cls(e.decode(), size, mtime_ns)
+            for name, _ in INDEX_COLUMNS:
+                column = index.columns[name]
+                column.fromfile(fp, n)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+            for i in range(n_strings):
+                length, = struct.unpack('<H', fp.read(2))
+                index._intern(fp.read(length))
+
+        return index
+
+    @classmethod
+    def open(cls, stdf_file, index_file=None, stdf_ver_json=None, rebuild=False):
+        # loads the sidecar index of stdf_file, (re)building it when missing or out of date
+        index_file = index_file or index_path(stdf_file)
+
+        if not rebuild and os.path.exists(index_file):
+            index = cls.load(index_file)
+            if (index.source_size, index.source_mtime_ns) == _source_stamp(stdf_file):
+                return index
+            log.info('index {} is out of date, rebuilding it'.format(index_file))
+
+        index = cls.build(stdf_file, stdf_ver_json)
+        index.save(index_file)
+        return index
+
+    def _key_tables(self):
+        # -> {key: {value: array of entry numbers, ascending}}, built on the first find()
+        if self._keys is not None:
+            return self._keys
+
+        keys = {key: {} for key in ('rec', 'head', 'head_site', 'test', 'part', 'wafer')}
+        by_rec, by_head, by_head_site = keys['rec'], keys['head'], keys['head_site']
+        by_test, by_part, by_wafer = keys['test'], keys['part'], keys['wafer']
+
+        def add(table, value, i):
+            entries = table.get(value)
+            if entries is None:
+                entries = table[value] = array('I')
+            entries.append(i)
+
+        c = self.columns
+        for i, (typ, sub, head, site, flag, test, part, wafer) in enumerate(zip(
+                c['rec_typ'], c['rec_sub'], c['head_num'], c['site_num'], c['flags'],
+                c['test_num'], c['part'], c['wafer'])):
+            add(by_rec, (typ, sub), i)
+            if flag & HAS_HEAD_SITE:
+                add(by_head, head, i)
+                add(by_head_site, (head, site), i)
+            if flag & HAS_TEST_NUM:
+                add(by_test, test, i)
+            if part >= 0:
+                add(by_part, part, i)
+            if wafer >= 0:
+                add(by_wafer, wafer, i)
+
+        self._keys = keys
+        return keys
+
+    def find(self, rec_typ_sub=None, head_num=None, site_num=None, test_num=None, part_id=None, wafer_id=None):
+        # -> file offsets of the records matching every given key, in file order
+        c = self.columns
+        keys = self._key_tables()
+        empty = array('I')
+
+        strings = []
+        for column, value in (('part', part_id), ('wafer', wafer_id)):
+            if value is not None:
+                idx = self._string_idx.get(value.encode() if isinstance(value, str) else value)
+                if idx is None:
+                    return []
+                strings.append((column, idx))
+
+        candidates = [keys[column].get(idx, empty) for column, idx in strings]
+        if rec_typ_sub is not None:
+            candidates.append(keys['rec'].get(tuple(rec_typ_sub), empty))
+        if head_num is not None and site_num is not None:
+            candidates.append(keys['head_site'].get((head_num, site_num), empty))
+        elif head_num is not None:
+            candidates.append(keys['head'].get(head_num, empty))
+        if test_num is not None:
+            candidates.append(keys['test'].get(test_num, empty))
+
+        # the entries of the rarest key, checked against the other keys
+        selected = min(candidates, key=len) if candidates else range(len(self))
+
+        for column, idx in strings:
+            values = c[column]
+            selected = [i for i in selected if values[i] == idx]
+
+        if rec_typ_sub is not None:
+            typ, sub = c['rec_typ'], c['rec_sub']
+            selected = [i for i in selected if typ[i] == rec_typ_sub[0] and sub[i] == rec_typ_sub[1]]
+
+        if head_num is not None or site_num is not None:
+            head, site, flags = c['head_num'], c['site_num'], c['flags']
+            selected = [i for i in selected if flags[i] & HAS_HEAD_SITE and
+                        (head_num is None or head[i] == head_num) and
+                        (site_num is None or site[i] == site_num)]
+
+        if test_num is not None:
+            tests, flags = c['test_num'], c['flags']
+            selected = [i for i in selected if flags[i] & HAS_TEST_NUM and tests[i] == test_num]
+
+        offsets = c['offset']
+        return [offsets[i] for i in selected]
@@ -0,0 +1,110 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import struct
+from time import perf_counter
+
+
+class Instrument:
+    # Opt-in counters for a Reader and/or a Writer (see their use_instrument()): records, body
+    # bytes and cumulative seconds per record type, for decoding and encoding apart, and the
+    # seconds spent reading record bodies from the file. before(rec_name, header) and
+    # after(rec_name, header, body) hooks run around every record; when writing, before gets
+    # header None, and records packed by Writer.pack_records are counted but not hooked.
+
+    def __init__(self):
+        self.decoded = {}
+        self.encoded = {}
+        self.io_seconds = 0.0
+        self.before = []
+        self.after = []
+
+    def add_hooks(self, before=None, after=None):
+        if before is not None:
+            self.before.append(before)
+        if after is not None:
+            self.after.append(after)
+
+    def reset(self):
+        self.decoded = {}
+        self.encoded = {}
+        self.io_seconds = 0.0
+
+    @staticmethod
+    def _add(table, rec_name, n, n_bytes, seconds):
+        entry = table.get(rec_name)
+        if entry is None:
+            entry = table[rec_name] = [0, 0, 0.0]
+        entry[0] += n
+        entry[1] += n_bytes
+        entry[2] += seconds
+
+    def read(self, rd, header):
+        # Reader._read_record(header), timed
+        rec_name = rd.REC_NAME.get((header[1], header[2]), 'UNK')
+        for hook in self.before:
+            hook(rec_name, header)
+
+        t0 = perf_counter()
+        body_raw = rd._read_body(header[0])
+        t1 = perf_counter()
+        r = rd._decode_record(header, body_raw)
+        self.io_seconds += t1 - t0
+        self._add(self.decoded, r[0], 1, header[0], perf_counter() - t1)
+
+        for hook in self.after:
+            hook(*r)
+        return r
+
+    def decode(self, rd, header, body_raw):
+        # Reader._decode_record(header, body_raw), timed
+        rec_name = rd.REC_NAME.get((header[1], header[2]), 'UNK')
+        for hook in self.before:
+            hook(rec_name, header)
+
+        t0 = perf_counter()
+        r = rd._decode_record(header, body_raw)
+        self._add(self.decoded, r[0], 1, header[0], perf_counter() - t0)
+
+        for hook in self.after:
+            hook(*r)
+        return r
+
+    def encode(self, w, rec_name, data):
+        # Writer._pack_record(rec_name, data), timed
+        for hook in self.before:
+            hook(rec_name, None)
+
+        t0 = perf_counter()
+        packed = w._pack_record(rec_name, data)
+        self._add(self.encoded, rec_name, 1, len(packed) - w.HEADER_SIZE, perf_counter() - t0)
+
+        if self.after:
+            header = struct.unpack(w.e + 'HBB', packed[:w.HEADER_SIZE])
+            for hook in self.after:
+                hook(rec_name, header, data)
+        return packed
+
+    def add_encoded(self, rec_name, n, n_bytes, seconds):
+        self._add(self.encoded, rec_name, n, n_bytes, seconds)
+
+    def snapshot(self):
+        # -> {'decode': {rec_name: {'records', 'bytes', 'seconds'}}, 'encode': {...}, 'io_seconds'}
+        def table(entries):
+            return {rec_name: {'records': n, 'bytes': n_bytes, 'seconds': seconds}
+                    for rec_name, (n, n_bytes, seconds) in sorted(entries.items())}
+        return {'decode': table(self.decoded), 'encode': table(self.encoded), 'io_seconds': self.io_seconds}
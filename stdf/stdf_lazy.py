@@ -0,0 +1,110 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+from stdf.stdf_decoder import project_plan, plan_fields, decode
+
+_MISSING = object()
+
+
+class FieldPlans:
+    # decoder plans reaching a single field, by (endian, rec_name, field), built on first use
+
+    def __init__(self, plans):
+        self.plans = plans
+        self._field_plans = {}
+        self._fields = {}
+
+    def fields(self, rec_name):
+        fields = self._fields.get(rec_name)
+        if fields is None:
+            fields = self._fields[rec_name] = tuple(dict.fromkeys(plan_fields(self.plans['<'][rec_name])))
+        return fields
+
+    def plan(self, e, rec_name, field):
+        key = (e, rec_name, field)
+        plan = self._field_plans.get(key)
+        if plan is None:
+            if field not in self.fields(rec_name):
+                raise KeyError(field)
+            plan, _ = project_plan(self.plans[e][rec_name], [field])
+            self._field_plans[key] = plan
+        return plan
+
+
+class LazyRecord:
+    # Record body that keeps the raw bytes and decodes a field the first time it is read,
+    # stepping over the fields in front of it; decoded values are kept. It reads like the
+    # dict body: record['RESULT'], get(), in, keys(), items(), to_dict().
+    __slots__ = ('rec_name', 'e', 'raw', '_plans', '_values', '_complete')
+
+    def __init__(self, rec_name, raw, e, plans):
+        self.rec_name = rec_name
+        self.raw = raw
+        self.e = e
+        self._plans = plans
+        self._values = {}
+        self._complete = False
+
+    def __getitem__(self, field):
+        value = self._values.get(field, _MISSING)
+        if value is _MISSING:
+            if self._complete:
+                raise KeyError(field)
+            self._values.update(decode(self._plans.plan(self.e, self.rec_name, field), self.raw, self.e))
+            value = self._values.get(field, _MISSING)
+            if value is _MISSING:
+                # the record left this field out
+                raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field):
+        return self.get(field, _MISSING) is not _MISSING
+
+    def to_dict(self):
+        # decodes every field the record holds -> the dict the Reader returns otherwise
+        if not self._complete:
+            self._values = decode(self._plans.plans[self.e][self.rec_name], self.raw, self.e)
+            self._complete = True
+        return dict(self._values)
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'LazyRecord({!r}, decoded={!r})'.format(self.rec_name, self._values)
@@ -0,0 +1,125 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import mmap
+import struct
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from stdf.stdf_reader import Reader
+from stdf.stdf_compression import detect_compression
+from stdf.stdf_schema import get_schema
+
+CHUNK_SIZE = 8 << 20
+HEADER = {e: struct.Struct(e + 'HBB') for e in '<>'}
+
+log = logging.getLogger('stdf_parallel')
+
+_worker_reader = None
+
+
+def scan_chunks(stdf_file, chunk_size=CHUNK_SIZE):
+    # header-only pass -> (endian, [(start, end), ...]), every chunk starting and ending
+    # on a record boundary and holding about chunk_size bytes
+    if os.path.getsize(stdf_file) == 0:
+        return '<', []
+    if detect_compression(stdf_file) is not None:
+        raise ValueError('{} is compressed and cannot be split into chunks, '
+                         'read it with Reader instead'.format(stdf_file))
+
+    with open(stdf_file, mode='rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        e = '<'
+        unpack = HEADER[e].unpack_from
+        chunks = []
+        start = pos = 0
+
+        while pos + Reader.HEADER_SIZE <= size:
+            rec_len, rec_typ, rec_sub = unpack(mm, pos)
+            if rec_typ == 0 and rec_sub == 10:
+                # FAR: its CPU_TYPE sets the byte order of every following header
+                e = '>' if mm[pos + Reader.HEADER_SIZE] == 1 else '<'
+                unpack = HEADER[e].unpack_from
+                rec_len = Reader.FAR_HEADER[0]
+
+            pos += Reader.HEADER_SIZE + rec_len
+            if pos - start >= chunk_size:
+                chunks.append((start, pos))
+                start = pos
+
+        if start < size:
+            chunks.append((start, max(pos, size)))
+
+    return e, chunks
+
+
+def _init_worker(schema, records, fields):
+    # one Reader per worker process, on the schema compiled by the parent
+    global _worker_reader
+    _worker_reader = Reader(schema, records=records, fields=fields)
+
+
+def _decode_chunk(stdf_file, start, end, e, func):
+    rd = _worker_reader
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    rd.seek(start, e)
+
+    records = []
+    while rd.STDF_IO.tell() < end:
+        r = rd.read_record()
+        if not r or rd.body_start - rd.HEADER_SIZE >= end:
+            # with a record filter the next selected record may lie in the next chunk
+            break
+        records.append(r)
+    rd.close()
+
+    return func(records) if func is not None else records
+
+
+def map_parallel(stdf_file, func=None, workers=None, chunk_size=CHUNK_SIZE,
+                 stdf_ver_json=None, records=None, fields=None):
+    # Decodes stdf_file in chunks over a process pool and yields func(records of one chunk)
+    # for every chunk, in file order; func must be picklable (a module level function).
+    # Reducing in func scales best, as only its result travels back from the workers.
+    e, chunks = scan_chunks(stdf_file, chunk_size)
+    log.info('decoding {} in {} chunks'.format(stdf_file, len(chunks)))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(get_schema(stdf_ver_json), records, fields)) as executor:
+        window = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        chunks = iter(chunks)
+
+        for start, end in chunks:
+            pending.append(executor.submit(_decode_chunk, stdf_file, start, end, e, func))
+            if len(pending) >= window:
+                break
+
+        while pending:
+            result = pending.popleft().result()
+            for start, end in chunks:
+                pending.append(executor.submit(_decode_chunk, stdf_file, start, end, e, func))
+                break
+            yield result
+
+
+def read_parallel(stdf_file, workers=None, chunk_size=CHUNK_SIZE, stdf_ver_json=None, records=None, fields=None):
+    # same (rec_name, header, body) records as iterating a Reader, decoded over a process pool
+    for chunk in map_parallel(stdf_file, None, workers, chunk_size, stdf_ver_json, records, fields):
+        yield from chunk
@@ -0,0 +1,187 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import logging
+
+from stdf.stdf_reader import Reader
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# STDF field type -> arrow type; K arrays become lists of their item type, Vn fields are left out
+ARROW_TYPE = {
+    'U1': 'uint8',
+    'U2': 'uint16',
+    'U4': 'uint32',
+    'U8': 'uint64',
+    'I1': 'int8',
+    'I2': 'int16',
+    'I4': 'int32',
+    'I8': 'int64',
+    'R4': 'float32',
+    'R8': 'float64',
+    'B1': 'uint8',
+    'N1': 'uint8',
+    'C1': 'string',
+    'Cn': 'string',
+    'Sn': 'string',
+    'Bn': 'binary',
+    'Dn': 'binary',
+}
+ROW_GROUP_SIZE = 100000
+
+log = logging.getLogger('stdf_parquet')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError('pyarrow is required for Parquet output, install it with: pip install stdf[parquet]')
+    return pa
+
+
+def _text(value):
+    # Cn/Sn/C1 as decoded (bytes, or 0 when empty) -> str
+    return value.decode('latin-1') if value else ''
+
+
+def _binary(value):
+    # Bn/Dn as decoded (tuple, a single int, or 0 when empty) -> bytes
+    if isinstance(value, int):
+        return bytes((value,)) if value else b''
+    return bytes(value)
+
+
+def field_converter(fmt_raw):
+    # -> function turning a decoded value into what its arrow column holds, None to keep it
+    item = fmt_raw[2:] if fmt_raw.startswith('K') else fmt_raw
+    if ARROW_TYPE[item] == 'string':
+        convert = _text
+    elif ARROW_TYPE[item] == 'binary':
+        convert = _binary
+    else:
+        return None
+
+    if fmt_raw.startswith('K'):
+        return lambda values: [convert(value) for value in values]
+    return convert
+
+
+def arrow_type(fmt_raw):
+    require_pyarrow()
+    if fmt_raw.startswith('K'):
+        return pa.list_(arrow_type(fmt_raw[2:]))
+    return getattr(pa, ARROW_TYPE[fmt_raw])()
+
+
+def table_fields(body_def, fields=None):
+    # -> [(field, fmt_raw)] written for a record type: fields, or all, in record order
+    return [(field, fmt_raw) for field, fmt_raw in body_def
+            if not fmt_raw.startswith('V') and (fields is None or field in fields)]
+
+
+class TableWriter:
+    # Buffers the records of one type as columns and writes them to a Parquet file one
+    # row group at a time, so memory is bounded by row_group_size records.
+
+    def __init__(self, parquet_file, body_def, fields=None, row_group_size=ROW_GROUP_SIZE, compression='snappy'):
+        require_pyarrow()
+        self.parquet_file = parquet_file
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.fields = table_fields(body_def, fields)
+        self.schema = pa.schema([(field, arrow_type(fmt_raw)) for field, fmt_raw in self.fields])
+        self.converters = [(field, field_converter(fmt_raw)) for field, fmt_raw in self.fields]
+        self.rows = 0
+
+        self._columns = {field: [] for field, _ in self.fields}
+        self._buffered = 0
+        self._writer = None
+
+    def add(self, body):
+        get = body.get
+        for field, convert in self.converters:
+            value = get(field)
+            if convert is not None and value is not None:
+                value = convert(value)
+            self._columns[field].append(value)
+
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered and self._writer is not None:
+            return
+
+        table = pa.Table.from_pydict(self._columns, schema=self.schema)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.parquet_file, self.schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+
+        self.rows += self._buffered
+        self._columns = {field: [] for field, _ in self.fields}
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+def to_parquet(stdf_file, out_dir, rec_names=('PTR', 'MPR', 'FTR', 'PRR', 'HBR', 'SBR'), fields=None,
+               row_group_size=ROW_GROUP_SIZE, compression='snappy', stdf_ver_json=None, mode='mmap'):
+    # Converts stdf_file to one Parquet file per record type, out_dir/<rec_name>.parquet,
+    # with column types taken from the record definition. rec_names=None converts every
+    # record type in the file; fields maps rec_name -> field names to keep.
+    # -> {rec_name: (parquet file, rows)}
+    require_pyarrow()
+    fields = fields or {}
+    rd = Reader(stdf_ver_json, records=rec_names, fields=fields)
+    rd.load_stdf_file(stdf_file, mode=mode)
+    os.makedirs(out_dir, exist_ok=True)
+
+    writers = {}
+
+    def table_writer(rec_name):
+        body_def = rd.STDF_TYPE[rec_name]['body']
+        if not table_fields(body_def, fields.get(rec_name)):
+            # e.g. GDR, whose only field is Vn
+            return None
+        return TableWriter(os.path.join(out_dir, rec_name + '.parquet'), body_def, fields.get(rec_name),
+                           row_group_size, compression)
+
+    for rec_name in rec_names or ():
+        writers[rec_name] = table_writer(rec_name)
+
+    for rec_name, header, body in rd:
+        if rec_name not in writers:
+            if rec_name not in rd.STDF_TYPE:
+                continue
+            writers[rec_name] = table_writer(rec_name)
+        writer = writers[rec_name]
+        if writer is not None:
+            writer.add(body)
+
+    writers = {rec_name: writer for rec_name, writer in writers.items() if writer is not None}
+    for writer in writers.values():
+        writer.close()
+    log.info('converted {} to {} Parquet files in {}'.format(stdf_file, len(writers), out_dir))
+
+    return {rec_name: (writer.parquet_file, writer.rows) for rec_name, writer in writers.items()}
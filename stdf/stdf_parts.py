@@ -0,0 +1,168 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import logging
+from array import array
+
+from stdf.stdf_reader import Reader
+
+TEST_RECORDS = ('PTR', 'MPR', 'FTR')
+# fields decoded for part assembly; everything else in these records is stepped over
+PART_FIELDS = {
+    'WIR': ['HEAD_NUM', 'WAFER_ID'],
+    'PIR': ['HEAD_NUM', 'SITE_NUM'],
+    'PTR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG', 'RESULT'],
+    'MPR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG', 'RTN_ICNT', 'RSLT_CNT', 'RTN_RSLT'],
+    'FTR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG'],
+}
+PRR_FIELDS = ('PART_FLG', 'NUM_TEST', 'HARD_BIN', 'SOFT_BIN', 'X_COORD', 'Y_COORD', 'TEST_T', 'PART_ID')
+TEST_FAILED = 0x80
+
+log = logging.getLogger('PartAssembler')
+
+
+class PartAssembler:
+    # Joins the test results between PIR and PRR of every HEAD_NUM/SITE_NUM into one part:
+    #   {'HEAD_NUM', 'SITE_NUM', 'WAFER_ID', <PRR_FIELDS>,
+    #    'results': {TEST_NUM: RESULT (PTR), RTN_RSLT list (MPR) or None (FTR)},
+    #    'failed': [TEST_NUM of results with TEST_FLG bit 7 set]}
+    # Sites may interleave freely; only the parts under test are held in memory.
+    # Results outside a PIR/PRR pair are counted in orphans and dropped.
+
+    def __init__(self, tests=TEST_RECORDS):
+        self.tests = frozenset(tests)
+        self.orphans = 0
+        self._open = {}
+        self._wafer_id = {}
+
+    def add(self, rec_name, body):
+        # -> the finished part on a PRR, else None
+        if rec_name in self.tests:
+            part = self._open.get((body.get('HEAD_NUM'), body.get('SITE_NUM')))
+            if part is None:
+                self.orphans += 1
+                return None
+
+            test_num = body.get('TEST_NUM')
+            if rec_name == 'PTR':
+                part['results'][test_num] = body.get('RESULT')
+            elif rec_name == 'MPR':
+                part['results'][test_num] = body.get('RTN_RSLT', [])
+            else:
+                part['results'][test_num] = None
+            if body.get('TEST_FLG', 0) & TEST_FAILED:
+                part['failed'].append(test_num)
+
+        elif rec_name == 'PIR':
+            head_site = (body['HEAD_NUM'], body['SITE_NUM'])
+            if head_site in self._open:
+                log.warning('PIR of head {}, site {} before the PRR of its previous part'.format(*head_site))
+            self._open[head_site] = {
+                'HEAD_NUM': head_site[0],
+                'SITE_NUM': head_site[1],
+                'WAFER_ID': self._wafer_id.get(head_site[0]),
+                'results': {},
+                'failed': [],
+            }
+
+        elif rec_name == 'PRR':
+            part = self._open.pop((body['HEAD_NUM'], body['SITE_NUM']), None)
+            if part is None:
+                log.warning('PRR of head {}, site {} without a PIR'.format(body['HEAD_NUM'], body['SITE_NUM']))
+                return None
+            for field in PRR_FIELDS:
+                part[field] = body.get(field)
+            return part
+
+        elif rec_name == 'WIR':
+            self._wafer_id[body['HEAD_NUM']] = body.get('WAFER_ID')
+
+        elif rec_name == 'WRR':
+            self._wafer_id.pop(body['HEAD_NUM'], None)
+
+        return None
+
+    def parts(self, records):
+        # records: (rec_name, header, body) or (rec_name, body) tuples -> parts in PRR order
+        add = self.add
+        for r in records:
+            part = add(r[0], r[-1])
+            if part is not None:
+                yield part
+
+        if self._open:
+            log.warning('{} part(s) without a PRR at the end of the records'.format(len(self._open)))
+
+
+def read_parts(stdf_file, tests=TEST_RECORDS, mode='mmap', stdf_ver_json=None):
+    # parts of an STDF file, decoding only the records and fields assembly needs
+    rec_names = ['WIR', 'WRR', 'PIR', 'PRR'] + list(tests)
+    fields = {rec_name: PART_FIELDS[rec_name] for rec_name in rec_names if rec_name in PART_FIELDS}
+    fields['PRR'] = ['HEAD_NUM', 'SITE_NUM'] + list(PRR_FIELDS)
+    fields['WRR'] = ['HEAD_NUM']
+
+    rd = Reader(stdf_ver_json, records=rec_names, fields=fields)
+    rd.load_stdf_file(stdf_file, mode=mode)
+    return PartAssembler(tests).parts(rd)
+
+
+class PartMatrix:
+    # Wide part x test table of scalar results (PTR RESULT), built one part at a time.
+    # Each test column holds (row, value) pairs in arrays until finish().
+
+    def __init__(self, part_fields=('HEAD_NUM', 'SITE_NUM', 'PART_ID', 'X_COORD', 'Y_COORD',
+                                    'HARD_BIN', 'SOFT_BIN')):
+        self.part_fields = part_fields
+        self.rows = 0
+        self._parts = {field: [] for field in part_fields}
+        self._tests = {}
+
+    def add(self, part):
+        row = self.rows
+        for field in self.part_fields:
+            self._parts[field].append(part.get(field))
+
+        for test_num, value in part['results'].items():
+            if isinstance(value, (int, float)):
+                column = self._tests.get(test_num)
+                if column is None:
+                    column = self._tests[test_num] = (array('q'), array('d'))
+                column[0].append(row)
+                column[1].append(value)
+        self.rows += 1
+
+    def finish(self):
+        # -> (part columns {field: list}, sorted TEST_NUMs, numpy matrix parts x tests, NaN where missing)
+        from stdf.stdf_columns import require_numpy
+        np = require_numpy()
+
+        test_nums = sorted(self._tests)
+        matrix = np.full((self.rows, len(test_nums)), np.nan)
+        for j, test_num in enumerate(test_nums):
+            rows, values = self._tests[test_num]
+            matrix[np.frombuffer(rows, dtype=np.int64), j] = np.frombuffer(values, dtype=np.float64)
+        return self._parts, test_nums, matrix
+
+    def to_dataframe(self):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError('pandas is required for to_dataframe, install it with: pip install stdf[pandas]')
+
+        parts, test_nums, matrix = self.finish()
+        df = pd.DataFrame(parts)
+        return df.join(pd.DataFrame(matrix, columns=test_nums))
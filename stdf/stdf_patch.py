@@ -0,0 +1,150 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import struct
+import logging
+
+from stdf.stdf_decoder import OP_FIXED
+from stdf.stdf_schema import get_schema
+from stdf.stdf_raw import RawFile, HEADER_SIZE
+from stdf.stdf_index import KEY_FIELDS, restamp
+
+log = logging.getLogger('stdf_patch')
+
+
+class Patcher:
+    # Overwrites fixed-width fields of records in place, through a writable memory map of a
+    # plain STDF file. Only fields in the leading run of fixed-width fields of a record can be
+    # patched (e.g. MIR STAT_NUM, MODE_COD and the timestamps, PRR HARD_BIN and SOFT_BIN): they
+    # sit at the same body offset in every record, so nothing is decoded and nothing moves.
+
+    def __init__(self, stdf_file, stdf_ver_json=None):
+        self.stdf_file = stdf_file
+        self.schema = get_schema(stdf_ver_json)
+        st = os.stat(stdf_file)
+        self._stamp = (st.st_size, st.st_mtime_ns)
+        self._raw = RawFile(stdf_file, writable=True)
+        self.e = self._raw.e
+        self.patched_fields = set()
+        self._type_of = {rec_name: typ_sub for typ_sub, rec_name in self.schema.rec_name.items()}
+
+    def field_slot(self, rec_name, field):
+        # -> (body offset, Struct) of field; ValueError for fields whose offset depends on a
+        # variable-length field before them
+        if rec_name not in self._type_of:
+            raise ValueError('unknown record type {}'.format(rec_name))
+        body = self.schema.stdf_type[rec_name]['body']
+        if field not in (name for name, _ in body):
+            raise ValueError('{} has no field {}'.format(rec_name, field))
+
+        plan = self.schema.plans[self.e][rec_name]
+        offset = 0
+        if plan and plan[0][0] == OP_FIXED:
+            for name, single in plan[0][3]:
+                if name == field:
+                    return offset, single
+                offset += single.size
+
+        fmt = dict((name, fmt) for name, fmt in body)[field]
+        raise ValueError('{}.{} ({}) cannot be patched in place: only fixed-width fields ahead of the first '
+                         'variable-length field of a record have a fixed offset'.format(rec_name, field, fmt))
+
+    def find(self, rec_name, where=None, limit=None):
+        # header scan -> offsets of the rec_name records whose fields match where
+        # ({field: value}, fields as for patch), stopping at limit records, e.g. 1 for the MIR
+        # at the start of a file
+        typ_sub = self._type_of.get(rec_name)
+        if typ_sub is None:
+            raise ValueError('unknown record type {}'.format(rec_name))
+        slots = [(self.field_slot(rec_name, field), value) for field, value in (where or {}).items()]
+        buf = self._raw.buf
+
+        offsets = []
+        for start, end, rec_typ_sub in self._raw.records():
+            if rec_typ_sub != typ_sub:
+                continue
+            body = start + HEADER_SIZE
+            if all(body + offset + single.size <= end and single.unpack_from(buf, body + offset)[0] == value
+                   for (offset, single), value in slots):
+                offsets.append(start)
+                if len(offsets) == limit:
+                    break
+        return offsets
+
+    def patch(self, rec_name, values, offsets=None, where=None, limit=None):
+        # Sets {field: value} in the rec_name records at offsets (header offsets, e.g. from
+        # RecordIndex.find or Reader.lookup), or else in the rec_name records that find()
+        # returns for where and limit. Every record is checked before the first byte is
+        # written. -> number of records patched
+        if offsets is None:
+            offsets = self.find(rec_name, where, limit)
+        typ_sub = self._type_of.get(rec_name)
+        slots = []
+        for field, value in values.items():
+            offset, single = self.field_slot(rec_name, field)
+            if single.format[-1] == 'c' and isinstance(value, str):
+                value = value.encode('latin-1')
+            try:
+                single.pack(value)
+            except struct.error as err:
+                raise ValueError('{}.{} cannot hold {!r}: {}'.format(rec_name, field, value, err)) from None
+            slots.append((offset, single, value))
+        if not slots:
+            return 0
+
+        buf = self._raw.buf
+        unpack = self._raw.header.unpack_from
+        size = len(buf)
+        last = max(offset + single.size for offset, single, _ in slots)
+        for start in offsets:
+            if start + HEADER_SIZE > size:
+                raise ValueError('no record at offset {} of {}'.format(start, self.stdf_file))
+            rec_len, rec_typ, rec_sub = unpack(buf, start)
+            if (rec_typ, rec_sub) != typ_sub:
+                raise ValueError('the record at offset {} is ({}, {}), not {}'.format(start, rec_typ, rec_sub,
+                                                                                       rec_name))
+            if rec_len < last:
+                raise ValueError('the {} at offset {} is cut short before the patched fields; a record cannot '
+                                 'grow in place'.format(rec_name, start))
+
+        for start in offsets:
+            for offset, single, value in slots:
+                single.pack_into(buf, start + HEADER_SIZE + offset, value)
+
+        self.patched_fields.update(values)
+        log.info('patched {} {} records of {}'.format(len(offsets), rec_name, self.stdf_file))
+        return len(offsets)
+
+    def close(self):
+        self._raw.flush()
+        self._raw.close()
+        if self.patched_fields and not self.patched_fields.intersection(KEY_FIELDS):
+            # records stay where they were, so a sidecar index only goes stale if a key field changed
+            restamp(self.stdf_file, self._stamp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def patch_file(stdf_file, rec_name, values, offsets=None, where=None, limit=None, stdf_ver_json=None):
+    # Patcher.patch on one file. -> number of records patched
+    with Patcher(stdf_file, stdf_ver_json) as patcher:
+        return patcher.patch(rec_name, values, offsets, where, limit)
@@ -0,0 +1,332 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import re
+import mmap
+import struct
+import logging
+
+from stdf.stdf_decoder import OP_FIXED, decode
+from stdf.stdf_schema import get_schema
+from stdf.stdf_compression import detect_compression
+
+HEADER_SIZE = 4
+HEADER = {e: struct.Struct(e + 'HBB') for e in '<>'}
+FAR_TYP_SUB = (0, 10)
+MIR_TYP_SUB = (1, 10)
+MRR_TYP_SUB = (1, 20)
+WIR_TYP_SUB = (2, 10)
+WRR_TYP_SUB = (2, 20)
+# HEAD_NUM of the summary records (HBR, SBR, PCR, TSR, ...) over all heads and sites
+ALL_HEADS = 255
+
+log = logging.getLogger('stdf_raw')
+
+
+def field_offsets(field, stdf_ver_json=None):
+    # -> {(rec_typ, rec_sub): offset of field in the body} for every record type holding field
+    # in its leading run of fixed-width fields, where it can be read without decoding the record
+    schema = get_schema(stdf_ver_json)
+    offsets = {}
+    for typ_sub, rec_name in schema.rec_name.items():
+        plan = schema.plans['<'][rec_name]
+        if not plan or plan[0][0] != OP_FIXED:
+            continue
+        offset = 0
+        for name, single in plan[0][3]:
+            if name == field:
+                offsets[typ_sub] = offset
+                break
+            offset += single.size
+    return offsets
+
+
+class RawFile:
+    # A plain (uncompressed) STDF file mapped read-only, or writable to patch it in place
+    # (see stdf_patch); records() walks its headers and yields (start, end, (rec_typ, rec_sub))
+    # of every record, start being the header offset.
+
+    def __init__(self, stdf_file, writable=False):
+        self.stdf_file = stdf_file
+        size = os.path.getsize(stdf_file)
+        if size and detect_compression(stdf_file) is not None:
+            raise ValueError('{} is compressed, decompress it first to access its records raw'.format(stdf_file))
+
+        self._fp = open(stdf_file, mode='r+b' if writable else 'rb')
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._fp.fileno(), 0, access=access) if size else None
+        self.buf = memoryview(self._map) if size else memoryview(b'')
+
+        # FAR: its CPU_TYPE sets the byte order of every header
+        self.e = '<'
+        if len(self.buf) > HEADER_SIZE and tuple(self.buf[2:4]) == FAR_TYP_SUB and self.buf[HEADER_SIZE] == 1:
+            self.e = '>'
+        self.header = HEADER[self.e]
+
+    def records(self):
+        buf = self.buf
+        size = len(buf)
+        unpack = self.header.unpack_from
+        pos = 0
+
+        while pos + HEADER_SIZE <= size:
+            rec_len, rec_typ, rec_sub = unpack(buf, pos)
+            end = pos + HEADER_SIZE + rec_len
+            if end > size:
+                break
+            yield pos, end, (rec_typ, rec_sub)
+            pos = end
+
+        if pos != size:
+            raise ValueError('{} ends inside the record at offset {}'.format(self.stdf_file, pos))
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        self.buf.release()
+        if self._map is not None:
+            self._map.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RawRouter:
+    # Copies records of a RawFile to output files unchanged. Records sent one after the other
+    # to the same output are written as one slice of the map. Shared records (FAR, MIR, ...)
+    # go to every output, including outputs opened later, which first get all shared records
+    # seen so far.
+
+    SHARED = object()
+
+    def __init__(self, raw):
+        self.buf = raw.buf
+        self.files = {}
+        self.paths = {}
+        self.shared = []
+        self._run = None
+
+    def open(self, key, path, overwrite=True):
+        # without overwrite, an existing file at path raises FileExistsError
+        self._flush()
+        fp = self.files[key] = open(path, mode='wb' if overwrite else 'xb')
+        self.paths[key] = path
+        for start, end in self.shared:
+            fp.write(self.buf[start:end])
+
+    def send(self, key, start, end):
+        run = self._run
+        if run is not None and run[0] == key and run[2] == start:
+            run[2] = end
+        else:
+            self._flush()
+            self._run = [key, start, end]
+
+    def share(self, start, end):
+        self.send(self.SHARED, start, end)
+
+    def _flush(self):
+        if self._run is None:
+            return
+        key, start, end = self._run
+        self._run = None
+        if key is self.SHARED:
+            if self.shared and self.shared[-1][1] == start:
+                self.shared[-1] = (self.shared[-1][0], end)
+            else:
+                self.shared.append((start, end))
+            for fp in self.files.values():
+                fp.write(self.buf[start:end])
+        else:
+            self.files[key].write(self.buf[start:end])
+
+    def close(self):
+        self._flush()
+        for fp in self.files.values():
+            fp.close()
+        self.files = {}
+
+
+def _byte_at(buf, start, end, offset):
+    # U1 field at offset in the body of the record at start, None when absent
+    if offset is None or start + HEADER_SIZE + offset >= end:
+        return None
+    return buf[start + HEADER_SIZE + offset]
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', value) or '_'
+
+
+def _output_path(stdf_file, out_dir, suffix):
+    stem, ext = os.path.splitext(os.path.basename(stdf_file))
+    return os.path.join(out_dir, '{}_{}{}'.format(stem, suffix, ext or '.stdf'))
+
+
+def split(stdf_file, out_dir, by='wafer', overwrite=False, stdf_ver_json=None):
+    # Splits stdf_file into one file per wafer (the records from WIR to WRR of a head) or per
+    # head/site (every record with that HEAD_NUM and SITE_NUM), copying records unchanged.
+    # Records of no wafer, or of no or all (255) heads, such as FAR, MIR, summaries and MRR,
+    # go to every file. Output files are named after stdf_file and the wafer or head/site;
+    # existing ones raise FileExistsError unless overwrite is set.
+    # -> {WAFER_ID or (head, site): output file}
+    if by not in ('wafer', 'site'):
+        raise ValueError("by must be 'wafer' or 'site', not {!r}".format(by))
+    schema = get_schema(stdf_ver_json)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with RawFile(stdf_file) as raw:
+        router = RawRouter(raw)
+        try:
+            if by == 'wafer':
+                _split_wafers(raw, router, schema, out_dir, overwrite)
+            else:
+                _split_sites(raw, router, schema, out_dir, overwrite)
+        finally:
+            router.close()
+
+    log.info('split {} into {} files'.format(stdf_file, len(router.paths)))
+    return router.paths
+
+
+def _split_wafers(raw, router, schema, out_dir, overwrite):
+    # the wafer of a record is the one between WIR and WRR of its HEAD_NUM; records without
+    # HEAD_NUM belong to the wafer in test when there is just one
+    buf, e = raw.buf, raw.e
+    wir_plan = schema.plans[e][schema.rec_name[WIR_TYP_SUB]]
+    head_offsets = field_offsets('HEAD_NUM', schema)
+    wafers = {}
+
+    for start, end, typ_sub in raw.records():
+        head = _byte_at(buf, start, end, head_offsets.get(typ_sub))
+        if typ_sub == WIR_TYP_SUB:
+            wafer_id = decode(wir_plan, buf[start + HEADER_SIZE:end], e).get('WAFER_ID') or b''
+            wafer = wafers[head] = wafer_id.decode('latin-1')
+            if wafer not in router.files:
+                router.open(wafer, _output_path(raw.stdf_file, out_dir, 'wafer_' + _safe_name(wafer)), overwrite)
+        elif typ_sub == WRR_TYP_SUB:
+            wafer = wafers.pop(head, None)
+        elif head is None and len(wafers) == 1:
+            wafer, = wafers.values()
+        else:
+            wafer = wafers.get(head)
+
+        if wafer is None:
+            router.share(start, end)
+        else:
+            router.send(wafer, start, end)
+
+
+def _split_sites(raw, router, schema, out_dir, overwrite):
+    buf = raw.buf
+    head_offsets = field_offsets('HEAD_NUM', schema)
+    site_offsets = field_offsets('SITE_NUM', schema)
+
+    for start, end, typ_sub in raw.records():
+        head = _byte_at(buf, start, end, head_offsets.get(typ_sub))
+        site = _byte_at(buf, start, end, site_offsets.get(typ_sub))
+        if head is None or site is None or head == ALL_HEADS:
+            router.share(start, end)
+            continue
+
+        key = (head, site)
+        if key not in router.files:
+            router.open(key, _output_path(raw.stdf_file, out_dir, 'head{}_site{}'.format(head, site)), overwrite)
+        router.send(key, start, end)
+
+
+def filter_file(stdf_file, output, records=None, heads=None, sites=None, stdf_ver_json=None):
+    # Copies the records of stdf_file whose type is in records (names, None for all) and
+    # whose HEAD_NUM is in heads and SITE_NUM in sites, when they have one, to output
+    # unchanged. FAR is always copied, and so are summaries over all heads (255) of a
+    # selected type. -> number of records copied
+    schema = get_schema(stdf_ver_json)
+    typ_subs = None
+    if records is not None:
+        by_name = {rec_name: typ_sub for typ_sub, rec_name in schema.rec_name.items()}
+        unknown = [rec_name for rec_name in records if rec_name not in by_name]
+        if unknown:
+            raise ValueError('unknown record type(s) {}'.format(unknown))
+        typ_subs = {by_name[rec_name] for rec_name in records} | {FAR_TYP_SUB}
+    head_offsets = field_offsets('HEAD_NUM', schema)
+    site_offsets = field_offsets('SITE_NUM', schema)
+    heads = set(heads) if heads is not None else None
+    sites = set(sites) if sites is not None else None
+
+    n = 0
+    with RawFile(stdf_file) as raw:
+        buf = raw.buf
+        router = RawRouter(raw)
+        router.open('out', output)
+        try:
+            for start, end, typ_sub in raw.records():
+                if typ_subs is not None and typ_sub not in typ_subs:
+                    continue
+                if heads is not None or sites is not None:
+                    head = _byte_at(buf, start, end, head_offsets.get(typ_sub))
+                    if head != ALL_HEADS:
+                        if heads is not None and head is not None and head not in heads:
+                            continue
+                        site = _byte_at(buf, start, end, site_offsets.get(typ_sub))
+                        if sites is not None and site is not None and site not in sites:
+                            continue
+                router.send('out', start, end)
+                n += 1
+        finally:
+            router.close()
+
+    log.info('copied {} records of {} to {}'.format(n, stdf_file, output))
+    return n
+
+
+def merge(inputs, output):
+    # Concatenates STDF files, e.g. a lot and its retests, into output with records unchanged:
+    # the FAR and MIR of the first file, every other record of every file, and the MRR of the
+    # last file. All inputs must have the same byte order. -> number of records written
+    n = 0
+    e = None
+    with open(output, mode='wb') as out:
+        for i, stdf_file in enumerate(inputs):
+            last = i == len(inputs) - 1
+            with RawFile(stdf_file) as raw:
+                if e is not None and raw.e != e:
+                    raise ValueError('{} and {} differ in byte order; records are copied unchanged, so all '
+                                     'merged files must have the same byte order'.format(inputs[0], stdf_file))
+                e = raw.e
+
+                run_start = run_end = 0
+                for start, end, typ_sub in raw.records():
+                    if i and (typ_sub == FAR_TYP_SUB or typ_sub == MIR_TYP_SUB):
+                        continue
+                    if not last and typ_sub == MRR_TYP_SUB:
+                        continue
+                    if start != run_end:
+                        out.write(raw.buf[run_start:run_end])
+                        run_start = start
+                    run_end = end
+                    n += 1
+                out.write(raw.buf[run_start:run_end])
+
+    log.info('merged {} files into {}'.format(len(inputs), output))
+    return n
@@ -15,91 +15,445 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY
 TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE."""
 
-import json
 import io
+import mmap
 import struct
 import logging
-import re
-import math
 from os import path
+from stdf.stdf_decoder import project_plan, decode, field_ends
+from stdf.stdf_columns import ColumnCollector
+from stdf.stdf_index import RecordIndex
+from stdf.stdf_defaults import DefaultsCache
+from stdf.stdf_records import record_classes
+from stdf.stdf_lazy import FieldPlans, LazyRecord
+from stdf.stdf_compression import detect_compression, open_decompressed, ThreadedDecompressor
+from stdf.stdf_recovery import header_follows, find_header
+from stdf.stdf_schema import FMT_MAP, Schema, get_schema
+from stdf.stdf_instrument import Instrument
 
 __author__ = 'cahyo primawidodo 2016'
 
 
 class Reader:
     HEADER_SIZE = 4
-
-    def __init__(self, stdf_ver_json=None):
+    FAR_TYP_SUB = (0, 10)
+    FAR_HEADER = (2, 0, 10)
+    # a big-endian FAR header read before its CPU_TYPE is known; FAR is always 2 bytes long
+    FAR_SWAPPED_HEADER = (0x200, 0, 10)
+    LOAD_MODES = ('memory', 'mmap', 'stream')
+    STREAM_BUFFER_SIZE = 1 << 20
+    BLOCK_SIZE = 64 << 20
+
+    def __init__(self, stdf_ver_json=None, records=None, fields=None, test_defaults=False, record_objects=False,
+                 lazy=False, recover=False, instrument=None, raw=False):
         self.log = logging.getLogger(self.__class__.__name__)
+        self.SCHEMA = None
         self.STDF_TYPE = {}
         self.STDF_IO = io.BytesIO(b'')
         self.REC_NAME = {}
         self.FMT_MAP = {}
+        self.PLANS = {}
+        self.REC_FILTER = None
+        self.REC_FIELDS = {}
+        self.INDEX = None
+        self.TEST_DEFAULTS = None
+        self.REC_CLASS = None
+        self.LAZY_PLANS = None
+        self.RAW = False
+        self.DAMAGE = None
+        self.INSTRUMENT = None
+        self.stdf_file = None
+        self.stdf_ver_json = stdf_ver_json
+        self.load_mode = None
+        self._loaded = False
         self.e = '<'
 
         self.body_start = 0
+        self._stdf_fp = None
+        self._stdf_map = None
+        self._stdf_view = None
 
         self._load_byte_fmt_mapping()
         self._load_stdf_type(json_file=stdf_ver_json)
+        self.select_records(records)
+        self.select_fields(fields)
+        self.use_test_defaults(test_defaults)
+        self.use_record_objects(record_objects)
+        self.use_lazy_records(lazy)
+        self.use_raw_records(raw)
+        self.use_recovery(recover)
+        self.use_instrument(instrument)
 
     def _load_stdf_type(self, json_file):
+        # json_file: a json file name (None for STDF V4), an already loaded record definition
+        # or a Schema; the compiled schema is shared by every Reader and Writer of the process
+        schema = get_schema(json_file)
+        if self.FMT_MAP != schema.fmt_map:
+            # field formats of a subclass
+            schema = Schema(schema.stdf_type, self.FMT_MAP, schema.source)
+
+        self.SCHEMA = schema
+        self.STDF_TYPE = schema.stdf_type
+        self.REC_NAME = dict(schema.rec_name)
+
+        # decoder plans for both byte orders, so FAR can switch endianness for free
+        self.PLANS = schema.plans
+        self._decode_plans = self.PLANS
+        self._drop_fields = {}
+
+    @classmethod
+    def load_stdf_type(cls, json_file=None):
+        return get_schema(json_file).stdf_type
 
-        if json_file is None:
-            here = path.abspath(path.dirname(__file__))
-            input_file = path.join(here, 'stdf_v4.json')
-        else:
-            input_file = json_file
+    def _load_byte_fmt_mapping(self):
+        self.FMT_MAP = dict(FMT_MAP)
+
+    def select_records(self, records):
+        # records: record names and/or (rec_typ, rec_sub) pairs to return, None for all.
+        # Other records are skipped by seeking past REC_LEN, without decoding their body.
+        if records is None:
+            self.REC_FILTER = None
+            return
+
+        rec_filter = set()
+        for rec in records:
+            if isinstance(rec, str):
+                if rec not in self.STDF_TYPE:
+                    raise ValueError('unknown record name {}'.format(rec))
+                rec = (self.STDF_TYPE[rec]['rec_typ'], self.STDF_TYPE[rec]['rec_sub'])
+            rec_filter.add(tuple(rec))
+        self.REC_FILTER = rec_filter
+
+    def select_fields(self, fields):
+        # fields: {rec_name: [field, ...]} to decode only those fields of these records, None for all.
+        # Decoding stops after the last requested field; unwanted fields are stepped over.
+        self.REC_FIELDS = dict(fields or {})
+        self._decode_plans = {e: dict(plans) for e, plans in self.PLANS.items()}
+        self._drop_fields = {}
+
+        for rec_name, rec_fields in self.REC_FIELDS.items():
+            if rec_name not in self.STDF_TYPE:
+                raise ValueError('unknown record name {}'.format(rec_name))
+
+            for e, plans in self._decode_plans.items():
+                plans[rec_name], extra = project_plan(self.PLANS[e][rec_name], rec_fields)
+            if extra:
+                self._drop_fields[rec_name] = extra
+
+        if self.TEST_DEFAULTS is not None:
+            self.use_test_defaults()
+
+    def use_test_defaults(self, enable=True):
+        # fill the limits, units and text a PTR/MPR leaves out (or flags invalid) from the
+        # first record of its test, and share repeated values between records of a test
+        self.TEST_DEFAULTS = DefaultsCache(self.REC_FIELDS) if enable else None
+
+    def use_record_objects(self, enable=True):
+        # return bodies as one generated tuple class per record type (see stdf_records),
+        # with attribute access and None for omitted fields, instead of dicts
+        self.REC_CLASS = record_classes(self.STDF_TYPE) if enable else None
+
+    def use_lazy_records(self, enable=True):
+        # return bodies as LazyRecord handles over the raw record bytes, decoding a field only
+        # when it is read (see stdf_lazy); selected fields, test defaults and record objects
+        # all need the decoded body, so they do not apply to lazy records
+        self.LAZY_PLANS = FieldPlans(self.PLANS) if enable else None
+
+    def use_raw_records(self, enable=True):
+        # return bodies as the record bytes, undecoded (a memoryview of the map in 'mmap' mode);
+        # packed back behind their header they give the original record (see stdf_raw)
+        self.RAW = enable
+
+    def use_recovery(self, enable=True):
+        # salvage what is left of a damaged file, e.g. one cut short by a tester crash: instead
+        # of stopping at the first bad record, skip ahead to the next plausible record header
+        # (see stdf_recovery) and note {'offset', 'resync', 'reason'} of each damaged stretch
+        # in DAMAGE; resync is None when no record follows
+        self.DAMAGE = [] if enable else None
+        self._known_records = self.SCHEMA.known_records
+
+    def use_instrument(self, instrument=True):
+        # count records, bytes and decode time per record type and run hooks around every
+        # record (see stdf_instrument); pass an Instrument to share it, e.g. with a Writer,
+        # or None to turn it off. -> the Instrument in use
+        self.INSTRUMENT = Instrument() if instrument is True else instrument or None
+        return self.INSTRUMENT
+
+    def load_stdf_file(self, stdf_file, mode='memory'):
+        # mode='memory' slurps the file into a BytesIO, 'mmap' decodes records from
+        # zero-copy memoryview slices of a read-only memory map, and 'stream' reads
+        # through a buffered file handle; the last two keep resident memory flat.
+        # gzip, bz2, xz and zip inputs are detected by their magic bytes: 'memory'
+        # decompresses them up front, 'stream' and 'mmap' decompress on a background
+        # thread while records are decoded (forward reading only).
+        if mode not in self.LOAD_MODES:
+            raise ValueError('mode must be one of {}, not {!r}'.format(self.LOAD_MODES, mode))
+
+        self.close()
+        self.e = '<'
+        self.stdf_file = stdf_file
+        self.load_mode = mode
+        self.INDEX = None
+        if self.TEST_DEFAULTS is not None:
+            self.TEST_DEFAULTS.clear()
+        if self.DAMAGE is not None:
+            self.DAMAGE = []
+        self.log.info('opening STDF file = {}, mode = {}'.format(stdf_file, mode))
+
+        compression = detect_compression(stdf_file) if path.getsize(stdf_file) else None
+        if compression is not None:
+            self.log.info('detecting {} compressed STDF file'.format(compression))
+            if mode == 'memory' or self.DAMAGE is not None:
+                # recovery seeks back to look for the next record, which a decompressing
+                # stream cannot do
+                with open_decompressed(stdf_file, compression) as fs:
+                    self.STDF_IO = io.BytesIO(fs.read())
+            else:
+                self._stdf_fp = ThreadedDecompressor(open_decompressed(stdf_file, compression))
+                self.STDF_IO = self._stdf_fp
+            size = path.getsize(stdf_file)
 
-        self.log.info('loading STDF configuration file = {}'.format(input_file))
-        with open(input_file) as fp:
-            self.STDF_TYPE = json.load(fp)
+        elif mode == 'memory':
+            with open(stdf_file, mode='rb') as fs:
+                self.STDF_IO = io.BytesIO(fs.read())
+            size = len(self.STDF_IO.getvalue())
 
-        for k, v in self.STDF_TYPE.items():
-            typ_sub = (v['rec_typ'], v['rec_sub'])
-            self.REC_NAME[typ_sub] = k
+        elif mode == 'stream':
+            self._stdf_fp = open(stdf_file, mode='rb', buffering=self.STREAM_BUFFER_SIZE)
+            self.STDF_IO = self._stdf_fp
+            size = path.getsize(stdf_file)
 
-    def _load_byte_fmt_mapping(self):
-        self.FMT_MAP = {
-            "U1": "B",
-            "U2": "H",
-            "U4": "I",
-            "U8": "Q",
-            "I1": "b",
-            "I2": "h",
-            "I4": "i",
-            "I8": "q",
-            "R4": "f",
-            "R8": "d",
-            "B1": "B",
-            "C1": "c",
-            "N1": "B"
-            }
-
-    def load_stdf_file(self, stdf_file):
-        self.log.info('opening STDF file = {}'.format(stdf_file))
-        with open(stdf_file, mode='rb') as fs:
-            self.STDF_IO = io.BytesIO(fs.read())
-        self.log.info('detecting STDF file size = {}'.format(len(self.STDF_IO.getvalue())))
+        else:
+            self._stdf_fp = open(stdf_file, mode='rb')
+            size = path.getsize(stdf_file)
+            if size:
+                self._stdf_map = mmap.mmap(self._stdf_fp.fileno(), 0, access=mmap.ACCESS_READ)
+                self._stdf_view = memoryview(self._stdf_map)
+                self.STDF_IO = self._stdf_map
+            else:
+                # an empty file cannot be mapped
+                self.STDF_IO = io.BytesIO(b'')
+
+        self.log.info('detecting STDF file size = {}'.format(size))
+        self._loaded = True
+
+    def close(self):
+        self._loaded = False
+        if self._stdf_fp is None:
+            self.STDF_IO.close()
+            return
+
+        if self._stdf_view is not None:
+            self._stdf_view.release()
+            self._stdf_view = None
+
+        if self._stdf_map is not None:
+            try:
+                self._stdf_map.close()
+            except BufferError:
+                # a caller still holds a slice of the map, e.g. a lazy record; it is unmapped
+                # once that is dropped
+                self.log.info('memory map still referenced, leaving it to be garbage collected')
+            self._stdf_map = None
+
+        self._stdf_fp.close()
+        self._stdf_fp = None
+        self.STDF_IO = io.BytesIO(b'')
 
     def read_record(self):
-        header = self._read_and_unpack_header()
+        if self.DAMAGE is not None:
+            return self._read_record_recovering()
+
+        if self.REC_FILTER is None:
+            header = self._read_and_unpack_header()
+        else:
+            header = self._read_selected_header()
 
         if header:
-            rec_size, _, _ = header
-            self.log.debug('BODY start at tell={:0>8}'.format(self.STDF_IO.tell()))
-            body_raw = self._read_body(rec_size)
-            rec_name, body = self._unpack_body(header, body_raw)
-            self.log.debug('BODY end at tell={:0>8}'.format(self.STDF_IO.tell()))
+            if self.INSTRUMENT is not None:
+                return self.INSTRUMENT.read(self, header)
+            return self._read_record(header)
+
+        else:
+            self.log.info('closing STDF_IO at tell={:0>8}'.format(self.STDF_IO.tell()))
+            self.close()
+            return False
+
+    def _read_record(self, header):
+        return self._decode_record(header, self._read_body(header[0]))
 
+    def _decode_record(self, header, body_raw):
+        if self.RAW:
+            rec_name = self.REC_NAME.get((header[1], header[2]), 'UNK')
             if rec_name == 'FAR':
-                self.__set_endian(body['CPU_TYPE'])
+                self.__set_endian(body_raw[0])
+            return rec_name, header, body_raw
 
-            return rec_name, header, body
+        if self.LAZY_PLANS is not None:
+            rec_name = self.REC_NAME.setdefault((header[1], header[2]), 'UNK')
+            if rec_name in self.STDF_TYPE:
+                if rec_name == 'FAR':
+                    self.__set_endian(body_raw[0])
+                return rec_name, header, LazyRecord(rec_name, body_raw, self.e, self.LAZY_PLANS)
+
+        rec_name, body = self._unpack_body(header, body_raw)
+
+        if rec_name == 'FAR':
+            # CPU_TYPE is the first byte, whatever fields were selected
+            self.__set_endian(body_raw[0])
+        elif self.TEST_DEFAULTS is not None and (rec_name == 'PTR' or rec_name == 'MPR'):
+            body = self.TEST_DEFAULTS.apply(rec_name, body)
+
+        if self.REC_CLASS is not None and rec_name in self.REC_CLASS:
+            body = self.REC_CLASS[rec_name].from_body(body)
+
+        return rec_name, header, body
+
+    def _read_record_recovering(self):
+        # read_record() in recovery mode: a header of an unknown record that is not followed by
+        # another record header, a record cut short, a REC_LEN that disagrees with the fields of
+        # the body and a body that does not decode all mark damage, and reading resumes at the
+        # next plausible header
+        read, tell = self.STDF_IO.read, self.STDF_IO.tell
+
+        while True:
+            start = tell()
+            header_raw = read(self.HEADER_SIZE)
+            if not header_raw:
+                break
+            if len(header_raw) < self.HEADER_SIZE:
+                if self._resync(start, 'file ends inside a record header'):
+                    continue
+                break
 
-        else:
-            self.log.info('closing STDF_IO at tell={:0>8}'.format(self.STDF_IO.tell()))
-            self.STDF_IO.close()
+            header = struct.unpack(self.e + 'HBB', header_raw)
+            if header == self.FAR_SWAPPED_HEADER:
+                header = self.FAR_HEADER
+            rec_size, rec_typ, rec_sub = header
+            typ_sub = (rec_typ, rec_sub)
+
+            if typ_sub not in self._known_records and \
+                    not header_follows(self.STDF_IO, start + self.HEADER_SIZE + rec_size, self._known_records, self.e):
+                reason = 'unknown record type {}'.format(typ_sub)
+            else:
+                try:
+                    body_raw = self._read_body(rec_size)
+                except EOFError:
+                    reason = 'file ends inside a record'
+                else:
+                    reason = self._check_length(start, header, body_raw)
+                    if reason is None:
+                        if self.REC_FILTER is not None and typ_sub not in self.REC_FILTER:
+                            if typ_sub == self.FAR_TYP_SUB:
+                                self.__set_endian(body_raw[0])
+                            continue
+                        try:
+                            if self.INSTRUMENT is not None:
+                                return self.INSTRUMENT.decode(self, header, body_raw)
+                            return self._decode_record(header, body_raw)
+                        except (struct.error, IndexError, ValueError) as ex:
+                            reason = 'record {} does not decode: {}'.format(self.REC_NAME.get(typ_sub), ex)
+
+            if not self._resync(start, reason):
+                break
+
+        self.log.info('closing STDF_IO at tell={:0>8}'.format(tell()))
+        self.close()
+        return False
+
+    def _check_length(self, start, header, body_raw):
+        # -> why REC_LEN of the known record at start looks wrong, None when it looks right. A
+        # REC_LEN that took in the next record shows as fields ending short of REC_LEN in front
+        # of a record header, or as a field ending in front of the header of a known record that
+        # ends right at REC_LEN (trailing fields decoded from the record taken in); one running
+        # into other data as fields ending short of REC_LEN with no record header after REC_LEN.
+        rec_size, rec_typ, rec_sub = header
+        rec_name = self.REC_NAME.get((rec_typ, rec_sub))
+        plan = self.PLANS[self.e].get(rec_name)
+        if plan is None:
+            return None
+        try:
+            ends = field_ends(plan, body_raw, self.e)
+        except (struct.error, ValueError) as ex:
+            return 'record {} does not decode: {}'.format(rec_name, ex)
+
+        length = ends[-1] if ends else 0
+        if length < rec_size:
+            if header_follows(self.STDF_IO, start + self.HEADER_SIZE + length, self._known_records, self.e) or \
+                    not header_follows(self.STDF_IO, start + self.HEADER_SIZE + rec_size, self._known_records, self.e):
+                return 'REC_LEN {} of record {} runs past its fields, which end after {} bytes'.format(
+                    rec_size, rec_name, length)
+
+        known = self._known_records
+        last = rec_size - self.HEADER_SIZE
+        for pos in ends:
+            if pos > last:
+                break
+            typ_sub = (body_raw[pos + 2], body_raw[pos + 3])
+            if typ_sub in known and struct.unpack_from(self.e + 'H', body_raw, pos)[0] == last - pos:
+                return 'REC_LEN {} of record {} takes in a {} record at byte {}'.format(
+                    rec_size, rec_name, self.REC_NAME.get(typ_sub), pos)
+        return None
+
+    def _resync(self, offset, reason):
+        # note the damage at offset and continue at the next plausible record header after it
+        resync = find_header(self.STDF_IO, offset + 1, self._known_records, self.e)
+        self.DAMAGE.append({'offset': offset, 'resync': resync, 'reason': reason})
+
+        if resync is None:
+            self.log.warning('damaged STDF data at offset {}: {}, no record follows'.format(offset, reason))
             return False
+        self.log.warning('damaged STDF data at offset {}: {}, resuming at offset {}'.format(offset, reason, resync))
+        self.STDF_IO.seek(resync)
+        return True
+
+    def use_index(self, index_file=None, rebuild=False):
+        # attach the sidecar record index of the loaded file, building it on first use
+        self.INDEX = RecordIndex.open(self.stdf_file, index_file, self.stdf_ver_json, rebuild)
+        return self.INDEX
+
+    def seek(self, offset, endian=None):
+        # continue reading at the record header at offset; endian is the FAR byte order ('<' or '>')
+        # when starting past FAR
+        if endian is not None:
+            self.e = endian
+        self.STDF_IO.seek(offset)
+
+    def _check_random_access(self):
+        # compressed files in 'stream' and 'mmap' mode are decompressed forward only
+        if isinstance(self.STDF_IO, ThreadedDecompressor):
+            raise io.UnsupportedOperation('records of a compressed STDF file can only be looked up '
+                                          "when it is loaded with mode='memory'")
+
+    def read_record_at(self, offset):
+        # decode the single record whose header starts at offset; a file the Reader closed at
+        # its end is opened again, in the same mode
+        if not self._loaded and self.stdf_file is not None:
+            index = self.INDEX
+            self.load_stdf_file(self.stdf_file, self.load_mode)
+            self.INDEX = index
+        self._check_random_access()
+        self.seek(offset, self.INDEX.e if self.INDEX is not None else None)
+        header = self._read_and_unpack_header()
+        if not header:
+            raise EOFError('no record at offset {}'.format(offset))
+        return self._read_record(header)
+
+    def lookup(self, rec_name=None, head_num=None, site_num=None, test_num=None, part_id=None, wafer_id=None):
+        # decode only the records matching every given key, e.g. lookup('PRR', part_id='123456')
+        # or lookup(wafer_id='7'); part_id also matches the records from PIR to PRR of that part
+        self._check_random_access()
+        if self.INDEX is None:
+            self.use_index()
+
+        rec_typ_sub = None
+        if rec_name is not None:
+            if rec_name not in self.STDF_TYPE:
+                raise ValueError('unknown record name {}'.format(rec_name))
+            rec_typ_sub = (self.STDF_TYPE[rec_name]['rec_typ'], self.STDF_TYPE[rec_name]['rec_sub'])
+
+        for offset in self.INDEX.find(rec_typ_sub, head_num, site_num, test_num, part_id, wafer_id):
+            yield self.read_record_at(offset)
 
     def _read_and_unpack_header(self):
         header_raw = self.STDF_IO.read(self.HEADER_SIZE)
@@ -107,133 +461,140 @@ class Reader:
         header = False
         if header_raw:
             header = struct.unpack(self.e + 'HBB', header_raw)
-            rec_name = self.REC_NAME.setdefault((header[1], header[2]), 'UNK')
-            self.log.debug('len={:0>3}, rec={}'.format(header[0], rec_name))
+            if header == self.FAR_SWAPPED_HEADER:
+                header = self.FAR_HEADER
 
         return header
 
     def _read_body(self, rec_size):
         self.body_start = self.STDF_IO.tell()
-        body_raw = io.BytesIO(self.STDF_IO.read(rec_size))
-        assert len(body_raw.getvalue()) == rec_size
+
+        if self._stdf_view is not None:
+            body_raw = self._stdf_view[self.body_start:self.body_start + rec_size]
+            if len(body_raw) != rec_size:
+                raise EOFError('STDF file ends inside a record')
+            self.STDF_IO.seek(self.body_start + rec_size)
+        else:
+            body_raw = self.STDF_IO.read(rec_size)
+            if len(body_raw) != rec_size:
+                raise EOFError('STDF file ends inside a record')
+
         return body_raw
 
+    def _read_selected_header(self):
+        # header of the next record in REC_FILTER; everything else is skipped with a relative seek
+        read, seek = self.STDF_IO.read, self.STDF_IO.seek
+        rec_filter = self.REC_FILTER
+        unpack = struct.Struct(self.e + 'HBB').unpack
+
+        while True:
+            header_raw = read(self.HEADER_SIZE)
+            if not header_raw:
+                return False
+
+            header = unpack(header_raw)
+            if header == self.FAR_SWAPPED_HEADER:
+                header = self.FAR_HEADER
+            typ_sub = (header[1], header[2])
+            if typ_sub in rec_filter:
+                return header
+
+            if typ_sub == self.FAR_TYP_SUB:
+                # FAR still sets the byte order of everything that follows
+                self.__set_endian(self._read_body(header[0])[0])
+                unpack = struct.Struct(self.e + 'HBB').unpack
+            else:
+                seek(header[0], 1)
+
     def _unpack_body(self, header, body_raw):
         rec_len, rec_typ, rec_sub = header
         typ_sub = (rec_typ, rec_sub)
         rec_name = self.REC_NAME.setdefault(typ_sub, 'UNK')
-        max_tell = rec_len
-        odd_nibble = True
-
-        body = {}
-        if rec_name in self.STDF_TYPE:
-            for field, fmt_raw in self.STDF_TYPE[rec_name]['body']:
-                self.log.debug('field={}, fmt_raw={}'.format(field, fmt_raw))
-
-                if fmt_raw == 'N1' and not odd_nibble:
-                    pass
-                elif body_raw.tell() >= max_tell:
-                    break
-
-                array_data = []
-                if fmt_raw.startswith('K'):
-                    mo = re.match('^K([0xn])(\w{2})', fmt_raw)
-                    n = self.__get_multiplier(field, body)
-                    fmt_act = mo.group(2)
-
-                    for i in range(n):
-                        data, odd_nibble = self.__get_data(fmt_act, body_raw, odd_nibble)
-                        array_data.append(data)
-
-                    body[field] = array_data
-                    odd_nibble = True
-
-                elif fmt_raw.startswith('V'):
-                    vn_map = ['B0', 'U1', 'U2', 'U4', 'I1', 'I2',
-                              'I4', 'R4', 'R8', 'Cn', 'Bn', 'Dn', 'N1']
-                    n, = struct.unpack('H', body_raw.read(2))
-
-                    for i in range(n):
-                        idx, = struct.unpack(self.e + 'B', body_raw.read(1))
-                        fmt_vn = vn_map[idx]
-
-                        data, odd_nibble = self.__get_data(fmt_vn, body_raw, odd_nibble)
-                        array_data.append(data)
-
-                    body[field] = array_data
-                    odd_nibble = True
-
-                else:
-                    body[field], odd_nibble = self.__get_data(fmt_raw, body_raw, odd_nibble)
 
+        plan = self._decode_plans[self.e].get(rec_name)
+        if plan is not None:
+            body = decode(plan, body_raw, self.e)
+            if rec_name in self._drop_fields:
+                for field in self._drop_fields[rec_name]:
+                    body.pop(field, None)
         else:
-            self.log.warn('record name={} ({}, {}), not found in self.STDF_TYPE'.format(rec_name, rec_typ, rec_sub))
+            body = {}
+            self.log.warning('record name={} ({}, {}), not found in self.STDF_TYPE'.format(rec_name, rec_typ, rec_sub))
 
-        body_raw.close()
         return rec_name, body
 
-    def __get_data(self, fmt_act, body_raw, odd_nibble):
-        data = 0
-        if fmt_act == 'N1':
-            if odd_nibble:
-                nibble, = struct.unpack(self.e + 'B', body_raw.read(1))
-                _, data = nibble >> 4, nibble & 0xF
-                odd_nibble = False
-            else:
-                body_raw.seek(-1, 1)
-                nibble, = struct.unpack(self.e + 'B', body_raw.read(1))
-                data, _ = nibble >> 4, nibble & 0xF
-                odd_nibble = True
+    def to_arrays(self, rec_names=('PTR', 'MPR', 'FTR'), fields=None):
+        # decode the rest of the loaded file into {rec_name: {field: numpy array}} without
+        # building a dict per record. By default every fixed-width field is returned; fields
+        # maps rec_name -> field names and may also ask for Cn or array fields (object arrays).
+        # Fields a record omitted come back as NaN (floats), 0 (integers) or b'' (C1).
+        fields = fields or {}
+        collectors = {}
+        for rec_name in rec_names:
+            if rec_name not in self.STDF_TYPE:
+                raise ValueError('unknown record name {}'.format(rec_name))
+            plans = {e: self.PLANS[e][rec_name] for e in self.PLANS}
+            collectors[rec_name] = ColumnCollector(rec_name, plans, fields.get(rec_name))
+
+        tail = b''
+        for block in self._iter_blocks():
+            buf = tail + block if tail else block
+            consumed = self._scan_block(buf, collectors)
+            tail = bytes(buf[consumed:])
+            del buf, block
+
+        self.close()
+        if tail:
+            raise EOFError('STDF file ends inside a record')
+
+        return {rec_name: c.finish() for rec_name, c in collectors.items()}
+
+    def to_dataframe(self, rec_name='PTR', fields=None):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError('pandas is required for to_dataframe, install it with: pip install stdf[pandas]')
+
+        arrays = self.to_arrays(rec_names=(rec_name,), fields={rec_name: fields} if fields else None)
+        return pd.DataFrame(arrays[rec_name])
+
+    def _iter_blocks(self):
+        if self._stdf_view is not None:
+            start = self.STDF_IO.tell()
+            self.STDF_IO.seek(0, 2)
+            yield self._stdf_view[start:]
         else:
-            fmt, buf = self.__get_format_and_buffer(fmt_act, body_raw)
-
-            if fmt:
-                d = struct.unpack(fmt, buf)
-                data = d[0] if len(d) == 1 else d
-            odd_nibble = True
-
-        return data, odd_nibble
-
-    def __get_format_and_buffer(self, fmt_raw, body_raw):
-        fmt = self.__get_format(fmt_raw, body_raw)
-        if fmt:
-            size = struct.calcsize(fmt)
-            buf = body_raw.read(size)
-            self.log.debug('fmt={}, buf={}'.format(fmt, buf))
-            return fmt, buf
-        else:
-            return 0, 0
-
-    def __get_format(self, fmt_raw, body_raw):
-        self.log.debug('fmt_raw={}, body_raw={}'.format(fmt_raw, body_raw))
-
-        if fmt_raw in self.FMT_MAP:
-            return self.FMT_MAP[fmt_raw]
-
-        elif fmt_raw == 'Sn':
-            buf = body_raw.read(2)
-            n, = struct.unpack(self.e + 'H', buf)
-            posfix = 's'
-
-        elif fmt_raw == 'Cn':
-            buf = body_raw.read(1)
-            n, = struct.unpack(self.e + 'B', buf)
-            posfix = 's'
-
-        elif fmt_raw == 'Bn':
-            buf = body_raw.read(1)
-            n, = struct.unpack(self.e + 'B', buf)
-            posfix = 'B'
-
-        elif fmt_raw == 'Dn':
-            buf = body_raw.read(2)
-            h, = struct.unpack(self.e + 'H', buf)
-            n = math.ceil(h/8)
-            posfix = 'B'
-        else:
-            raise ValueError(fmt_raw, body_raw.tell(), body_raw.__sizeof__())
+            while True:
+                block = self.STDF_IO.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    def _scan_block(self, buf, collectors):
+        header = struct.Struct(self.e + 'HBB')
+        size = len(buf)
+        pos = 0
+
+        while pos + self.HEADER_SIZE <= size:
+            rec_len, rec_typ, rec_sub = header.unpack_from(buf, pos)
+            if (rec_len, rec_typ, rec_sub) == self.FAR_SWAPPED_HEADER:
+                rec_len = self.FAR_HEADER[0]
+            end = pos + self.HEADER_SIZE + rec_len
+            if end > size:
+                break
+
+            rec_name = self.REC_NAME.get((rec_typ, rec_sub))
+            if rec_name == 'FAR':
+                self.__set_endian(buf[pos + self.HEADER_SIZE])
+                header = struct.Struct(self.e + 'HBB')
+            elif rec_name in collectors:
+                collectors[rec_name].add(buf, pos + self.HEADER_SIZE, end, self.e)
+            pos = end
 
-        return str(n) + posfix if n else ''
+        for c in collectors.values():
+            c.flush(buf, self.e)
+
+        return pos
 
     def __set_endian(self, cpu_type):
         if cpu_type == 1:
@@ -244,53 +605,6 @@ class Reader:
             self.log.critical('Value of FAR: CPU_TYPE is not 1 or 2. Invalid endian.')
             raise IOError(cpu_type)
 
-    @staticmethod
-    def __get_multiplier(field, body):
-        if field == 'SITE_NUM':
-            return body['SITE_CNT']  # SDR (1, 80)
-
-        elif field == 'PMR_INDX':
-            return body['INDX_CNT']  # PGR (1, 62)
-
-        elif field in ['GRP_INDX', 'GRP_MODE', 'GRP_RADX', 'PGM_CHAR', 'RTN_CHAR', 'PGM_CHAL', 'RTN_CHAL']:
-            return body['GRP_CNT']  # PLR (1, 63)
-
-        elif field in ['RTN_INDX', 'RTN_STAT']:
-            return body['RTN_ICNT']  # FTR (15, 20)
-
-        elif field in ['PGM_INDX', 'PGM_STAT']:
-            return body['PGM_ICNT']  # FTR (15, 20)
-
-        elif field in ['RTN_STAT', 'RTN_INDX']:
-            return body['RTN_ICNT']  # MPR (15, 15)
-
-        elif field in ['RTN_RSLT']:
-            return body['RSLT_CNT']  # MPR (15, 15)
-
-        elif field in ['UPD_NAM']:
-            return body['UPD_CNT']  # VUR (0, 30)
-
-        elif field in ["PAT_BGN", "PAT_END", "PAT_FILE", "PAT_FILE", "PAT_LBL", "FILE_UID", "ATPG_DSC", "SRC_ID"]:
-            return body["LOCP_CNT"]  # PSR (1, 90)
-
-        elif field in ["PMR_INDX", "ATPG_NAM"]:
-            return body["LOCM_CNT"]  # NMR (1, 91)
-
-        elif field in ["CHN_LIST"]:
-            return body["CHN_CNT"]  # SSR (1, 93)
-
-        elif field in ["M_CLKS"]:
-            return body["MSTR_CNT"]  # CDR (1, 94)
-
-        elif field in ["S_CLKS"]:
-            return body["SLAV_CNT"]  # CDR (1, 94)
-
-        elif field in ["CELL_LST"]:
-            return body["LST_CNT"]  # CDR (1, 94)
-
-        else:
-            raise ValueError
-
     def __iter__(self):
         return self
 
@@ -0,0 +1,73 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+from collections import namedtuple
+from keyword import iskeyword
+
+
+class RecordBase(tuple):
+    # Shared behaviour of the generated record classes, see record_class
+    __slots__ = ()
+
+    @classmethod
+    def from_body(cls, body):
+        # from a decoded dict body, without going through keyword arguments
+        return tuple.__new__(cls, map(body.get, cls._fields))
+
+    def get(self, field, default=None):
+        # like dict.get: names other than fields (count, index, _fields, ...) give default
+        value = getattr(self, field) if field in self._fields else None
+        return default if value is None else value
+
+    def __reduce__(self):
+        # the classes are generated, so pickle by record name and field names
+        return _rebuild, (self.__class__.__name__, self._fields, tuple(self))
+
+    def to_dict(self):
+        # -> the record as the Reader's dict body: fields the record left out are absent
+        return {field: value for field, value in zip(self._fields, self) if value is not None}
+
+
+_CLASSES = {}
+
+
+def record_class(rec_name, body_def):
+    # One tuple-based class per record type, with a read-only attribute per field and
+    # None for fields a record left out; a record costs one tuple instead of a dict.
+    # A field defined twice decodes to a single dict key, so it gets a single attribute.
+    fields = tuple(dict.fromkeys(field for field, _ in body_def))
+    cls = _CLASSES.get((rec_name, fields))
+    if cls is None:
+        cls = _CLASSES[rec_name, fields] = _make_class(rec_name, fields)
+    return cls
+
+
+def _make_class(rec_name, fields):
+    bad = [field for field in fields if not field.isidentifier() or iskeyword(field) or field.startswith('_')]
+    if bad:
+        raise ValueError('{} has field name(s) {} that cannot be attributes'.format(rec_name, bad))
+
+    base = namedtuple(rec_name + 'Fields', fields, defaults=[None] * len(fields))
+    return type(rec_name, (RecordBase, base), {'__slots__': ()})
+
+
+def record_classes(stdf_type):
+    return {rec_name: record_class(rec_name, v['body']) for rec_name, v in stdf_type.items()}
+
+
+def _rebuild(rec_name, fields, values):
+    return record_class(rec_name, [(field, None) for field in fields])(*values)
@@ -0,0 +1,67 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import struct
+
+HEADER_SIZE = 4
+RESYNC_WINDOW = 64 << 10
+
+_HEADER = {e: struct.Struct(e + 'HBB') for e in '<>'}
+
+
+def header_follows(fp, offset, known, e):
+    # True when offset is the end of the file or holds the header of a known record
+    raw = _peek(fp, offset, HEADER_SIZE)
+    if not raw:
+        return True
+    return len(raw) == HEADER_SIZE and _HEADER[e].unpack(raw)[1:] in known
+
+
+def find_header(fp, start, known, e, window=RESYNC_WINDOW):
+    # -> offset of the first plausible record header at or after start, None when there is
+    # none. Plausible means a known (rec_typ, rec_sub) whose REC_LEN leads to another known
+    # header or exactly to the end of the file. fp must be seekable both ways.
+    unpack = _HEADER[e].unpack_from
+    pos = start
+
+    while True:
+        buf = _peek(fp, pos, window + HEADER_SIZE - 1)
+        if len(buf) < HEADER_SIZE:
+            return None
+
+        for i in range(min(window, len(buf) - HEADER_SIZE + 1)):
+            if (buf[i + 2], buf[i + 3]) not in known:
+                continue
+            rec_len = unpack(buf, i)[0]
+            end = pos + i + HEADER_SIZE + rec_len
+            if len(_peek(fp, end - rec_len, rec_len)) == rec_len and header_follows(fp, end, known, e):
+                return pos + i
+
+        pos += window
+
+
+def _peek(fp, offset, n):
+    # up to n bytes at offset (b'' past the end), leaving the read position of fp as it was
+    here = fp.tell()
+    try:
+        fp.seek(offset)
+    except ValueError:
+        # a memory map cannot seek past its end
+        return b''
+    raw = fp.read(n)
+    fp.seek(here)
+    return raw
@@ -0,0 +1,158 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import os
+import json
+import struct
+import hashlib
+import pickle
+import logging
+
+from stdf.stdf_decoder import OP_FIXED, compile_plans
+
+DEFAULT_JSON = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'stdf_v4.json')
+
+FMT_MAP = {
+    "U1": "B",
+    "U2": "H",
+    "U4": "I",
+    "U8": "Q",
+    "I1": "b",
+    "I2": "h",
+    "I4": "i",
+    "I8": "q",
+    "R4": "f",
+    "R8": "d",
+    "B1": "B",
+    "C1": "c",
+    "N1": "B"
+}
+
+# bump whenever the layout of compiled plans changes, so older cache files are rebuilt
+CACHE_VERSION = 1
+
+log = logging.getLogger('stdf_schema')
+
+_SCHEMAS = {}
+
+
+class Schema:
+    # The record definitions (STDF_TYPE), the (rec_typ, rec_sub) -> rec_name table, the field
+    # format mapping and the decoder plans of both byte orders, compiled once. A Schema is
+    # read-only and shared by every Reader and Writer of a process (see get_schema); it also
+    # pickles, struct formats taking the place of the compiled structs.
+
+    def __init__(self, stdf_type, fmt_map=None, source=None):
+        self.stdf_type = stdf_type
+        self.fmt_map = dict(FMT_MAP if fmt_map is None else fmt_map)
+        self.source = source
+        self.rec_name = {(v['rec_typ'], v['rec_sub']): rec_name for rec_name, v in stdf_type.items()}
+        self.known_records = frozenset(self.rec_name)
+        self.plans = {e: compile_plans(stdf_type, self.fmt_map, e) for e in '<>'}
+
+    @classmethod
+    def from_json(cls, json_file=None, fmt_map=None):
+        json_file = json_file or DEFAULT_JSON
+        log.info('loading STDF configuration file = {}'.format(json_file))
+        with open(json_file) as fp:
+            return cls(json.load(fp), fmt_map, source=_source_stamp(json_file))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['plans'] = _freeze(self.plans)
+        return state
+
+    def __setstate__(self, state):
+        state['plans'] = _thaw(state['plans'])
+        self.__dict__.update(state)
+
+    def save(self, cache_file):
+        with open(cache_file + '.tmp', mode='wb') as fp:
+            pickle.dump((CACHE_VERSION, self), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_file + '.tmp', cache_file)
+
+    @classmethod
+    def load(cls, json_file=None, cache_file=None):
+        # from cache_file, a pickle written by save(), when it is there and was made from
+        # json_file as it is now; otherwise compiled from json_file and, given a cache_file,
+        # saved to it for the next process
+        json_file = json_file or DEFAULT_JSON
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with open(cache_file, mode='rb') as fp:
+                    version, schema = pickle.load(fp)
+                if version == CACHE_VERSION and schema.source == _source_stamp(json_file):
+                    return schema
+                log.info('schema cache {} is out of date, rebuilding it'.format(cache_file))
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as ex:
+                log.warning('cannot read schema cache {}: {}'.format(cache_file, ex))
+
+        schema = cls.from_json(json_file)
+        if cache_file is not None:
+            schema.save(cache_file)
+        return schema
+
+
+def get_schema(stdf_type=None, cache_file=None):
+    # The shared Schema of stdf_type: a Schema is returned as it is, a json file name (None for
+    # the bundled STDF V4 definition) is loaded once per process, and an already loaded dict is
+    # compiled once per definition, keyed on a digest of its contents. The Schema keeps a copy
+    # of the dict, so changing the caller's dict afterwards does not change it.
+    if isinstance(stdf_type, Schema):
+        return stdf_type
+
+    if isinstance(stdf_type, dict):
+        definition = json.dumps(stdf_type, sort_keys=True)
+        key = hashlib.sha1(definition.encode()).hexdigest()
+        schema = _SCHEMAS.get(key)
+        if schema is None:
+            schema = _SCHEMAS[key] = Schema(json.loads(definition))
+        return schema
+
+    json_file = os.path.abspath(stdf_type or DEFAULT_JSON)
+    schema = _SCHEMAS.get(json_file)
+    if schema is None or schema.source != _source_stamp(json_file):
+        schema = _SCHEMAS[json_file] = Schema.load(json_file, cache_file)
+    return schema
+
+
+def _source_stamp(json_file):
+    st = os.stat(json_file)
+    return os.path.abspath(json_file), st.st_size, st.st_mtime_ns
+
+
+def _freeze(plans):
+    # plans with every struct.Struct replaced by its format, which pickles
+    return {e: {rec_name: [(OP_FIXED, step[1].format, step[2], tuple((field, single.format) for field, single in step[3]))
+                           if step[0] == OP_FIXED else step for step in plan]
+                for rec_name, plan in by_name.items()}
+            for e, by_name in plans.items()}
+
+
+def _thaw(plans):
+    structs = {}
+
+    def compiled(fmt):
+        s = structs.get(fmt)
+        if s is None:
+            s = structs[fmt] = struct.Struct(fmt)
+        return s
+
+    return {e: {rec_name: [(OP_FIXED, compiled(step[1]), step[2], tuple((field, compiled(single)) for field, single in step[3]))
+                           if step[0] == OP_FIXED else step for step in plan]
+                for rec_name, plan in by_name.items()}
+            for e, by_name in plans.items()}
@@ -0,0 +1,304 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import math
+
+from stdf.stdf_reader import Reader
+
+# PTR/MPR TEST_FLG bits
+RESULT_INVALID = 0x02
+NOT_EXECUTED = 0x10
+NO_PASS_FAIL = 0x40
+TEST_FAILED = 0x80
+# PTR/MPR OPT_FLAG bits
+LO_LIMIT_INVALID = 0x10
+HI_LIMIT_INVALID = 0x20
+NO_LO_LIMIT = 0x40
+NO_HI_LIMIT = 0x80
+# TSR OPT_FLAG bits: field -> bit set when the field is invalid
+TSR_INVALID = (('TEST_MIN', 0x01), ('TEST_MAX', 0x02), ('TST_SUMS', 0x10), ('TST_SQRS', 0x20))
+ALL = 255
+# TSR TEST_TYP of the tests collected (parametric, multiple-result parametric); FTRs are not
+CHECKED_TEST_TYP = (b'P', b'M')
+
+# fields decoded for statistics; everything else in these records is stepped over
+STATS_FIELDS = {
+    'PTR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG', 'RESULT', 'OPT_FLAG', 'LO_LIMIT', 'HI_LIMIT'],
+    'MPR': ['TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG', 'RTN_RSLT', 'OPT_FLAG', 'LO_LIMIT', 'HI_LIMIT'],
+}
+
+
+class Histogram:
+    # fixed-width bins over [lo, hi), plus the counts below and above
+
+    def __init__(self, lo, hi, bins):
+        self.lo = lo
+        self.hi = hi
+        self.counts = [0] * bins
+        self.under = 0
+        self.over = 0
+
+    def add(self, x):
+        if x < self.lo:
+            self.under += 1
+        elif x >= self.hi:
+            self.over += 1
+        else:
+            self.counts[int((x - self.lo) / (self.hi - self.lo) * len(self.counts))] += 1
+
+    def merge(self, other):
+        if (self.lo, self.hi, len(self.counts)) != (other.lo, other.hi, len(other.counts)):
+            raise ValueError('cannot merge histograms with different bins')
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.under += other.under
+        self.over += other.over
+
+
+class Accumulator:
+    # Running statistics of one test on one head/site, in constant memory: executions,
+    # fails, and min/max/mean/variance of the valid results (Welford's algorithm, merged
+    # with Chan's formula), plus the sum and sum of squares TSR reports.
+
+    def __init__(self, bins=0):
+        self.bins = bins
+        self.executed = 0
+        self.failed = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.lo_limit = None
+        self.hi_limit = None
+        self.histogram = None
+
+    def set_limits(self, lo_limit, hi_limit):
+        # the first limits seen stick, like the defaults of the first PTR of a test
+        if self.lo_limit is None and self.hi_limit is None:
+            self.lo_limit, self.hi_limit = lo_limit, hi_limit
+            if self.bins and lo_limit is not None and hi_limit is not None and hi_limit > lo_limit:
+                self.histogram = Histogram(lo_limit, hi_limit, self.bins)
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.sum += x
+        self.sum_sq += x * x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if self.histogram is not None:
+            self.histogram.add(x)
+
+    def merge(self, other):
+        self.executed += other.executed
+        self.failed += other.failed
+        self.set_limits(other.lo_limit, other.hi_limit)
+
+        n = self.n + other.n
+        if other.n:
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / n
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+            self.n = n
+            self.sum += other.sum
+            self.sum_sq += other.sum_sq
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+
+        if other.histogram is not None:
+            if self.histogram is None:
+                self.histogram = Histogram(other.histogram.lo, other.histogram.hi, len(other.histogram.counts))
+            self.histogram.merge(other.histogram)
+        return self
+
+    @property
+    def stdev(self):
+        # sample standard deviation
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    @property
+    def cpk(self):
+        sigma = self.stdev
+        if not sigma:
+            return None
+        cpk = [(self.hi_limit - self.mean) / (3 * sigma)] if self.hi_limit is not None else []
+        if self.lo_limit is not None:
+            cpk.append((self.mean - self.lo_limit) / (3 * sigma))
+        return min(cpk) if cpk else None
+
+    @property
+    def yield_(self):
+        return 1 - self.failed / self.executed if self.executed else None
+
+    def summary(self):
+        return {
+            'executed': self.executed,
+            'failed': self.failed,
+            'yield': self.yield_,
+            'count': self.n,
+            'min': self.min if self.n else None,
+            'max': self.max if self.n else None,
+            'mean': self.mean if self.n else None,
+            'stdev': self.stdev,
+            'lo_limit': self.lo_limit,
+            'hi_limit': self.hi_limit,
+            'cpk': self.cpk,
+        }
+
+
+class StatsCollector:
+    # Folds PTR/MPR records into one Accumulator per (TEST_NUM, HEAD_NUM, SITE_NUM).
+    # Collectors of different files or processes merge(); totals() sums every test over
+    # its heads and sites, the way a TSR with HEAD_NUM 255 does, once until records are added.
+
+    def __init__(self, bins=0):
+        self.bins = bins
+        self.tests = {}
+        self.limits = {}
+        self._totals = None
+
+    def _accumulator(self, key):
+        acc = self.tests.get(key)
+        if acc is None:
+            acc = self.tests[key] = Accumulator(self.bins)
+        return acc
+
+    def add(self, rec_name, body):
+        if rec_name != 'PTR' and rec_name != 'MPR':
+            return
+
+        self._totals = None
+        get = body.get
+        test_num = get('TEST_NUM')
+        acc = self._accumulator((test_num, get('HEAD_NUM'), get('SITE_NUM')))
+        if acc.lo_limit is None and acc.hi_limit is None:
+            if get('OPT_FLAG') is not None:
+                opt_flag = get('OPT_FLAG')
+                lo = get('LO_LIMIT') if not opt_flag & (NO_LO_LIMIT | LO_LIMIT_INVALID) else None
+                hi = get('HI_LIMIT') if not opt_flag & (NO_HI_LIMIT | HI_LIMIT_INVALID) else None
+                acc.set_limits(lo, hi)
+                self.limits.setdefault(test_num, (lo, hi))
+            elif test_num in self.limits:
+                # limits set by the first record of the test on another head/site
+                acc.set_limits(*self.limits[test_num])
+
+        test_flg = get('TEST_FLG', 0)
+        if test_flg & NOT_EXECUTED:
+            return
+        acc.executed += 1
+        if test_flg & TEST_FAILED and not test_flg & NO_PASS_FAIL:
+            acc.failed += 1
+        if test_flg & RESULT_INVALID:
+            return
+
+        if rec_name == 'PTR':
+            result = get('RESULT')
+            if result is not None:
+                acc.add(result)
+        else:
+            for result in get('RTN_RSLT') or ():
+                acc.add(result)
+
+    def add_records(self, records):
+        # records: (rec_name, header, body) or (rec_name, body) tuples
+        add = self.add
+        for r in records:
+            add(r[0], r[-1])
+        return self
+
+    def merge(self, other):
+        self._totals = None
+        for key, acc in other.tests.items():
+            self._accumulator(key).merge(acc)
+        for test_num, limits in other.limits.items():
+            self.limits.setdefault(test_num, limits)
+        return self
+
+    def totals(self):
+        # -> {TEST_NUM: Accumulator over all heads and sites}; kept until the next add/merge
+        if self._totals is None:
+            totals = {}
+            for (test_num, head_num, site_num), acc in sorted(self.tests.items(), key=_sort_key):
+                totals.setdefault(test_num, Accumulator(self.bins)).merge(acc)
+            self._totals = totals
+        return self._totals
+
+    def summary(self):
+        # -> one dict per test and head/site, sorted
+        return [dict(acc.summary(), TEST_NUM=key[0], HEAD_NUM=key[1], SITE_NUM=key[2])
+                for key, acc in sorted(self.tests.items(), key=_sort_key)]
+
+    def check_tsr(self, tsr, rel_tol=1e-4):
+        # -> [(field, TSR value, computed value)] where a TSR disagrees with the results
+        # seen; TSR min/max/sums are R4, hence the relative tolerance. TSRs of functional
+        # or unknown test types are not checked.
+        if tsr.get('TEST_TYP') not in CHECKED_TEST_TYP:
+            return []
+        if tsr['HEAD_NUM'] == ALL:
+            acc = self.totals().get(tsr['TEST_NUM'])
+        else:
+            acc = self.tests.get((tsr['TEST_NUM'], tsr['HEAD_NUM'], tsr['SITE_NUM']))
+        if acc is None:
+            acc = Accumulator()
+
+        mismatches = []
+        for field, value in (('EXEC_CNT', acc.executed), ('FAIL_CNT', acc.failed)):
+            if field in tsr and tsr[field] != value and tsr[field] != 0xFFFFFFFF:
+                mismatches.append((field, tsr[field], value))
+
+        opt_flag = tsr.get('OPT_FLAG', 0xFF)
+        values = {'TEST_MIN': acc.min, 'TEST_MAX': acc.max, 'TST_SUMS': acc.sum, 'TST_SQRS': acc.sum_sq}
+        for field, bit in TSR_INVALID:
+            if field in tsr and not opt_flag & bit and acc.n:
+                if not math.isclose(tsr[field], values[field], rel_tol=rel_tol, abs_tol=1e-6):
+                    mismatches.append((field, tsr[field], values[field]))
+        return mismatches
+
+
+def _sort_key(item):
+    return tuple(-1 if k is None else k for k in item[0])
+
+
+def collect(records, bins=0):
+    # StatsCollector of records; usable as map_parallel(stdf_file, collect) for big files
+    return StatsCollector(bins).add_records(records)
+
+
+def read_stats(stdf_file, bins=0, mode='mmap', stdf_ver_json=None):
+    # -> (StatsCollector of stdf_file, [(TSR key, field, TSR value, computed value)] for
+    # every TSR field that disagrees with the results in the file)
+    rd = Reader(stdf_ver_json, records=['PTR', 'MPR', 'TSR'], fields=STATS_FIELDS)
+    rd.load_stdf_file(stdf_file, mode=mode)
+
+    stats = StatsCollector(bins)
+    tsrs = []
+    add = stats.add
+    for rec_name, header, body in rd:
+        if rec_name == 'TSR':
+            tsrs.append(body)
+        else:
+            add(rec_name, body)
+
+    mismatches = [((tsr['TEST_NUM'], tsr['HEAD_NUM'], tsr['SITE_NUM']),) + mismatch
+                  for tsr in tsrs for mismatch in stats.check_tsr(tsr)]
+    return stats, mismatches
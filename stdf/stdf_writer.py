@@ -17,15 +17,30 @@ THE SOFTWARE."""
 
 import struct
 import json
-import re
+import logging
+from time import perf_counter
+from stdf.stdf_decoder import OP_FIXED, compile_plan
+from stdf.stdf_encoder import encode, encode_columns, truncate_plan
+from stdf.stdf_instrument import Instrument
+from stdf.stdf_schema import FMT_MAP, get_schema
+
+try:
+    import numpy as np
+    from stdf.stdf_columns import NUMPY_CODE
+except ImportError:
+    np = None
 
 
 class Writer:
+    HEADER_SIZE = 4
 
-    def __init__(self, stdf_type_json='stdf_v4.json'):
+    def __init__(self, stdf_type_json=None):
+        self.SCHEMA = None
         self.STDF_TYPE = {}
         self.REC_NAME = {}
         self.FMT_MAP = {}
+        self.PLANS = {}
+        self.INSTRUMENT = None
         self.load_fmt_mapping()
 
         self.e = '<'
@@ -33,167 +48,247 @@ class Writer:
         self.load_stdf_type(stdf_type_json)
 
     def load_stdf_type(self, json_file):
-        with open(json_file) as fp:
-            self.STDF_TYPE = json.load(fp)
-
-        for k, v in self.STDF_TYPE.items():
-            typ_sub = (v['rec_typ'], v['rec_sub'])
-            self.REC_NAME[typ_sub] = k
+        # json_file: a json file name (None for STDF V4), an already loaded record definition
+        # or a Schema; the compiled schema is shared by every Reader and Writer of the process
+        self.SCHEMA = get_schema(json_file)
+        self.STDF_TYPE = self.SCHEMA.stdf_type
+        self.REC_NAME = self.SCHEMA.rec_name
+        self.PLANS = {}
 
     def load_fmt_mapping(self, json_file=None):
 
         if json_file is None:
-            self.FMT_MAP = {
-                "U1": "B",
-                "U2": "H",
-                "U4": "I",
-                "I1": "b",
-                "I2": "h",
-                "I4": "i",
-                "R4": "f",
-                "R8": "d",
-                "B1": "B",
-                "C1": "c",
-                "N1": "B"
-            }
+            self.FMT_MAP = dict(FMT_MAP)
         else:
             with open(json_file) as fp:
                 self.FMT_MAP = json.load(fp)
-
-    @staticmethod
-    def __get_multiplier(field, body):
-        if field == 'SITE_NUM':
-            return body['SITE_CNT']  # SDR (1, 80)
-
-        elif field == 'PMR_INDX':
-            return body['INDX_CNT']  # PGR (1, 62)
-
-        elif field in ['GRP_INDX', 'GRP_MODE', 'GRP_RADX', 'PGM_CHAR', 'RTN_CHAR', 'PGM_CHAL', 'RTN_CHAL']:
-            return body['GRP_CNT']  # PLR (1, 63)
-
-        elif field in ['RTN_INDX', 'RTN_STAT']:
-            return body['RTN_ICNT']  # FTR (15, 20)
-
-        elif field in ['PGM_INDX', 'PGM_STAT']:
-            return body['PGM_ICNT']  # FTR (15, 20)
-
-        elif field in ['RTN_STAT', 'RTN_INDX']:
-            return body['RTN_ICNT']  # MPR (15, 15)
-
-        elif field in ['RTN_RSLT']:
-            return body['RSLT_CNT']  # MPR (15, 15)
-
-        elif field in ['ARR_R8', 'ARR_I2', 'ARR_U4', 'ARR_U2', 'ARR_I1', 'ARR_U1', 'ARR_ICNT', 'ARR_I4', 'ARR_R4']:
-            return body[0]
-
-        elif field in ['ARR_N1', 'ARR_Cn', 'ARR_Bn']:
-            return body[0]
-
-        else:
-            raise ValueError
-
-    def __construct_body(self, fmt_raw, item, body_data, odd_nibble):
-
-        if fmt_raw == 'N1':
-            if odd_nibble:
-                fmt, dat = self.__translate_nibble(item, odd=True)
-                odd_nibble = False
+        self.PLANS = {}
+
+    def _plan(self, rec_name):
+        # encoder plan of rec_name in the current byte order: the shared schema plan, or one
+        # compiled on first use for field formats of its own
+        key = (self.e, rec_name)
+        plan = self.PLANS.get(key)
+        if plan is None:
+            if self.FMT_MAP == self.SCHEMA.fmt_map:
+                plan = self.SCHEMA.plans[self.e][rec_name]
             else:
-                fmt, dat = self.__translate_nibble(item, odd=False, lsb=body_data.pop())
-                odd_nibble = True
-        else:
-            fmt, dat = self.__translate(fmt_raw, item)
-            odd_nibble = True
+                plan = compile_plan(self.STDF_TYPE[rec_name]['body'], self.FMT_MAP, self.e)
+            self.PLANS[key] = plan
+        return plan
 
-        return fmt, dat, odd_nibble
+    def _pack_header(self, length, rec_name):
+        return struct.pack(self.e + 'HBB', length, self.STDF_TYPE[rec_name]['rec_typ'],
+                           self.STDF_TYPE[rec_name]['rec_sub'])
 
-    @staticmethod
-    def __translate_nibble(item, odd=True, lsb=0):
-        fmt_ret = ''
-        dat_ret = []
-        if odd:
-            fmt_ret = 'B'
-            d = item & 0xF
-            dat_ret.append(d)
+    def use_instrument(self, instrument=True):
+        # count records, bytes and encode time per record type and run hooks around every
+        # record (see stdf_instrument); None turns it off. -> the Instrument in use
+        self.INSTRUMENT = Instrument() if instrument is True else instrument or None
+        return self.INSTRUMENT
 
-        else:
-            d = (item << 4) + lsb
-            dat_ret.append(d)
-
-        return fmt_ret, dat_ret
+    def pack_record(self, rec_name, data):
+        # data maps field -> value; trailing fields may be left out
+        if self.INSTRUMENT is not None:
+            return self.INSTRUMENT.encode(self, rec_name, data)
+        return self._pack_record(rec_name, data)
+
+    def _pack_record(self, rec_name, data):
+        plan = self._plan(rec_name)
+        try:
+            body = encode(plan, data, self.e)
+        except KeyError:
+            key = (self.e, rec_name, tuple(data))
+            if key not in self.PLANS:
+                self.PLANS[key] = truncate_plan(plan, list(data))
+            body = encode(self.PLANS[key], data, self.e)
+        return self._pack_header(len(body), rec_name) + body
+
+    def pack_records(self, rec_name, columns):
+        # Packs many records of one type in one pass: columns maps field -> list or numpy
+        # array of values, one per record; any other value (int, str, tuple, ...) is used
+        # for every record. Trailing fields may be left out and are then omitted from the
+        # records. Records of fixed-width fields only are laid out by numpy, if installed.
+        if self.INSTRUMENT is not None:
+            t0 = perf_counter()
+            packed = self._pack_records(rec_name, columns)
+            n = _record_count(columns)
+            self.INSTRUMENT.add_encoded(rec_name, n, len(packed) - n * self.HEADER_SIZE, perf_counter() - t0)
+            return packed
+        return self._pack_records(rec_name, columns)
+
+    def _pack_records(self, rec_name, columns):
+        n = _record_count(columns)
+        plan = truncate_plan(self._plan(rec_name), list(columns))
+        if np is not None and all(step[0] == OP_FIXED for step in plan):
+            packed = self._pack_fixed_records(rec_name, plan, columns, n)
+            if packed is not None:
+                return packed
+
+        columns = {field: _column(values, n) for field, values in columns.items()}
+        header = struct.Struct(self.e + 'HBB')
+        rec_typ, rec_sub = self.STDF_TYPE[rec_name]['rec_typ'], self.STDF_TYPE[rec_name]['rec_sub']
+        return b''.join(header.pack(len(body), rec_typ, rec_sub) + body
+                        for body in encode_columns(plan, columns, n, self.e))
+
+    def _pack_fixed_records(self, rec_name, plan, columns, n):
+        # -> the records laid out by numpy, None when a column does not fit its field (out of
+        # range, or of another kind), which numpy would wrap or cut where struct raises
+        fields = [(field, single.format[-1]) for step in plan for field, single in step[3]]
+        dtype = np.dtype([('REC_LEN', self.e + 'u2'), ('REC_TYP', 'u1'), ('REC_SUB', 'u1')] +
+                         [(field, self.e + NUMPY_CODE[code]) for field, code in fields])
+
+        values = {field: np.asarray(columns[field]) for field, _ in fields}
+        if not all(_fits(values[field], dtype[field]) for field, _ in fields):
+            return None
+
+        records = np.empty(n, dtype=dtype)
+        records['REC_LEN'] = dtype.itemsize - self.HEADER_SIZE
+        records['REC_TYP'] = self.STDF_TYPE[rec_name]['rec_typ']
+        records['REC_SUB'] = self.STDF_TYPE[rec_name]['rec_sub']
+        for field, _ in fields:
+            records[field] = values[field]
+        return records.tobytes()
 
-    def __translate(self, fmt_raw, item):
-        fmt_ret = ''
-        dat_ret = []
+    def pack_FAR(self):
 
-        if fmt_raw == 'Cn':
-            string, length = item
-            fmt_ret += 'B' + str(length) + 's'
-            dat_ret.append(length)
-            dat_ret.append(string.encode())
+        r = self.pack_record('FAR', {'CPU_TYPE': 2 if self.e == '<' else 1, 'STDF_VER': 4})
+        return r
 
-        elif fmt_raw == 'Bn':
-            length = len(item)
-            fmt_ret += 'B' + str(length) + 'B'
-            dat_ret.append(length)
-            dat_ret.extend(item)
 
+def _record_count(columns):
+    n = None
+    for field, values in columns.items():
+        if isinstance(values, list) or hasattr(values, 'ndim') and values.ndim:
+            if n is not None and len(values) != n:
+                raise ValueError('{} has {} values, expected {}'.format(field, len(values), n))
+            n = len(values)
+    return 1 if n is None else n
+
+
+def _fits(values, dtype):
+    # True when numpy can store values as dtype the way struct would pack them
+    if dtype.kind in 'iu':
+        if values.dtype.kind not in 'biu':
+            return False
+        if values.size and values.dtype.kind != 'b':
+            info = np.iinfo(dtype)
+            return info.min <= values.min() and values.max() <= info.max
+        return True
+    elif dtype.kind == 'f':
+        if values.dtype.kind not in 'biuf':
+            return False
+        if dtype.itemsize < values.dtype.itemsize and values.size:
+            # struct raises OverflowError for finite values beyond the R4 range
+            finite = np.abs(values[np.isfinite(values)])
+            return not finite.size or finite.max() <= np.finfo(dtype).max
+        return True
+    return values.dtype.kind == 'S' and values.dtype.itemsize <= dtype.itemsize
+
+
+def _column(values, n):
+    if hasattr(values, 'tolist') and getattr(values, 'ndim', 0):
+        return values.tolist()
+    elif isinstance(values, list):
+        return values
+    return [values] * n
+
+
+class RecordSink:
+    # Writes STDF records to a file name or binary stream through a Writer. Records are
+    # packed into one bytearray that is written out whenever it holds buffer_size bytes,
+    # and a FAR matching Writer.e is written in front of the first record.
+
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, stdf_file, writer=None, buffer_size=BUFFER_SIZE):
+        self.log = logging.getLogger(self.__class__.__name__)
+        self.writer = writer or Writer()
+        self.buffer_size = buffer_size
+        self.records = 0
+        self.bytes = 0
+
+        if isinstance(stdf_file, (str, bytes)) or hasattr(stdf_file, '__fspath__'):
+            self._fp = open(stdf_file, mode='wb')
+            self._own_fp = True
         else:
-            fmt_ret += self.FMT_MAP[fmt_raw]
-            dat_ret.append(item)
-
-        return fmt_ret, dat_ret
-
-    def _pack_body(self, field_fmt, field_data) -> bytearray:
-        body_fmt = ''
-        body_data = []
-        odd_nibble = True
-
-        for field_name, fmt_raw in field_fmt:
-            item = field_data[field_name]
-
-            if fmt_raw.startswith('K'):
-                mo = re.match('^K([0xn])(\w{2})', fmt_raw)
-                n = self.__get_multiplier(field_name, body_data)
-                fmt_act = mo.group(2)
-
-                for i in range(n):
-
-                    fmt, dat, odd_nibble = self.__construct_body(fmt_act, item[i], body_data, odd_nibble)
-
-                    body_fmt += fmt
-                    body_data.extend(dat)
-
+            self._fp = stdf_file
+            self._own_fp = False
+        self._buf = bytearray()
+        self._far_written = False
+
+    def _far(self):
+        self._buf += self.writer.pack_FAR()
+        self.records += 1
+        self._far_written = True
+
+    def _append(self, data, n=1):
+        if not self._far_written:
+            self._far()
+        self._buf += data
+        self.records += n
+        if len(self._buf) >= self.buffer_size:
+            self.flush()
+
+    def write(self, rec_name, data):
+        # data: {field: value}; a FAR is dropped, as the sink writes its own
+        if not self._far_written:
+            self._far()
+        if rec_name != 'FAR':
+            self._append(self.writer.pack_record(rec_name, data))
+
+    def write_records(self, records):
+        # records: (rec_name, body) or (rec_name, header, body) tuples, e.g. from a Reader; a file
+        # read back keeps its field values, and its bytes in the sink's byte order, except for
+        # Bn/Dn fields holding a single 0x00 byte, which decode to 0 and are written empty, and
+        # Dn fields whose bit count is not a whole number of bytes, which the decoder rounds up
+        pack, append = self.writer.pack_record, self._append
+        if not self._far_written:
+            self._far()
+        for r in records:
+            rec_name, body = r[0], r[-1]
+            if not isinstance(body, dict):
+                # a record object, see Reader.use_record_objects
+                body = body.to_dict()
+            if rec_name == 'FAR':
+                # the sink has written its own
+                continue
+            elif rec_name == 'UNK':
+                self.log.warning('dropping record of unknown type')
             else:
-                fmt, dat, odd_nibble = self.__construct_body(fmt_raw, item, body_data, odd_nibble)
-
-                body_fmt += fmt
-                body_data.extend(dat)
-
-        return body_fmt, body_data
-
-    @staticmethod
-    def _pack_header(length, typ, sub) -> bytearray:
-        header_fmt = 'HBB'
-        header_data = [length, typ, sub]
-        return header_fmt, header_data
-
-    def pack_record(self, rec_name, data):
-
-        mapping = self.STDF_TYPE[rec_name]['body']
-        fmt_b, data_b = self._pack_body(mapping, data)
-
-        rec_len = struct.calcsize('HBB' + fmt_b) - 4
-        rec_typ = self.STDF_TYPE[rec_name]['rec_typ']
-        rec_sub = self.STDF_TYPE[rec_name]['rec_sub']
-        fmt_h, data_h = self._pack_header(rec_len, rec_typ, rec_sub)
-
-        fmt = fmt_h + fmt_b
-        *d, = data_h + data_b
-
-        return struct.pack(self.e + fmt, *d)
-
-    def pack_FAR(self):
-
-        r = self.pack_record('FAR', {'CPU_TYPE': 2, 'STDF_VER': 4})
-        return r
+                append(pack(rec_name, body))
+
+    def write_columns(self, rec_name, columns):
+        # many records of one type, see Writer.pack_records
+        if not self._far_written:
+            self._far()
+        self._append(self.writer.pack_records(rec_name, columns), _record_count(columns))
+
+    def write_raw(self, data, records=0):
+        # already packed records, written as they are
+        self._append(data, records)
+
+    def flush(self):
+        if self._buf:
+            self._fp.write(self._buf)
+            self.bytes += len(self._buf)
+            self._buf.clear()
+        if hasattr(self._fp, 'flush'):
+            self._fp.flush()
+
+    def close(self):
+        if self._fp is None:
+            return
+        if not self._far_written:
+            self._far()
+        self.flush()
+        if self._own_fp:
+            self._fp.close()
+        self._fp = None
+        self.log.info('wrote {} records, {} bytes'.format(self.records, self.bytes))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,85 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import struct
+
+# builders of raw STDF v4 records for the tests; e is the byte order of the file
+
+
+def record(body, rec_typ, rec_sub, e='<'):
+    return struct.pack(e + 'HBB', len(body), rec_typ, rec_sub) + body
+
+
+def cn(value):
+    return bytes([len(value)]) + value
+
+
+def far(e='<'):
+    return record(bytes([2 if e == '<' else 1, 4]), 0, 10, e)
+
+
+def mir(lot_id=b'LOT1', e='<'):
+    # SETUP_T 1, START_T 2, STAT_NUM 3, MODE_COD to CMOD_COD zero
+    return record(struct.pack(e + 'IIB', 1, 2, 3) + b'\x00' * 6 + cn(lot_id), 1, 10, e)
+
+
+def mrr(finish_t=99, e='<'):
+    return record(struct.pack(e + 'I', finish_t), 1, 20, e)
+
+
+def wir(wafer_id, e='<', head=1):
+    return record(struct.pack(e + 'BBI', head, 255, 0) + cn(wafer_id), 2, 10, e)
+
+
+def wrr(wafer_id, e='<', head=1):
+    return record(struct.pack(e + 'BBIIIIII', head, 255, 0, 0, 0, 0, 0, 0) + cn(wafer_id), 2, 20, e)
+
+
+def pir(site, e='<', head=1):
+    return record(bytes([head, site]), 5, 10, e)
+
+
+def ptr(test_num, site=0, result=0.0, test_flg=0, tail=b'', e='<', head=1):
+    return record(struct.pack(e + 'IBBBBf', test_num, head, site, test_flg, 0, result) + tail, 15, 10, e)
+
+
+def prr(site, part_id=None, hard_bin=1, part_flg=0, num_test=1, x=0, y=0, test_t=0, e='<', head=1):
+    body = struct.pack(e + 'BBBHHHhhI', head, site, part_flg, num_test, hard_bin, hard_bin, x, y, test_t)
+    return record(body + (cn(part_id) if part_id is not None else b''), 5, 20, e)
+
+
+def lot(parts=6, sites=1, tests=1, test_txt=None, wafer_id=None, lot_id=b'LOT1', finish_t=99, e='<'):
+    # FAR, MIR (unless lot_id is None), WIR (if wafer_id), then parts spread over the sites in
+    # turn, each a PIR, tests PTRs (TEST_NUM 0.., RESULT part + TEST_NUM / 10) and a PRR
+    # (PART_ID P<part>, odd parts fail into hard bin 2), then WRR and MRR (unless finish_t is None)
+    r = far(e)
+    if lot_id is not None:
+        r += mir(lot_id, e)
+    if wafer_id is not None:
+        r += wir(wafer_id, e)
+    tail = cn(test_txt) if test_txt is not None else b''
+    for p in range(parts):
+        site = p % sites
+        r += pir(site, e)
+        for test_num in range(tests):
+            r += ptr(test_num, site, p + test_num / 10, tail=tail, e=e)
+        r += prr(site, b'P%d' % p, hard_bin=1 + p % 2, part_flg=0x08 if p % 2 else 0, num_test=tests, x=p, e=e)
+    if wafer_id is not None:
+        r += wrr(wafer_id, e)
+    if finish_t is not None:
+        r += mrr(finish_t, e)
+    return r
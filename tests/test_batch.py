@@ -0,0 +1,74 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import json
+import os
+from stdf.stdf_batch import find_stdf_files, ingest
+from tests.helpers import lot
+
+
+@pytest.fixture()
+def lot_dir(tmp_path):
+    d = tmp_path / 'lots'
+    d.mkdir()
+    (d / 'a.stdf').write_bytes(lot(4, finish_t=None))
+    (d / 'b.std').write_bytes(lot(6, finish_t=None))
+    (d / 'bad.stdf').write_bytes(b'\x10\x00\x00\x0a\x02')
+    (d / 'notes.txt').write_bytes(b'')
+    return str(d)
+
+
+def test_find_stdf_files(lot_dir):
+    names = [os.path.basename(f) for f in find_stdf_files(lot_dir)]
+    assert names == ['a.stdf', 'b.std', 'bad.stdf']
+
+    names = [os.path.basename(f) for f in find_stdf_files(os.path.join(lot_dir, 'a*'))]
+    assert names == ['a.stdf']
+
+
+def test_ingest_summary(lot_dir, tmp_path):
+    out_dir = str(tmp_path / 'out')
+    progress = []
+    results = {os.path.basename(r['file']): r for r in
+               ingest(lot_dir, out_dir=out_dir, workers=2, progress=lambda r, done, total: progress.append(total))}
+
+    assert progress == [3, 3, 3]
+    assert 'ends inside a record' in results['bad.stdf']['error']
+
+    a = results['a.stdf']
+    assert a['error'] is None
+    assert a['records'] == 2 + 3 * 4
+    assert a['summary']['mir']['LOT_ID'] == 'LOT1'
+    assert a['summary']['parts'] == 4
+    assert a['summary']['good_parts'] == 2
+    assert a['summary']['hard_bins'] == {'1': 2, '2': 2}
+
+    with open(a['output']) as fp:
+        assert json.load(fp)['records'] == {'FAR': 1, 'MIR': 1, 'PIR': 4, 'PTR': 4, 'PRR': 4}
+    assert results['b.std']['summary']['parts'] == 6
+
+
+def test_ingest_arrays(lot_dir, tmp_path):
+    np = pytest.importorskip('numpy')
+    out_dir = str(tmp_path / 'out')
+    results = {os.path.basename(r['file']): r for r in
+               ingest(lot_dir, output='arrays', out_dir=out_dir, rec_names=('PTR',), workers=1)}
+
+    assert results['b.std']['records'] == 6
+    with np.load(results['b.std']['output']) as arrays:
+        assert list(arrays['PTR.RESULT']) == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,54 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+from collections import Counter
+from stdf.stdf_reader import Reader
+from benchmarks.generate import generate_lot
+from benchmarks.bench import compare, run_benchmarks
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_generate_lot(tmp_path, e):
+    f = str(tmp_path / 'lot.stdf')
+    counts = generate_lot(f, parts=10, sites=4, ptr_tests=3, mpr_tests=2, ftr_tests=1, mpr_pins=3, endian=e)
+
+    rd = Reader()
+    rd.load_stdf_file(f)
+    records = list(rd)
+    assert rd.e == e
+    assert Counter(rec_name for rec_name, _, _ in records) == dict(counts, FAR=1)
+    assert counts['PTR'] == 30 and counts['MPR'] == 20 and counts['FTR'] == 10 and counts['PRR'] == 10
+
+    ptrs = [body for rec_name, _, body in records if rec_name == 'PTR']
+    assert [body['SITE_NUM'] for body in ptrs[:4]] == [0, 1, 2, 3]
+    assert 'HI_LIMIT' in ptrs[0] and 'HI_LIMIT' not in ptrs[-1]
+    mpr = next(body for rec_name, _, body in records if rec_name == 'MPR')
+    assert len(mpr['RTN_RSLT']) == 3
+
+
+def test_run_benchmarks(tmp_path):
+    f = str(tmp_path / 'lot.stdf')
+    generate_lot(f, parts=8, ptr_tests=5)
+
+    results = run_benchmarks(f, ['read_memory', 'census'], repeat=1)
+    assert results['read_memory']['records'] == results['census']['records']
+
+    slower = dict(results['census'], records_per_s=results['census']['records_per_s'] // 2)
+    assert compare({'census': slower}, results) == ['census: {} records/s, baseline {}'.format(
+        slower['records_per_s'], results['census']['records_per_s'])]
+    assert compare(results, results) == []
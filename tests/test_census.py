@@ -0,0 +1,93 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import gzip
+import json
+from stdf.stdf_census import census
+from stdf.stdf_cli import main
+from tests.helpers import lot as make_lot, prr
+
+
+def lot(e='<', finish_t=99):
+    return make_lot(parts=6, sites=3, wafer_id=b'W1', finish_t=finish_t, e=e)
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_census(tmp_path, e):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot(e))
+
+    result = census(str(f))
+    assert result['endian'] == ('little' if e == '<' else 'big')
+    assert result['records'] == {'FAR': 1, 'MIR': 1, 'MRR': 1, 'WIR': 1, 'WRR': 1, 'PIR': 6, 'PRR': 6, 'PTR': 6}
+    assert result['parts'] == 6
+    assert result['good_parts'] == 3
+    assert result['sites'] == [(1, 0), (1, 1), (1, 2)]
+    assert result['wafers'] == ['W1']
+    assert result['lot_id'] == 'LOT1'
+    assert result['start_t'] == 2
+    assert result['finish_t'] == 99
+    assert result['complete'] and not result['truncated']
+    assert result['end_offset'] == result['size']
+
+
+def test_census_gzip(tmp_path):
+    f = tmp_path / 'lot.stdf.gz'
+    f.write_bytes(gzip.compress(lot('>')))
+    plain = tmp_path / 'lot.stdf'
+    plain.write_bytes(lot('>'))
+
+    result = census(str(f))
+    expected = census(str(plain))
+    assert result.pop('size') != expected.pop('size')
+    assert result.pop('file') != expected.pop('file')
+    assert result == expected
+
+
+@pytest.mark.parametrize('cut', [2, 7])
+def test_census_truncated(tmp_path, cut):
+    data = make_lot(parts=6, sites=3, finish_t=None)
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(data[:-cut])
+
+    result = census(str(f))
+    assert result['truncated'] and not result['complete']
+    assert result['parts'] == 5
+    assert result['end_offset'] == len(data) - len(prr(2, b'P5'))
+
+
+def test_census_empty(tmp_path):
+    f = tmp_path / 'empty.stdf'
+    f.write_bytes(b'')
+
+    result = census(str(f))
+    assert result['records'] == {}
+    assert not result['truncated'] and not result['complete']
+
+
+def test_cli_census(tmp_path, capsys):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+
+    assert main(['census', '--json', str(f)]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result['records']['PTR'] == 6
+
+    f.write_bytes(lot()[:-3])
+    assert main(['census', str(f)]) == 1
+    assert 'truncated' in capsys.readouterr().out
@@ -0,0 +1,93 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+from stdf.stdf_reader import Reader
+from tests.helpers import record, cn, far, ptr
+
+np = pytest.importorskip('numpy')
+
+
+def limits_ptr(test_num, result, e='<'):
+    # TEST_TXT vdd, no ALARM_ID, LO_LIMIT 1.0, HI_LIMIT 2.0
+    return ptr(test_num, 2, result, tail=cn(b'vdd') + cn(b'') + struct.pack(e + 'Bbbbff', 0, 0, 0, 0, 1.0, 2.0), e=e)
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    r = far()
+    r += limits_ptr(100, 1.5) + limits_ptr(101, 2.5)
+    r += ptr(102, 3, 3.5)
+    r += record(struct.pack('<IBBBBHH', 7, 1, 0, 0, 0, 3, 2) + bytes([0x21, 0x03]) +
+                struct.pack('<2f', 1.5, 2.5) + bytes([3]) + b'mpr' + bytes([0, 0, 0, 0, 0]) +
+                struct.pack('<ff', -1.0, 1.0), 15, 15)
+    f = tmp_path / 'columns.stdf'
+    f.write_bytes(r)
+    return str(f)
+
+
+@pytest.mark.parametrize('mode', ['memory', 'mmap', 'stream'])
+def test_ptr_columns(stdf_file, mode):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode=mode)
+    ptr_cols = rd.to_arrays(rec_names=('PTR',))['PTR']
+
+    assert ptr_cols['TEST_NUM'].dtype == np.uint32
+    assert ptr_cols['TEST_NUM'].tolist() == [100, 101, 102]
+    assert ptr_cols['SITE_NUM'].tolist() == [2, 2, 3]
+    assert ptr_cols['RESULT'].tolist() == [1.5, 2.5, 3.5]
+    assert ptr_cols['LO_LIMIT'][:2].tolist() == [1.0, 1.0]
+    assert np.isnan(ptr_cols['LO_LIMIT'][2])
+    assert 'TEST_TXT' not in ptr_cols
+
+
+def test_requested_fields(stdf_file):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file)
+    cols = rd.to_arrays(fields={'PTR': ['RESULT', 'TEST_TXT'],
+                                'MPR': ['RTN_STAT', 'RTN_RSLT', 'HI_LIMIT']})
+
+    assert list(cols['PTR']) == ['RESULT', 'TEST_TXT']
+    assert cols['PTR']['TEST_TXT'].tolist() == [b'vdd', b'vdd', None]
+    assert cols['MPR']['RTN_STAT'][0] == [1, 2, 3]
+    assert cols['MPR']['RTN_RSLT'][0] == [1.5, 2.5]
+    assert cols['MPR']['HI_LIMIT'].tolist() == [1.0]
+    assert len(cols['FTR']['TEST_NUM']) == 0
+
+
+def test_big_endian(tmp_path):
+    r = record(bytes([1, 4]), 0, 10)
+    r = struct.pack('<H', 2) + r[2:]  # FAR is always read before the byte order is known
+    r += limits_ptr(100, 1.5, '>') + limits_ptr(70000, -2.5, '>')
+    f = tmp_path / 'big_endian.stdf'
+    f.write_bytes(r)
+
+    rd = Reader()
+    rd.load_stdf_file(str(f))
+    cols = rd.to_arrays(rec_names=('PTR',))['PTR']
+
+    assert cols['TEST_NUM'].tolist() == [100, 70000]
+    assert cols['RESULT'].tolist() == [1.5, -2.5]
+
+
+def test_unknown_field(stdf_file):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file)
+
+    with pytest.raises(ValueError):
+        rd.to_arrays(fields={'PTR': ['NOT_A_FIELD']})
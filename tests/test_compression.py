@@ -0,0 +1,109 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import io
+import gzip
+import bz2
+import lzma
+import zipfile
+from stdf.stdf_reader import Reader
+from stdf.stdf_compression import detect_compression, ThreadedDecompressor
+from tests.helpers import lot as make_lot
+
+
+def lot():
+    return make_lot(parts=20, tests=3, test_txt=b'ok', lot_id=None, finish_t=None)
+
+
+def write_zip(f, members):
+    with zipfile.ZipFile(str(f), mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+
+@pytest.fixture(params=['gzip', 'bz2', 'xz', 'zip'])
+def compressed(request, tmp_path):
+    data = lot()
+    f = tmp_path / 'lot.stdf.compressed'
+    if request.param == 'zip':
+        write_zip(f, {'lot.stdf': data})
+    else:
+        f.write_bytes({'gzip': gzip, 'bz2': bz2, 'xz': lzma}[request.param].compress(data))
+    return request.param, str(f), data
+
+
+def serial(data, **kwargs):
+    rd = Reader(**kwargs)
+    rd.STDF_IO = io.BytesIO(data)
+    return list(rd)
+
+
+@pytest.mark.parametrize('mode', Reader.LOAD_MODES)
+def test_read_compressed(compressed, mode):
+    compression, stdf_file, data = compressed
+    assert detect_compression(stdf_file) == compression
+
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode=mode)
+    assert list(rd) == serial(data)
+
+
+def test_read_compressed_selected_records(compressed):
+    _, stdf_file, data = compressed
+
+    rd = Reader(records=['PRR'])
+    rd.load_stdf_file(stdf_file, mode='stream')
+    assert list(rd) == serial(data, records=['PRR'])
+
+
+def test_zip_needs_single_stdf(tmp_path):
+    f = tmp_path / 'lots.zip'
+    write_zip(f, {'a.stdf': lot(), 'b.stdf': lot(), 'readme.txt': b''})
+
+    with pytest.raises(ValueError):
+        Reader().load_stdf_file(str(f))
+
+    write_zip(f, {'a.stdf': lot(), 'readme.txt': b''})
+    rd = Reader()
+    rd.load_stdf_file(str(f))
+    assert len(list(rd)) == 1 + 20 * 5
+
+
+def test_threaded_decompressor():
+    data = bytes(range(256)) * 40
+    fp = ThreadedDecompressor(io.BytesIO(data), chunk_size=100, queue_size=2)
+
+    assert fp.read(4) == data[:4]
+    assert fp.read(250) == data[4:254]
+    fp.seek(10, io.SEEK_CUR)
+    assert fp.tell() == 264
+    assert fp.read(1) == data[264:265]
+    fp.seek(5000)
+    assert fp.read() == data[5000:]
+    assert fp.read(4) == b''
+
+    with pytest.raises(io.UnsupportedOperation):
+        fp.seek(0)
+    fp.close()
+
+
+def test_threaded_decompressor_close_early():
+    fp = ThreadedDecompressor(io.BytesIO(bytes(10000)), chunk_size=10, queue_size=1)
+    assert fp.read(3) == bytes(3)
+    fp.close()
+    assert fp.closed
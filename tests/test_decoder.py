@@ -0,0 +1,95 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+import io
+from stdf.stdf_reader import Reader
+from stdf.stdf_decoder import OP_FIXED, OP_CN, OP_SKIP, decode, project_plan
+
+
+@pytest.fixture()
+def rd():
+    return Reader()
+
+
+def test_fixed_runs_are_merged(rd):
+    plan = rd.PLANS['<']['PTR']
+
+    assert [step[0] for step in plan[:2]] == [OP_FIXED, OP_CN]
+    assert plan[0][2] == ('TEST_NUM', 'HEAD_NUM', 'SITE_NUM', 'TEST_FLG', 'PARM_FLG', 'RESULT')
+    assert plan[0][1].format == '<IBBBBf'
+
+
+def test_decode_ptr_omitted_trailing_fields(rd):
+    plan = rd.PLANS['<']['PTR']
+
+    body = decode(plan, struct.pack('<IBBBBfB3s', 3, 1, 0, 0, 0, 4.25, 3, b'abc'), '<')
+    assert body == {'TEST_NUM': 3, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'PARM_FLG': 0,
+                    'RESULT': 4.25, 'TEST_TXT': b'abc'}
+
+    body = decode(plan, struct.pack('<IBB', 3, 1, 2), '<')
+    assert body == {'TEST_NUM': 3, 'HEAD_NUM': 1, 'SITE_NUM': 2}
+
+
+def test_decode_mpr_arrays_big_endian(rd):
+    plan = rd.PLANS['>']['MPR']
+    raw = struct.pack('>IBBBBHH', 7, 1, 0, 0, 0, 3, 2) + bytes([0x21, 0x03]) + struct.pack('>2f', 1.5, 2.5)
+
+    body = decode(plan, raw, '>')
+    assert body['TEST_NUM'] == 7
+    assert body['RTN_STAT'] == [1, 2, 3]
+    assert body['RTN_RSLT'] == [1.5, 2.5]
+    assert 'TEST_TXT' not in body
+
+
+def test_decode_field_cut_short(rd):
+    plan = rd.PLANS['<']['PTR']
+
+    with pytest.raises(struct.error):
+        decode(plan, struct.pack('<IBBBBfB', 3, 1, 0, 0, 0, 4.25, 5) + b'ab', '<')
+
+
+def test_project_ptr(rd):
+    plan, extra = project_plan(rd.PLANS['<']['PTR'], ['TEST_NUM', 'SITE_NUM', 'RESULT'])
+
+    assert len(plan) == 1
+    assert plan[0][1].format == '<IxBxxf'
+    assert extra == ()
+
+    body = decode(plan, struct.pack('<IBBBBfB3s', 3, 1, 2, 0, 0, 4.25, 3, b'abc'), '<')
+    assert body == {'TEST_NUM': 3, 'SITE_NUM': 2, 'RESULT': 4.25}
+
+
+def test_project_skips_arrays():
+    rd = Reader(fields={'MPR': ['TEST_NUM', 'UNITS']})
+    plan = rd._decode_plans['<']['MPR']
+    assert [step[0] for step in plan[1:5]] == [OP_SKIP, OP_SKIP, OP_SKIP, OP_SKIP]
+
+    raw = struct.pack('<IBBBBHH', 7, 1, 0, 0, 0, 3, 2) + bytes([0x21, 0x03]) + struct.pack('<2f', 1.5, 2.5)
+    raw += bytes([3]) + b'mpr' + bytes([0, 0, 0, 0, 0]) + struct.pack('<ffff', -1.0, 1.0, 0, 0)
+    raw += struct.pack('<3H', 1, 2, 3) + bytes([1]) + b'V'
+    rd.STDF_IO = io.BytesIO(struct.pack('<HBB', len(raw), 15, 15) + raw)
+
+    rec_name, _, body = rd.read_record()
+    assert rec_name == 'MPR'
+    assert body == {'TEST_NUM': 7, 'UNITS': b'V'}
+
+
+def test_project_unknown_field(rd):
+    with pytest.raises(ValueError):
+        rd.select_fields({'PTR': ['NOT_A_FIELD']})
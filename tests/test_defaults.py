@@ -0,0 +1,105 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+import io
+from stdf.stdf_reader import Reader
+from stdf.stdf_defaults import DefaultsCache
+from tests.helpers import cn, far, ptr
+
+
+FIRST = cn(b'vdd') + cn(b'') + struct.pack('<BbbbffB', 0x0E, 0, 0, 0, 0.5, 1.5, 1) + b'V' + \
+    cn(b'') + cn(b'') + cn(b'')
+
+
+def lot():
+    r = far()
+    r += ptr(100, 0, 1.0, tail=FIRST)
+    r += ptr(100, 0, 1.1)
+    r += ptr(100, 1, 1.2, tail=cn(b'') + cn(b'') + struct.pack('<BbbbffB', 0x0E | 0x20, 0, 0, 0, 0.25, 99.0, 0))
+    r += ptr(100, 0, 1.3, tail=cn(b'vdd') + cn(b'') + struct.pack('<Bbbbff', 0x0E, 0, 0, 0, 0.5, 2.0))
+    return r
+
+
+def read(**kwargs):
+    rd = Reader(**kwargs)
+    rd.STDF_IO = io.BytesIO(lot())
+    return [body for rec_name, _, body in rd if rec_name == 'PTR']
+
+
+def test_defaults_off():
+    bodies = read()
+    assert 'LO_LIMIT' not in bodies[1]
+
+
+def test_fill_defaults():
+    first, omitted, invalid, changed = read(test_defaults=True)
+
+    assert omitted['TEST_TXT'] == b'vdd'
+    assert omitted['LO_LIMIT'] == 0.5
+    assert omitted['HI_LIMIT'] == 1.5
+    assert omitted['UNITS'] == b'V'
+    assert omitted['TEST_TXT'] is first['TEST_TXT']
+
+    # site 1 falls back to the definition of the test on site 0
+    assert invalid['TEST_TXT'] == b'vdd'
+    assert invalid['LO_LIMIT'] == 0.25
+    assert invalid['HI_LIMIT'] == 1.5
+    assert invalid['UNITS'] == b'V'
+
+    assert changed['HI_LIMIT'] == 2.0
+    assert changed['UNITS'] == b'V'
+    assert changed['TEST_TXT'] is first['TEST_TXT']
+
+
+def test_opt_flag_no_limit():
+    r = far()
+    # the first record has no high limit, whatever its HI_LIMIT holds
+    r += ptr(7, 0, 1.0, tail=cn(b'') + cn(b'') + struct.pack('<Bbbbff', 0x0E | 0x80, 0, 3, 6, 0.5, 99.0))
+    r += ptr(7, 0, 1.1)
+    # no low limit, the rest from the first record
+    r += ptr(7, 0, 1.2, tail=cn(b'') + cn(b'') + bytes([0x0E | 0x40]))
+    # the limits invalid: the low limit and its scaling come from the first record, which has
+    # no high limit to offer, so the record's own stay
+    r += ptr(7, 0, 1.3, tail=cn(b'') + cn(b'') + struct.pack('<Bbbbff', 0x0E | 0x30, 0, 9, 9, 7.0, 8.0))
+    rd = Reader(test_defaults=True)
+    rd.STDF_IO = io.BytesIO(r)
+    first, omitted, no_low, invalid = [body for rec_name, _, body in rd if rec_name == 'PTR']
+
+    assert first['HI_LIMIT'] == 99.0
+    assert (omitted['LO_LIMIT'], omitted['LLM_SCAL']) == (0.5, 3)
+    assert 'HI_LIMIT' not in omitted and 'HLM_SCAL' not in omitted
+    assert 'LO_LIMIT' not in no_low and 'LLM_SCAL' not in no_low
+    assert 'HI_LIMIT' not in no_low
+    assert (invalid['LO_LIMIT'], invalid['LLM_SCAL']) == (0.5, 3)
+    assert (invalid['HI_LIMIT'], invalid['HLM_SCAL']) == (8.0, 9)
+
+
+def test_fill_defaults_selected_fields():
+    bodies = read(test_defaults=True, fields={'PTR': ['TEST_NUM', 'SITE_NUM', 'RESULT', 'LO_LIMIT']})
+
+    assert bodies[1] == {'TEST_NUM': 100, 'SITE_NUM': 0, 'RESULT': pytest.approx(1.1), 'LO_LIMIT': 0.5}
+
+
+def test_definition():
+    cache = DefaultsCache()
+    cache.apply('PTR', {'TEST_NUM': 5, 'HEAD_NUM': 1, 'SITE_NUM': 2, 'LO_LIMIT': 1.0})
+
+    assert cache.definition('PTR', 5, 1, 2) == {'LO_LIMIT': 1.0}
+    assert cache.definition('PTR', 5) == {'LO_LIMIT': 1.0}
+    assert cache.definition('PTR', 6) is None
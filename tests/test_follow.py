@@ -0,0 +1,118 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import asyncio
+import threading
+import time
+from stdf.stdf_reader import Reader
+from stdf.stdf_follow import Follower, state_path
+from tests.helpers import far, ptr, mrr
+
+
+def ptr_numbers(records):
+    return [body['TEST_NUM'] for rec_name, _, body in records if rec_name == 'PTR']
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    return str(tmp_path / 'live.stdf')
+
+
+def append(stdf_file, data):
+    with open(stdf_file, mode='ab') as fp:
+        fp.write(data)
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_read_new_waits_for_partial_records(stdf_file, e):
+    follower = Follower(stdf_file)
+    assert list(follower.read_new()) == []
+
+    data = far(e) + ptr(1, e=e) + ptr(2, e=e)
+    append(stdf_file, data[:-3])
+    assert ptr_numbers(follower.read_new()) == [1]
+
+    append(stdf_file, data[-3:] + ptr(3, e=e)[:2])
+    assert ptr_numbers(follower.read_new()) == [2]
+    assert list(follower.read_new()) == []
+
+    append(stdf_file, ptr(3, e=e)[2:])
+    assert ptr_numbers(follower.read_new()) == [3]
+    assert follower.offset == len(data) + len(ptr(3))
+    follower.close()
+
+
+def test_resume_from_state(stdf_file):
+    state_file = state_path(stdf_file)
+    append(stdf_file, far('>') + ptr(1, e='>') + ptr(2, e='>'))
+    with Follower(stdf_file, state_file, poll_interval=0.01) as follower:
+        assert ptr_numbers(follower.records(idle_timeout=0)) == [1, 2]
+
+    append(stdf_file, ptr(3, e='>') + mrr(e='>'))
+    with Follower(stdf_file, state_file, poll_interval=0.01) as follower:
+        records = list(follower.records(idle_timeout=1))
+        assert [rec_name for rec_name, _, _ in records] == ['PTR', 'MRR']
+        assert records[0][2]['TEST_NUM'] == 3
+        assert follower.finished
+
+
+def test_replaced_file_is_read_from_the_start(stdf_file):
+    state_file = state_path(stdf_file)
+    append(stdf_file, far() + ptr(1) + ptr(2))
+    with Follower(stdf_file, state_file, poll_interval=0.01) as follower:
+        list(follower.records(idle_timeout=0))
+
+    with open(stdf_file, mode='wb') as fp:
+        fp.write(far() + ptr(7))
+    with Follower(stdf_file, state_file, poll_interval=0.01) as follower:
+        assert ptr_numbers(follower.records(idle_timeout=0)) == [7]
+
+
+def test_follow_while_writing(stdf_file):
+    def tester():
+        append(stdf_file, far())
+        for test_num in range(20):
+            time.sleep(0.002)
+            append(stdf_file, ptr(test_num))
+        append(stdf_file, mrr())
+
+    writer = threading.Thread(target=tester)
+    writer.start()
+    with Follower(stdf_file, reader=Reader(records=['PTR']), poll_interval=0.005) as follower:
+        assert ptr_numbers(follower.records(idle_timeout=5)) == list(range(20))
+        assert follower.finished
+    writer.join()
+
+
+def test_follow_asyncio(stdf_file):
+    async def tester():
+        append(stdf_file, far())
+        for test_num in range(5):
+            await asyncio.sleep(0.005)
+            append(stdf_file, ptr(test_num))
+        append(stdf_file, mrr())
+
+    async def follow():
+        with Follower(stdf_file, poll_interval=0.002) as follower:
+            return [r async for r in follower]
+
+    async def main():
+        records, _ = await asyncio.gather(follow(), tester())
+        return records
+
+    assert ptr_numbers(asyncio.run(main())) == list(range(5))
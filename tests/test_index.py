@@ -0,0 +1,136 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import os
+import io
+import gzip
+from stdf.stdf_reader import Reader
+from stdf.stdf_index import RecordIndex, index_path
+from tests.helpers import record, far, wir, wrr, pir, ptr, prr
+
+
+def lot(wafers=2, parts=2, sites=2):
+    # the sites of a wafer tested side by side, their records interleaved
+    r = far()
+    for w in range(wafers):
+        wafer_id = str(w + 1).encode()
+        r += wir(wafer_id)
+        for p in range(parts):
+            for site in range(sites):
+                r += pir(site)
+            for site in range(sites):
+                for test_num in (100, 200):
+                    r += ptr(test_num, site, 1.0)
+            for site in range(sites):
+                r += prr(site, 'W{}P{}S{}'.format(w + 1, p, site).encode(), num_test=2, x=p, y=site)
+        r += wrr(wafer_id)
+    return r
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+    return str(f)
+
+
+def test_index_sidecar(stdf_file):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    index = rd.use_index()
+
+    assert os.path.exists(index_path(stdf_file))
+    assert len(index) == 1 + 2 * (1 + 2 * (2 + 4 + 2) + 1)
+
+    loaded = RecordIndex.load(index_path(stdf_file))
+    assert loaded.columns == index.columns
+    assert loaded.strings == index.strings
+
+
+def test_lookup(stdf_file):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode='mmap')
+
+    prr = list(rd.lookup('PRR', part_id='W2P1S0'))
+    assert len(prr) == 1
+    assert prr[0][2]['PART_ID'] == b'W2P1S0'
+    assert prr[0][2]['X_COORD'] == 1
+
+    part = list(rd.lookup(part_id=b'W1P0S1'))
+    assert [rec_name for rec_name, _, _ in part] == ['PIR', 'PTR', 'PTR', 'PRR']
+    assert all(body['SITE_NUM'] == 1 for _, _, body in part)
+
+    assert len(list(rd.lookup('PTR', test_num=200, wafer_id='2'))) == 4
+    assert len(list(rd.lookup(wafer_id='1'))) == 1 + 2 * (2 + 4 + 2) + 1
+    assert list(rd.lookup(part_id='nope')) == []
+
+
+def test_find_matches_a_full_scan(stdf_file):
+    index = RecordIndex.build(stdf_file)
+    c = index.columns
+
+    def scan(rec_typ_sub=None, head_num=None, site_num=None, test_num=None, part_id=None, wafer_id=None):
+        return [c['offset'][i] for i in range(len(index))
+                if (rec_typ_sub is None or (c['rec_typ'][i], c['rec_sub'][i]) == rec_typ_sub) and
+                (head_num is None or c['flags'][i] & 1 and c['head_num'][i] == head_num) and
+                (site_num is None or c['flags'][i] & 1 and c['site_num'][i] == site_num) and
+                (test_num is None or c['flags'][i] & 2 and c['test_num'][i] == test_num) and
+                (part_id is None or c['part'][i] == index.strings.index(part_id)) and
+                (wafer_id is None or c['wafer'][i] == index.strings.index(wafer_id))]
+
+    for keys in ({'rec_typ_sub': (15, 10)}, {'rec_typ_sub': (15, 10), 'test_num': 200, 'site_num': 1},
+                 {'head_num': 1}, {'site_num': 0}, {'head_num': 1, 'site_num': 1, 'wafer_id': b'2'},
+                 {'part_id': b'W1P1S0'}, {'part_id': b'W1P1S0', 'test_num': 100}, {'test_num': 300}, {}):
+        assert index.find(**keys) == scan(**keys)
+
+
+@pytest.mark.parametrize('mode', ['mmap', 'stream'])
+def test_lookup_of_compressed_file(tmp_path, mode):
+    f = tmp_path / 'lot.stdf.gz'
+    f.write_bytes(gzip.compress(lot()))
+    rd = Reader()
+    rd.load_stdf_file(str(f), mode=mode)
+    with pytest.raises(io.UnsupportedOperation, match="mode='memory'"):
+        list(rd.lookup('PRR', part_id='W2P1S0'))
+
+    rd.load_stdf_file(str(f), mode='memory')
+    assert [body['PART_ID'] for _, _, body in rd.lookup('PRR', part_id='W2P1S0')] == [b'W2P1S0']
+
+
+@pytest.mark.parametrize('mode', ['memory', 'mmap', 'stream'])
+def test_lookup_after_reading_to_the_end(stdf_file, mode):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode=mode)
+    rd.use_index()
+    n = len(list(rd))
+
+    prr = list(rd.lookup('PRR', part_id='W2P1S0'))
+    assert prr[0][2]['PART_ID'] == b'W2P1S0'
+    assert len(rd.INDEX) == n
+
+
+def test_stale_index_is_rebuilt(stdf_file):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    rd.use_index()
+
+    with open(stdf_file, mode='ab') as fp:
+        fp.write(record(b'', 20, 20))
+
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    assert len(rd.use_index()) == 1 + 2 * (1 + 2 * (2 + 4 + 2) + 1) + 1
@@ -0,0 +1,97 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import io
+from stdf.stdf_reader import Reader
+from stdf.stdf_writer import Writer, RecordSink
+from stdf.stdf_instrument import Instrument
+from tests.helpers import lot as make_lot
+
+
+def lot():
+    return make_lot(parts=3, tests=4, lot_id=None, finish_t=None)
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+    return str(f)
+
+
+def test_reader_counts(stdf_file):
+    rd = Reader(instrument=True)
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    records = list(rd)
+
+    decoded = rd.INSTRUMENT.snapshot()['decode']
+    assert {rec_name: entry['records'] for rec_name, entry in decoded.items()} == \
+        {'FAR': 1, 'PIR': 3, 'PTR': 12, 'PRR': 3}
+    assert decoded['PTR']['bytes'] == 12 * 12
+    assert all(entry['seconds'] >= 0 for entry in decoded.values())
+    assert rd.INSTRUMENT.io_seconds >= 0
+
+    plain = Reader()
+    plain.load_stdf_file(stdf_file)
+    assert records == list(plain)
+
+
+def test_reader_hooks_and_filter(stdf_file):
+    seen = []
+    rd = Reader(records=['PRR'])
+    instrument = rd.use_instrument()
+    instrument.add_hooks(before=lambda rec_name, header: seen.append(('before', rec_name, header[0])),
+                         after=lambda rec_name, header, body: seen.append(('after', rec_name, body['PART_FLG'])))
+    rd.load_stdf_file(stdf_file)
+    assert len(list(rd)) == 3
+
+    assert seen == [('before', 'PRR', 20), ('after', 'PRR', 0), ('before', 'PRR', 20), ('after', 'PRR', 0x08),
+                    ('before', 'PRR', 20), ('after', 'PRR', 0)]
+    assert list(instrument.snapshot()['decode']) == ['PRR']
+
+    rd.use_instrument(None)
+    assert rd.INSTRUMENT is None
+
+
+def test_instrument_recovery_mode(stdf_file):
+    rd = Reader(recover=True, instrument=True)
+    rd.load_stdf_file(stdf_file)
+    assert len(list(rd)) == 19
+    assert rd.INSTRUMENT.snapshot()['decode']['PTR']['records'] == 12
+
+
+def test_writer_counts():
+    instrument = Instrument()
+    seen = []
+    instrument.add_hooks(after=lambda rec_name, header, body: seen.append((rec_name, header)))
+    w = Writer()
+    w.use_instrument(instrument)
+
+    with RecordSink(io.BytesIO(), w) as sink:
+        sink.write('PIR', {'HEAD_NUM': 1, 'SITE_NUM': 0})
+        sink.write_columns('PTR', {'TEST_NUM': [1, 2, 3], 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0,
+                                   'PARM_FLG': 0, 'RESULT': [1.0, 2.0, 3.0]})
+
+    encoded = instrument.snapshot()['encode']
+    assert encoded['FAR']['records'] == 1
+    assert encoded['PIR'] == {'records': 1, 'bytes': 2, 'seconds': encoded['PIR']['seconds']}
+    assert encoded['PTR']['records'] == 3 and encoded['PTR']['bytes'] == 36
+    assert seen == [('FAR', (2, 0, 10)), ('PIR', (2, 5, 10))]
+
+    instrument.reset()
+    assert instrument.snapshot() == {'decode': {}, 'encode': {}, 'io_seconds': 0.0}
@@ -0,0 +1,72 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+from stdf.stdf_reader import Reader
+from stdf.stdf_lazy import LazyRecord
+from tests.helpers import record, cn, far, ptr
+
+
+def lot(e='<'):
+    mpr = struct.pack(e + 'IBBBBHH', 7, 1, 0, 0, 0, 3, 2) + bytes([0x21, 0x03]) + struct.pack(e + '2f', 1.5, 2.5)
+    mpr += cn(b'mpr')
+    return far(e) + record(mpr, 15, 15, e) + ptr(3, 2, 0.5, e=e) + record(b'', 99, 99, e)
+
+
+@pytest.fixture(params=['<', '>'])
+def stdf_file(request, tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot(request.param))
+    return str(f)
+
+
+@pytest.mark.parametrize('mode', Reader.LOAD_MODES)
+def test_lazy_matches_eager(stdf_file, mode):
+    rd = Reader()
+    rd.load_stdf_file(stdf_file, mode=mode)
+    eager = list(rd)
+
+    rd = Reader(lazy=True)
+    rd.load_stdf_file(stdf_file, mode=mode)
+    lazy = list(rd)
+
+    assert isinstance(lazy[1][2], LazyRecord)
+    assert lazy == eager
+    assert lazy[3] == ('UNK', eager[3][1], {})
+
+
+def test_lazy_decodes_on_access(stdf_file):
+    rd = Reader(lazy=True)
+    rd.load_stdf_file(stdf_file, mode='mmap')
+    assert rd.read_record()[0] == 'FAR'
+    _, _, mpr = rd.read_record()
+
+    assert mpr['TEST_TXT'] == b'mpr'
+    assert 'RTN_STAT' not in mpr._values
+    assert mpr['RTN_RSLT'] == [1.5, 2.5]
+    assert mpr._values['RSLT_CNT'] == 2
+    assert mpr.get('UNITS', 'none') == 'none'
+    assert 'UNITS' not in mpr
+    with pytest.raises(KeyError):
+        mpr['NOT_A_FIELD']
+
+    _, _, ptr = rd.read_record()
+    assert ptr['SITE_NUM'] == 2
+    assert ptr.to_dict() == {'TEST_NUM': 3, 'HEAD_NUM': 1, 'SITE_NUM': 2, 'TEST_FLG': 0, 'PARM_FLG': 0,
+                             'RESULT': 0.5}
+    rd.close()
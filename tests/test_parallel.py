@@ -0,0 +1,73 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+from stdf.stdf_reader import Reader
+from stdf.stdf_parallel import scan_chunks, map_parallel, read_parallel
+from tests.helpers import lot as make_lot
+
+
+def lot(e='<'):
+    return make_lot(parts=50, tests=5, test_txt=b'test', lot_id=None, finish_t=None, e=e)
+
+
+def count_ptr(records):
+    return sum(1 for rec_name, _, _ in records if rec_name == 'PTR')
+
+
+@pytest.fixture(params=['<', '>'])
+def stdf_file(request, tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot(e=request.param))
+    return str(f)
+
+
+def serial(stdf_file, **kwargs):
+    rd = Reader(**kwargs)
+    rd.load_stdf_file(stdf_file)
+    return list(rd)
+
+
+def test_scan_chunks(stdf_file):
+    e, chunks = scan_chunks(stdf_file, chunk_size=500)
+
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    with open(stdf_file, mode='rb') as fp:
+        assert chunks[-1][1] == len(fp.read())
+
+
+def test_read_parallel(stdf_file):
+    records = serial(stdf_file)
+    assert records[1][2]['HEAD_NUM'] == 1
+
+    assert list(read_parallel(stdf_file, workers=2, chunk_size=500)) == records
+
+
+def test_read_parallel_selected_records(stdf_file):
+    records = serial(stdf_file, records=['PRR'])
+
+    assert len(records) == 50
+    assert list(read_parallel(stdf_file, workers=2, chunk_size=300, records=['PRR'])) == records
+
+
+def test_map_parallel(stdf_file):
+    counts = list(map_parallel(stdf_file, count_ptr, workers=2, chunk_size=1000))
+
+    assert len(counts) > 1
+    assert sum(counts) == 250
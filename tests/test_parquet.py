@@ -0,0 +1,83 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+from stdf.stdf_parquet import field_converter, table_fields, to_parquet
+from tests.helpers import record, cn, far, pir, ptr, prr
+
+
+def lot():
+    r = far()
+    r += record(bytes([1, 0, 3, 0, 1, 2]) + cn(b'h'), 1, 80)
+    for p in range(5):
+        r += pir(0)
+        r += ptr(100, 0, p / 2, tail=cn(b'vdd'))
+        r += ptr(200, 0, p * 2.0)
+        r += prr(0, b'P' + str(p).encode(), num_test=2, x=p, y=-p, test_t=10)
+    return r
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+    return str(f)
+
+
+def test_field_converter():
+    assert field_converter('U4') is None
+    assert field_converter('Cn')(b'abc') == 'abc'
+    assert field_converter('Cn')(0) == ''
+    assert field_converter('Bn')(7) == b'\x07'
+    assert field_converter('Bn')((1, 2)) == b'\x01\x02'
+    assert field_converter('K0Cn')([b'a', 0]) == ['a', '']
+    assert table_fields([['A', 'U1'], ['B', 'Vn'], ['C', 'Cn']]) == [('A', 'U1'), ('C', 'Cn')]
+
+
+def test_to_parquet(stdf_file, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    out = to_parquet(stdf_file, str(tmp_path / 'out'), rec_names=('PTR', 'PRR', 'HBR'), row_group_size=4)
+    assert {rec_name: rows for rec_name, (_, rows) in out.items()} == {'PTR': 10, 'PRR': 5, 'HBR': 0}
+
+    ptr = pq.ParquetFile(out['PTR'][0])
+    assert ptr.metadata.num_row_groups == 3
+    assert ptr.schema_arrow.field('TEST_NUM').type == pa.uint32()
+    assert ptr.schema_arrow.field('RESULT').type == pa.float32()
+    assert ptr.schema_arrow.field('TEST_TXT').type == pa.string()
+
+    table = ptr.read()
+    assert table['RESULT'].to_pylist() == [0, 0, 0.5, 2, 1, 4, 1.5, 6, 2, 8]
+    assert table['TEST_TXT'].to_pylist()[:2] == ['vdd', None]
+
+    prr = pq.read_table(out['PRR'][0])
+    assert prr['PART_ID'].to_pylist() == ['P0', 'P1', 'P2', 'P3', 'P4']
+    assert prr['Y_COORD'].type == pa.int16()
+
+
+def test_to_parquet_all_records(stdf_file, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    out = to_parquet(stdf_file, str(tmp_path / 'out'), rec_names=None, fields={'PTR': ['TEST_NUM', 'RESULT']})
+    assert sorted(out) == ['FAR', 'PIR', 'PRR', 'PTR', 'SDR']
+
+    assert pq.read_table(out['PTR'][0]).column_names == ['TEST_NUM', 'RESULT']
+    sdr = pq.read_table(out['SDR'][0])
+    assert sdr['SITE_NUM'].type == pa.list_(pa.uint8())
+    assert sdr['SITE_NUM'].to_pylist() == [[0, 1, 2]]
@@ -0,0 +1,80 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+from stdf.stdf_parts import PartAssembler, PartMatrix, read_parts
+from tests.helpers import far, wir, wrr, pir, ptr, prr
+
+
+def part_prr(site, part_id, hard_bin=1):
+    return prr(site, part_id, hard_bin=hard_bin, num_test=2, x=site, y=-site, test_t=5)
+
+
+def lot():
+    # two sites tested side by side, their records interleaved
+    r = far()
+    r += wir(b'W7')
+    r += pir(0) + pir(1)
+    r += ptr(100, 0, 1.0) + ptr(100, 1, 1.5)
+    r += ptr(200, 1, 2.5, test_flg=0x80) + ptr(200, 0, 2.0)
+    r += part_prr(1, b'B', hard_bin=5) + part_prr(0, b'A')
+    r += pir(0)
+    r += ptr(300, 0, 3.0)
+    r += ptr(100, 3, 9.0)
+    r += part_prr(0, b'C')
+    r += wrr(b'W7')
+    return r
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+    return str(f)
+
+
+def test_read_parts(stdf_file):
+    parts = list(read_parts(stdf_file))
+
+    assert [part['PART_ID'] for part in parts] == [b'B', b'A', b'C']
+    assert parts[0]['SITE_NUM'] == 1
+    assert parts[0]['HARD_BIN'] == 5
+    assert parts[0]['results'] == {100: 1.5, 200: 2.5}
+    assert parts[0]['failed'] == [200]
+    assert parts[1]['results'] == {100: 1.0, 200: 2.0}
+    assert parts[1]['failed'] == []
+    assert parts[2]['results'] == {300: 3.0}
+    assert all(part['WAFER_ID'] == b'W7' for part in parts)
+
+
+def test_orphan_results():
+    pa = PartAssembler()
+    assert pa.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'RESULT': 1.0}) is None
+    assert pa.add('PRR', {'HEAD_NUM': 1, 'SITE_NUM': 0}) is None
+    assert pa.orphans == 1
+
+
+def test_part_matrix(stdf_file):
+    np = pytest.importorskip('numpy')
+    m = PartMatrix()
+    for part in read_parts(stdf_file, tests=('PTR',)):
+        m.add(part)
+
+    parts, test_nums, matrix = m.finish()
+    assert parts['PART_ID'] == [b'B', b'A', b'C']
+    assert test_nums == [100, 200, 300]
+    np.testing.assert_array_equal(matrix, [[1.5, 2.5, np.nan], [1.0, 2.0, np.nan], [np.nan, np.nan, 3.0]])
@@ -0,0 +1,149 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import gzip
+import os
+from stdf.stdf_reader import Reader
+from stdf.stdf_index import RecordIndex, index_path
+from stdf.stdf_patch import Patcher, patch_file
+from stdf.stdf_cli import main
+from tests.helpers import record, lot as make_lot
+
+
+def lot(e='<'):
+    return make_lot(parts=6, sites=3, e=e)
+
+
+def bodies(stdf_file, rec_name):
+    rd = Reader()
+    rd.load_stdf_file(str(stdf_file))
+    return [body for name, header, body in rd if name == rec_name]
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_patch_mir(tmp_path, e):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot(e))
+
+    assert patch_file(str(f), 'MIR', {'STAT_NUM': 7, 'MODE_COD': 'E', 'START_T': 1234}, limit=1) == 1
+    mir, = bodies(f, 'MIR')
+    assert (mir['STAT_NUM'], mir['MODE_COD'], mir['START_T'], mir['SETUP_T']) == (7, b'E', 1234, 1)
+    assert mir['LOT_ID'] == b'LOT1'
+    assert os.path.getsize(str(f)) == len(lot(e))
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_patch_where(tmp_path, e):
+    f = tmp_path / 'lot.stdf'
+    data = lot(e)
+    f.write_bytes(data)
+
+    assert patch_file(str(f), 'PRR', {'HARD_BIN': 5, 'SOFT_BIN': 50}, where={'SITE_NUM': 1}) == 2
+    assert patch_file(str(f), 'PRR', {'HARD_BIN': 5}, where={'SITE_NUM': 0}, limit=1) == 1
+    bins = [(prr['SITE_NUM'], prr['HARD_BIN'], prr['SOFT_BIN']) for prr in bodies(f, 'PRR')]
+    assert bins == [(0, 5, 1), (1, 5, 50), (2, 1, 1), (0, 2, 2), (1, 5, 50), (2, 2, 2)]
+
+    changed = [i for i, (a, b) in enumerate(zip(data, f.read_bytes())) if a != b]
+    assert len(changed) <= 10
+
+
+def test_patch_offsets_from_index(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+    os.utime(str(f), ns=(10 ** 18, 10 ** 18))
+    index = RecordIndex.open(str(f))
+    offsets = index.find((5, 20), part_id='P4')
+
+    with Patcher(str(f)) as patcher:
+        assert patcher.patch('PRR', {'HARD_BIN': 9}, offsets) == 1
+    assert [prr['HARD_BIN'] for prr in bodies(f, 'PRR')] == [1, 2, 1, 2, 9, 2]
+
+    # no key field changed, so the index stays valid
+    stamp = os.stat(str(f))
+    assert stamp.st_mtime_ns != 10 ** 18
+    loaded = RecordIndex.load(index_path(str(f)))
+    assert (loaded.source_size, loaded.source_mtime_ns) == (stamp.st_size, stamp.st_mtime_ns)
+
+    patch_file(str(f), 'PRR', {'SITE_NUM': 7}, offsets)
+    loaded = RecordIndex.load(index_path(str(f)))
+    assert loaded.source_mtime_ns != os.stat(str(f)).st_mtime_ns
+
+
+@pytest.mark.parametrize('rec_name, field', [('MIR', 'LOT_ID'), ('PTR', 'LO_LIMIT'), ('PRR', 'PART_ID'),
+                                             ('PRR', 'NO_FIELD'), ('XYZ', 'HEAD_NUM')])
+def test_patch_refused(tmp_path, rec_name, field):
+    f = tmp_path / 'lot.stdf'
+    data = lot()
+    f.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        patch_file(str(f), rec_name, {field: 1})
+    assert f.read_bytes() == data
+
+
+def test_patch_bad_values_and_offsets(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    data = lot()
+    f.write_bytes(data)
+
+    with Patcher(str(f)) as patcher:
+        with pytest.raises(ValueError):
+            patcher.patch('PRR', {'HARD_BIN': 1 << 16})
+        with pytest.raises(ValueError):
+            # no PRR starts 8 bytes earlier; nothing is written to the valid one either
+            prr = patcher.find('PRR')[0]
+            patcher.patch('PRR', {'HARD_BIN': 2}, [prr, prr - 8])
+    assert f.read_bytes() == data
+
+
+def test_patch_cut_short_record(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    data = lot()[:-8] + record(b'', 1, 20)
+    f.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        patch_file(str(f), 'MRR', {'FINISH_T': 5})
+    assert f.read_bytes() == data
+
+
+def test_patch_compressed(tmp_path):
+    f = tmp_path / 'lot.stdf.gz'
+    f.write_bytes(gzip.compress(lot()))
+    with pytest.raises(ValueError):
+        patch_file(str(f), 'MIR', {'STAT_NUM': 7})
+
+
+def test_cli_patch(tmp_path, capsys):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot())
+
+    assert main(['patch', str(f), 'PRR', 'HARD_BIN=4', '--where', 'SITE_NUM=2']) == 0
+    assert '2 PRR records patched' in capsys.readouterr().out
+    assert [prr['HARD_BIN'] for prr in bodies(f, 'PRR')] == [1, 2, 4, 2, 1, 4]
+
+    assert main(['patch', str(f), 'MIR', 'MODE_COD=Q', '--limit', '1']) == 0
+    assert bodies(f, 'MIR')[0]['MODE_COD'] == b'Q'
+
+    with pytest.raises(SystemExit):
+        main(['patch', str(f), 'MIR', 'LOT_ID=X'])
+
+    data = f.read_bytes()
+    with pytest.raises(SystemExit) as exc:
+        main(['patch', str(f), 'PRR', 'HARD_BIN=70000'])
+    assert 'HARD_BIN cannot hold 70000' in str(exc.value)
+    assert f.read_bytes() == data
@@ -0,0 +1,219 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+import gzip
+from stdf.stdf_reader import Reader
+from stdf.stdf_raw import field_offsets, split, merge, filter_file
+from stdf.stdf_cli import main
+from tests.helpers import record, far, mir, mrr, wir, wrr, pir, ptr, prr
+
+
+def part(site, result, e='<'):
+    return [pir(site, e), ptr(100, site, result, e=e), prr(site, e=e)]
+
+
+def hbr(e='<'):
+    return record(struct.pack(e + 'BBHIc', 255, 0, 1, 4, b'P'), 1, 40, e)
+
+
+def lot(e='<'):
+    # two wafers of two parts each on sites 0 and 1, then a summary over all heads
+    records = [far(e), mir(b'LOT1', e)]
+    for wafer_id in (b'W1', b'W/2'):
+        records += [wir(wafer_id, e)] + part(0, 1.5, e) + part(1, 2.5, e) + [wrr(wafer_id, e)]
+    records += [hbr(e), mrr(99, e)]
+    return records
+
+
+def names(stdf_file):
+    rd = Reader(raw=True)
+    rd.load_stdf_file(str(stdf_file))
+    return [rec_name for rec_name, header, body in rd]
+
+
+def test_field_offsets():
+    heads = field_offsets('HEAD_NUM')
+    sites = field_offsets('SITE_NUM')
+    assert heads[(15, 10)] == 4 and sites[(15, 10)] == 5
+    assert heads[(5, 20)] == 0 and sites[(5, 20)] == 1
+    # SDR: SITE_NUM is an array
+    assert (1, 80) in heads and (1, 80) not in sites
+    assert (1, 10) not in heads
+
+
+@pytest.mark.parametrize('mode', ['memory', 'mmap', 'stream'])
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_reader_raw_records(tmp_path, mode, e):
+    records = lot(e)
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(records))
+
+    rd = Reader(raw=True)
+    rd.load_stdf_file(str(f), mode=mode)
+    result = [(rec_name, bytes(struct.pack(e + 'HBB', *header) + body)) for rec_name, header, body in rd]
+    assert [r for _, r in result] == records
+    assert [rec_name for rec_name, _ in result][:4] == ['FAR', 'MIR', 'WIR', 'PIR']
+    assert rd.e == e
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_split_by_wafer(tmp_path, e):
+    records = lot(e)
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(records))
+
+    paths = split(str(f), str(tmp_path / 'out'), by='wafer')
+    assert list(paths) == ['W1', 'W/2']
+    assert paths['W/2'].endswith('lot_wafer_W_2.stdf')
+
+    shared_head = records[:2]
+    shared_tail = records[-2:]
+    with open(paths['W1'], 'rb') as fp:
+        assert fp.read() == b''.join(shared_head + records[2:10] + shared_tail)
+    with open(paths['W/2'], 'rb') as fp:
+        assert fp.read() == b''.join(shared_head + records[10:18] + shared_tail)
+
+
+def test_split_interleaved_heads(tmp_path):
+    # heads 1 and 2 test wafers side by side
+    def records(head, wafer_id):
+        return [wir(wafer_id, head=head), pir(0, head=head), ptr(100, 0, 1.0, head=head),
+                prr(0, head=head), wrr(wafer_id, head=head)]
+
+    one, two = records(1, b'A'), records(2, b'B')
+    data = [far(), mir(b'LOT1')] + [r for pair in zip(one, two) for r in pair] + [mrr(99)]
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(data))
+
+    paths = split(str(f), str(tmp_path / 'out'), by='wafer')
+    for wafer, wafer_records in (('A', one), ('B', two)):
+        with open(paths[wafer], 'rb') as fp:
+            assert fp.read() == b''.join(data[:2] + wafer_records + data[-1:])
+
+
+def test_split_does_not_overwrite(tmp_path):
+    # two lots of the same name, and two WAFER_IDs with the same file name
+    out = str(tmp_path / 'out')
+    for d in ('a', 'b'):
+        (tmp_path / d).mkdir()
+        (tmp_path / d / 'lot.stdf').write_bytes(b''.join(lot()))
+    split(str(tmp_path / 'a' / 'lot.stdf'), out)
+    with pytest.raises(FileExistsError):
+        split(str(tmp_path / 'b' / 'lot.stdf'), out)
+    assert split(str(tmp_path / 'b' / 'lot.stdf'), out, overwrite=True).keys() == {'W1', 'W/2'}
+
+    f = tmp_path / 'clash.stdf'
+    f.write_bytes(b''.join([far(), wir(b'W/1'), wrr(b'W/1'), wir(b'W_1'), wrr(b'W_1')]))
+    with pytest.raises(FileExistsError):
+        split(str(f), out)
+
+    with pytest.raises(SystemExit, match='--overwrite'):
+        main(['split', str(tmp_path / 'a' / 'lot.stdf'), out])
+
+
+def test_split_by_site(tmp_path):
+    records = lot()
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(records))
+
+    paths = split(str(f), str(tmp_path / 'out'), by='site')
+    assert sorted(paths) == [(1, 0), (1, 1)]
+    assert names(paths[(1, 0)]) == ['FAR', 'MIR', 'WIR', 'PIR', 'PTR', 'PRR', 'WRR',
+                                    'WIR', 'PIR', 'PTR', 'PRR', 'WRR', 'HBR', 'MRR']
+
+    with open(paths[(1, 1)], 'rb') as fp:
+        data = fp.read()
+    # site 1 opens after the first wafer's WIR, which it still receives
+    assert data.startswith(b''.join(records[:3] + records[6:9] + [records[9]]))
+
+
+def test_split_bad_key(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(lot()))
+    with pytest.raises(ValueError):
+        split(str(f), str(tmp_path / 'out'), by='lot')
+
+
+def test_filter(tmp_path):
+    records = lot()
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(records))
+    out = tmp_path / 'out.stdf'
+
+    assert filter_file(str(f), str(out), records=['PTR', 'HBR'], sites=[1]) == 4
+    assert out.read_bytes() == b''.join([records[0], records[7], records[15], records[18]])
+
+    assert filter_file(str(f), str(out), heads=[2]) == 4
+    assert names(out) == ['FAR', 'MIR', 'HBR', 'MRR']
+
+    assert filter_file(str(f), str(out)) == len(records)
+    assert out.read_bytes() == f.read_bytes()
+
+    with pytest.raises(ValueError):
+        filter_file(str(f), str(out), records=['XYZ'])
+
+
+def test_merge(tmp_path):
+    first = [far(), mir(b'LOT1')] + part(0, 1.5) + [mrr(10)]
+    retest = [far(), mir(b'LOT1')] + part(1, 2.5) + [mrr(20)]
+    f1, f2 = tmp_path / 'lot.stdf', tmp_path / 'retest.stdf'
+    f1.write_bytes(b''.join(first))
+    f2.write_bytes(b''.join(retest))
+    out = tmp_path / 'merged.stdf'
+
+    assert merge([str(f1), str(f2)], str(out)) == 9
+    assert out.read_bytes() == b''.join(first[:-1] + retest[2:])
+
+
+def test_merge_byte_order_mismatch(tmp_path):
+    f1, f2 = tmp_path / 'lot.stdf', tmp_path / 'retest.stdf'
+    f1.write_bytes(b''.join(lot('<')))
+    f2.write_bytes(b''.join(lot('>')))
+    with pytest.raises(ValueError):
+        merge([str(f1), str(f2)], str(tmp_path / 'merged.stdf'))
+
+
+def test_compressed_and_truncated(tmp_path):
+    data = b''.join(lot())
+    f = tmp_path / 'lot.stdf.gz'
+    f.write_bytes(gzip.compress(data))
+    with pytest.raises(ValueError):
+        filter_file(str(f), str(tmp_path / 'out.stdf'))
+
+    f = tmp_path / 'cut.stdf'
+    f.write_bytes(data[:-3])
+    with pytest.raises(ValueError):
+        filter_file(str(f), str(tmp_path / 'out.stdf'))
+
+
+def test_cli(tmp_path, capsys):
+    records = lot()
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(b''.join(records))
+
+    assert main(['split', str(f), str(tmp_path / 'out'), '--by', 'site']) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+    out = tmp_path / 'ptr.stdf'
+    assert main(['filter', str(f), '-o', str(out), '--records', 'PTR', '--sites', '0']) == 0
+    assert names(out) == ['FAR', 'PTR', 'PTR']
+
+    merged = tmp_path / 'merged.stdf'
+    assert main(['merge', str(f), str(f), '-o', str(merged)]) == 0
+    assert len(names(merged)) == 2 * len(records) - 3
@@ -17,12 +17,16 @@ THE SOFTWARE."""
 
 import pytest
 import struct
+from os import path
 import io
 from stdf.stdf_reader import Reader
 
+TEST_JSON = path.join(path.dirname(__file__), 'stdf_test.json')
+
+
 @pytest.fixture()
 def rd():
-    return Reader('/Users/cahyo/Dropbox/programming/python/STDFReader/tests/stdf_test.json')
+    return Reader(TEST_JSON)
 
 
 def test_read_unsigned(rd):
@@ -98,4 +102,51 @@ def test_read_seq_of_bytes(rd):
                  {'BYTE_1': 1,
                   'BYTE_2': (2, 3),
                   'BYTE_7': (4, 5, 6, 7, 8, 9, 10)})
-    assert not rd.read_record()
\ No newline at end of file
+    assert not rd.read_record()
+
+
+@pytest.mark.parametrize('mode', ['memory', 'mmap', 'stream'])
+def test_load_modes(rd, tmp_path, mode):
+
+    r = struct.pack('<HBBBHI', 7, 0x0B, 0x01, 0x81, 0x8001, 0x80000001)
+    r += struct.pack('<HBBB5sB7sB11s', 26, 0x0B, 0x05, 5, b'hidup', 7, b'adalah\x00', 11, b'perjuangan\x00')
+    f = tmp_path / 'modes.stdf'
+    f.write_bytes(r)
+
+    rd.load_stdf_file(str(f), mode=mode)
+    x = list(rd)
+
+    assert [rec_name for rec_name, _, _ in x] == ['T1U', 'TCn']
+    assert x[0][2] == {'UNSIGNED_1': 0x81, 'UNSIGNED_2': 0x8001, 'UNSIGNED_4': 0x80000001}
+    assert x[1][2]['STRING_7'] == b'perjuangan\x00'
+
+
+def test_load_mmap_empty_file(rd, tmp_path):
+
+    f = tmp_path / 'empty.stdf'
+    f.write_bytes(b'')
+
+    rd.load_stdf_file(str(f), mode='mmap')
+    assert list(rd) == []
+
+
+def test_read_selected_records(tmp_path):
+
+    r = struct.pack('<HBBBHI', 7, 0x0B, 0x01, 0x81, 0x8001, 0x80000001)
+    r += struct.pack('<HBBbhi', 7, 0x0B, 0x02, -0x80, -0x8000, -0x80000000)
+    r += struct.pack('<HBBB', 1, 0x0B, 0x04, 0x7D)
+    r += struct.pack('<HBBB5sB7sB11s', 26, 0x0B, 0x05, 5, b'hidup', 7, b'adalah\x00', 11, b'perjuangan\x00')
+    f = tmp_path / 'selected.stdf'
+    f.write_bytes(r)
+
+    for mode in ['memory', 'mmap', 'stream']:
+        rd = Reader(TEST_JSON, records=['T1I', (0x0B, 0x05)])
+        rd.load_stdf_file(str(f), mode=mode)
+
+        assert [rec_name for rec_name, _, _ in rd] == ['T1I', 'TCn']
+
+
+def test_select_unknown_record(rd):
+
+    with pytest.raises(ValueError):
+        rd.select_records(['XYZ'])
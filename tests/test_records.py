@@ -0,0 +1,74 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import io
+import pickle
+from stdf.stdf_reader import Reader
+from stdf.stdf_records import record_class
+from tests.helpers import record, cn, far, pir, ptr
+
+
+def lot():
+    return far() + pir(0) + ptr(100, 0, 0.5, tail=cn(b'vdd')) + record(b'', 99, 99)
+
+
+def read(**kwargs):
+    rd = Reader(**kwargs)
+    rd.STDF_IO = io.BytesIO(lot())
+    return list(rd)
+
+
+def test_record_objects():
+    records = read(record_objects=True)
+    _, _, ptr = records[2]
+
+    assert type(ptr).__name__ == 'PTR'
+    assert ptr.TEST_NUM == 100
+    assert ptr.RESULT == 0.5
+    assert ptr.TEST_TXT == b'vdd'
+    assert ptr.LO_LIMIT is None
+    assert ptr.get('LO_LIMIT', 1.0) == 1.0
+    assert ptr.get('count') is None
+    assert ptr.get('index', 0) == 0
+    assert ptr.get('_fields') is None
+    assert not hasattr(ptr, '__dict__')
+
+    assert records[3] == ('UNK', (0, 99, 99), {})
+
+
+def test_record_objects_match_dicts():
+    for (_, _, body), (_, _, obj) in zip(read(), read(record_objects=True)):
+        assert body == (obj if isinstance(obj, dict) else obj.to_dict())
+
+
+def test_record_objects_selected_fields():
+    _, _, ptr = read(record_objects=True, fields={'PTR': ['TEST_NUM', 'RESULT']})[2]
+    assert ptr.to_dict() == {'TEST_NUM': 100, 'RESULT': 0.5}
+    assert ptr.SITE_NUM is None
+
+
+def test_record_class_pickles():
+    cls = record_class('XYZ', [['A', 'U1'], ['B', 'Cn'], ['B', 'Cn']])
+    obj = cls.from_body({'A': 1, 'B': b'b'})
+
+    assert cls._fields == ('A', 'B')
+    assert pickle.loads(pickle.dumps(obj)) == obj
+    assert type(pickle.loads(pickle.dumps(obj))) is cls
+
+    with pytest.raises(ValueError):
+        record_class('BAD', [['class', 'U1']])
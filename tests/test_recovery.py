@@ -0,0 +1,160 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import gzip
+import struct
+import sys
+import subprocess
+from os import path
+from stdf.stdf_reader import Reader
+from tests.helpers import record, cn, far, ptr as make_ptr
+
+
+def ptr(test_num, e='<'):
+    return make_ptr(test_num, 0, test_num / 2, tail=cn(b'test'), e=e)
+
+
+def lot(tests=10, e='<'):
+    return far(e) + b''.join(ptr(t, e) for t in range(tests))
+
+
+def read(data, tmp_path, mode='memory', name='lot.stdf', **kwargs):
+    f = tmp_path / name
+    f.write_bytes(data)
+    rd = Reader(recover=True, **kwargs)
+    rd.load_stdf_file(str(f), mode=mode)
+    return list(rd), rd.DAMAGE
+
+
+def test_truncated_without_recovery(tmp_path):
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot()[:-5])
+    rd = Reader()
+    rd.load_stdf_file(str(f))
+
+    with pytest.raises(EOFError):
+        list(rd)
+
+
+def test_truncated_optimized(tmp_path):
+    # recovery does not rely on assert statements, which python -O strips
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(lot()[:-5])
+    script = ('from stdf.stdf_reader import Reader\n'
+              'rd = Reader(recover=True)\n'
+              'rd.load_stdf_file({!r})\n'
+              'records = list(rd)\n'
+              'print(records[-1][0], len(rd.DAMAGE))\n').format(str(f))
+    out = subprocess.run([sys.executable, '-O', '-c', script], capture_output=True, text=True, check=True,
+                         cwd=path.dirname(path.dirname(path.abspath(__file__)))).stdout
+    assert out.split() == ['PTR', '1']
+
+
+@pytest.mark.parametrize('mode', ['memory', 'mmap', 'stream'])
+@pytest.mark.parametrize('cut', [2, 5])
+def test_truncated(tmp_path, mode, cut):
+    data = lot()
+    records, damage = read(data[:-cut], tmp_path, mode)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == list(range(9))
+    assert damage == [{'offset': len(data) - len(ptr(9)), 'resync': None, 'reason': damage[0]['reason']}]
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_resync_after_garbage(tmp_path, e):
+    data = lot(e=e)
+    at = len(far()) + 3 * len(ptr(0))
+    records, damage = read(data[:at] + b'\x07\xff\x01' + data[at:], tmp_path)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == list(range(10))
+    assert len(damage) == 1
+    assert damage[0]['offset'] == at
+    assert damage[0]['resync'] == at + 3
+
+
+def test_resync_after_cut_record(tmp_path):
+    data = lot()
+    at = len(far()) + 3 * len(ptr(0))
+    # the end of PTR 3 and all of PTR 4 are lost, so PTR 3 takes in the start of PTR 5 and the
+    # damage shows at what is left of PTR 5
+    records, damage = read(data[:at + 10] + data[at + 2 * len(ptr(0)):], tmp_path)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == [0, 1, 2, 3, 6, 7, 8, 9]
+    assert damage[0]['offset'] == at + len(ptr(0))
+    assert damage[0]['resync'] == at + 10 + len(ptr(0))
+
+
+@pytest.mark.parametrize('e', ['<', '>'])
+def test_rec_len_taking_in_next_record(tmp_path, e):
+    # the REC_LEN of PTR 5 also covers PTR 6, so a record header still follows it
+    data = lot(32, e=e)
+    at = len(far()) + 5 * len(ptr(0))
+    rec_len = struct.unpack_from(e + 'H', data, at)[0] + len(ptr(0))
+    records, damage = read(data[:at] + struct.pack(e + 'H', rec_len) + data[at + 2:], tmp_path)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == [t for t in range(32) if t != 5]
+    assert [(d['offset'], d['resync']) for d in damage] == [(at, at + len(ptr(0)))]
+
+
+def test_rec_len_taking_in_next_full_record(tmp_path):
+    # every PTR field is there, so the fields of PTR 5 end in front of the header of PTR 6
+    tail = cn(b'') + cn(b'') + struct.pack('<Bbbbff', 0x0E, 0, 0, 0, 0.0, 1.0) + cn(b'V') + \
+        cn(b'%f') * 3 + struct.pack('<ff', 0.0, 0.0)
+    ptrs = [make_ptr(t, 0, 1.0, tail=tail) for t in range(32)]
+    at = len(far()) + 5 * len(ptrs[0])
+    data = far() + b''.join(ptrs)
+    rec_len = struct.unpack_from('<H', data, at)[0] + len(ptrs[0])
+    records, damage = read(data[:at] + struct.pack('<H', rec_len) + data[at + 2:], tmp_path)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == [t for t in range(32) if t != 5]
+    assert [(d['offset'], d['resync']) for d in damage] == [(at, at + len(ptrs[0]))]
+    assert damage[0]['reason'].startswith('REC_LEN')
+
+
+def test_rec_len_running_into_garbage(tmp_path):
+    data = lot()
+    at = len(far()) + 3 * len(ptr(0))
+    rec_len = struct.unpack_from('<H', data, at)[0] + 3
+    records, damage = read(data[:at] + struct.pack('<H', rec_len) + data[at + 2:at + len(ptr(0))] +
+                           b'\x07\xff\x01' + data[at + len(ptr(0)):], tmp_path)
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records[1:]] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert [d['offset'] for d in damage] == [at]
+
+
+def test_unknown_record_kept(tmp_path):
+    data = lot(3) + record(b'\x01\x02\x03', 180, 1) + ptr(3)
+    records, damage = read(data, tmp_path)
+
+    assert [rec_name for rec_name, _, _ in records] == ['FAR', 'PTR', 'PTR', 'PTR', 'UNK', 'PTR']
+    assert damage == []
+
+
+def test_recovery_with_record_filter(tmp_path):
+    data = lot(3) + b'\x00\xff\xff' + ptr(3)
+    records, damage = read(data, tmp_path, records=['PTR'])
+
+    assert [body['TEST_NUM'] for rec_name, _, body in records] == [0, 1, 2, 3]
+    assert len(damage) == 1
+
+
+def test_recovery_compressed(tmp_path):
+    records, damage = read(gzip.compress(lot()[:-5]), tmp_path, mode='mmap', name='lot.stdf.gz')
+
+    assert len(records) == 10
+    assert damage[0]['resync'] is None
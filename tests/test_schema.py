@@ -0,0 +1,131 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import io
+import os
+import json
+import pickle
+import struct
+from stdf.stdf_reader import Reader
+from stdf.stdf_writer import Writer
+from stdf.stdf_schema import Schema, get_schema, DEFAULT_JSON
+from tests.helpers import record
+
+
+@pytest.fixture()
+def custom_json(tmp_path):
+    # STDF V4 plus a vendor record
+    with open(DEFAULT_JSON) as fp:
+        stdf_type = json.load(fp)
+    stdf_type['VND'] = {'rec_typ': 180, 'rec_sub': 1, 'body': [['COUNT', 'U8'], ['NAME', 'Cn']]}
+    f = tmp_path / 'custom.json'
+    f.write_text(json.dumps(stdf_type))
+    return str(f)
+
+
+def test_schema_is_shared():
+    rd, w = Reader(), Writer()
+
+    assert rd.SCHEMA is w.SCHEMA is get_schema()
+    assert rd.PLANS is get_schema().plans
+    assert w.FMT_MAP['U8'] == 'Q' and w.FMT_MAP['I8'] == 'q'
+
+    rd.STDF_IO = io.BytesIO(record(b'\x00', 99, 99))
+    assert rd.read_record()[0] == 'UNK'
+    assert (99, 99) not in get_schema().rec_name
+
+
+def test_custom_json(custom_json):
+    w = Writer(custom_json)
+    rd = Reader(custom_json)
+    assert rd.SCHEMA is w.SCHEMA is not get_schema()
+
+    rd.STDF_IO = io.BytesIO(w.pack_FAR() + w.pack_record('VND', {'COUNT': 1 << 40, 'NAME': 'abc'}))
+    assert [r[2] for r in rd][1] == {'COUNT': 1 << 40, 'NAME': b'abc'}
+
+
+def test_changed_json_is_reloaded(custom_json):
+    schema = get_schema(custom_json)
+    with open(custom_json) as fp:
+        stdf_type = json.load(fp)
+    stdf_type['VND']['body'].append(['FLAG', 'U1'])
+    with open(custom_json, mode='w') as fp:
+        json.dump(stdf_type, fp)
+    os.utime(custom_json, ns=(0, os.stat(custom_json).st_mtime_ns + 10 ** 9))
+
+    assert get_schema(custom_json) is not schema
+    assert get_schema(custom_json).stdf_type['VND']['body'][-1] == ['FLAG', 'U1']
+
+
+def test_dict_and_schema_arguments():
+    stdf_type = Reader.load_stdf_type()
+    schema = get_schema(stdf_type)
+
+    assert get_schema(stdf_type) is schema
+    assert Reader(schema).SCHEMA is schema
+    assert Writer(stdf_type).SCHEMA is schema
+
+
+def test_dict_cache_follows_the_definition():
+    stdf_type = json.loads(json.dumps(Reader.load_stdf_type()))
+    schema = get_schema(stdf_type)
+
+    # an equal copy shares the compiled schema, a changed definition does not
+    assert get_schema(json.loads(json.dumps(stdf_type))) is schema
+    stdf_type['VND'] = {'rec_typ': 99, 'rec_sub': 99, 'body': [['FLAG', 'U1']]}
+    stdf_type['PIR']['body'].append(['EXTRA', 'U1'])
+    changed = get_schema(stdf_type)
+    assert changed is not schema
+    assert (99, 99) in changed.rec_name
+
+    # the first schema kept its own copy of the definition
+    assert 'VND' not in schema.stdf_type and 'VND' not in schema.plans['<']
+    assert schema.stdf_type['PIR']['body'] == [['HEAD_NUM', 'U1'], ['SITE_NUM', 'U1']]
+    assert get_schema(Reader.load_stdf_type()).stdf_type == schema.stdf_type
+    assert (99, 99) not in get_schema(Reader.load_stdf_type()).rec_name
+
+
+def test_pickle_round_trip():
+    schema = pickle.loads(pickle.dumps(get_schema()))
+    raw = struct.pack('<IBBBBfB3s', 3, 1, 2, 0, 0, 4.25, 3, b'abc')
+
+    from stdf.stdf_decoder import decode
+    for e in '<>':
+        assert schema.plans[e].keys() == get_schema().plans[e].keys()
+    assert decode(schema.plans['<']['PTR'], raw, '<') == decode(get_schema().plans['<']['PTR'], raw, '<')
+
+
+def test_cache_file(custom_json, tmp_path, monkeypatch):
+    cache_file = str(tmp_path / 'schema.pkl')
+    schema = Schema.load(custom_json, cache_file)
+    assert os.path.exists(cache_file)
+
+    def no_compiling(*args, **kwargs):
+        raise AssertionError('compiled instead of loading the cache')
+    with monkeypatch.context() as m:
+        m.setattr(Schema, 'from_json', no_compiling)
+        cached = Schema.load(custom_json, cache_file)
+    assert cached.rec_name == schema.rec_name
+    assert cached.plans['>']['VND'][0][1].format == '>Q'
+
+    # a stale or broken cache is rebuilt
+    os.utime(custom_json, ns=(0, os.stat(custom_json).st_mtime_ns + 10 ** 9))
+    assert Schema.load(custom_json, cache_file).source != schema.source
+    with open(cache_file, mode='wb') as fp:
+        fp.write(b'not a pickle')
+    assert Schema.load(custom_json, cache_file).rec_name == schema.rec_name
@@ -0,0 +1,147 @@
+"""The MIT License (MIT)
+Copyright (c) 2016 Cahyo Primawidodo
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE."""
+
+import pytest
+import struct
+import statistics
+from stdf.stdf_stats import Accumulator, StatsCollector, read_stats
+from tests.helpers import record, cn, far, ptr as make_ptr
+
+
+def ptr(test_num, site, result, test_flg=0, limits=None):
+    tail = cn(b'') + cn(b'') + struct.pack('<Bbbbff', 0x0E, 0, 0, 0, *limits) if limits else b''
+    return make_ptr(test_num, site, result, test_flg, tail)
+
+
+def tsr(test_num, head, site, exec_cnt, fail_cnt, t_min, t_max, sums, sqrs, test_typ=b'P'):
+    body = struct.pack('<BBcIIII', head, site, test_typ, test_num, exec_cnt, fail_cnt, 0) + bytes([0, 0, 0])
+    body += struct.pack('<Bfffff', 0x04 | 0x08, 0, t_min, t_max, sums, sqrs)
+    return record(body, 10, 30)
+
+
+def test_accumulator():
+    data = [1.0, 2.5, 3.0, 7.25, -1.0, 4.0]
+    acc = Accumulator()
+    for x in data:
+        acc.add(x)
+
+    assert acc.n == 6
+    assert acc.mean == pytest.approx(statistics.mean(data))
+    assert acc.stdev == pytest.approx(statistics.stdev(data))
+    assert (acc.min, acc.max) == (-1.0, 7.25)
+
+    left, right = Accumulator(), Accumulator()
+    for x in data[:2]:
+        left.add(x)
+    for x in data[2:]:
+        right.add(x)
+    left.merge(right)
+    assert left.mean == pytest.approx(acc.mean)
+    assert left.stdev == pytest.approx(acc.stdev)
+    assert left.sum_sq == pytest.approx(sum(x * x for x in data))
+
+
+def test_cpk_and_histogram():
+    acc = Accumulator(bins=4)
+    acc.set_limits(0.0, 4.0)
+    for x in (1.0, 2.0, 3.0, 2.0, 5.0):
+        acc.add(x)
+
+    sigma = statistics.stdev((1.0, 2.0, 3.0, 2.0, 5.0))
+    assert acc.cpk == pytest.approx(min(4.0 - 2.6, 2.6) / (3 * sigma))
+    assert acc.histogram.counts == [0, 1, 2, 1]
+    assert acc.histogram.over == 1
+
+
+def test_collector_flags():
+    stats = StatsCollector()
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'RESULT': 1.0})
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0x80, 'RESULT': 3.0})
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0x82, 'RESULT': 99.0})
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0x10, 'RESULT': 99.0})
+    stats.add('MPR', {'TEST_NUM': 2, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'RTN_RSLT': [1.0, 2.0]})
+
+    (s1, s2) = stats.summary()
+    assert (s1['executed'], s1['failed'], s1['count'], s1['mean']) == (3, 2, 2, 2.0)
+    assert s1['yield'] == pytest.approx(1 / 3)
+    assert (s2['executed'], s2['count'], s2['max']) == (1, 2, 2.0)
+
+
+@pytest.fixture()
+def stdf_file(tmp_path):
+    r = far()
+    r += ptr(10, 0, 1.0, limits=(0.5, 2.5)) + ptr(10, 1, 2.0) + ptr(10, 0, 1.5) + ptr(10, 1, 3.0, test_flg=0x80)
+    r += tsr(10, 1, 0, 2, 0, 1.0, 1.5, 2.5, 3.25)
+    r += tsr(10, 1, 1, 2, 0, 2.0, 3.0, 5.0, 13.0)
+    r += tsr(10, 255, 0, 4, 1, 1.0, 3.0, 7.5, 16.25)
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(r)
+    return str(f)
+
+
+def test_read_stats(stdf_file):
+    stats, mismatches = read_stats(stdf_file)
+
+    assert mismatches == [((10, 1, 1), 'FAIL_CNT', 0, 1)]
+    total = stats.totals()[10]
+    assert (total.executed, total.failed, total.n, total.mean) == (4, 1, 4, 1.875)
+    assert (total.lo_limit, total.hi_limit) == (0.5, 2.5)
+    assert stats.tests[10, 1, 1].lo_limit == 0.5
+
+
+def test_read_stats_skips_functional_tsr(tmp_path):
+    # FTRs are not collected, so their TSRs have nothing to be checked against
+    r = far() + ptr(10, 0, 1.0)
+    r += tsr(20, 255, 0, 4, 1, 0, 0, 0, 0, test_typ=b'F')
+    f = tmp_path / 'lot.stdf'
+    f.write_bytes(r)
+
+    stats, mismatches = read_stats(str(f))
+    assert mismatches == []
+    assert list(stats.tests) == [(10, 1, 0)]
+
+
+def test_read_stats_generated_lot(tmp_path):
+    from benchmarks.generate import generate_lot
+    f = str(tmp_path / 'lot.stdf')
+    generate_lot(f, parts=12, sites=4, ptr_tests=3, mpr_tests=2, ftr_tests=2)
+
+    stats, mismatches = read_stats(f)
+    assert mismatches == []
+
+
+def test_read_stats_totals_of_many_tests(tmp_path):
+    # every test has a HEAD_NUM 255 TSR; the totals are merged once, not per TSR
+    from benchmarks.generate import generate_lot
+    f = str(tmp_path / 'lot.stdf')
+    generate_lot(f, parts=8, sites=4, ptr_tests=1000)
+
+    stats, mismatches = read_stats(f)
+    assert mismatches == []
+    totals = stats.totals()
+    assert len(totals) == 1000
+    assert all(acc.executed == 8 for acc in totals.values())
+
+
+def test_totals_follow_added_records():
+    stats = StatsCollector()
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'RESULT': 1.0})
+    assert stats.totals()[1].n == 1
+    stats.add('PTR', {'TEST_NUM': 1, 'HEAD_NUM': 1, 'SITE_NUM': 1, 'TEST_FLG': 0, 'RESULT': 3.0})
+    assert (stats.totals()[1].n, stats.totals()[1].mean) == (2, 2.0)
+    stats.merge(StatsCollector().add_records([('PTR', {'TEST_NUM': 2, 'HEAD_NUM': 1, 'SITE_NUM': 0})]))
+    assert sorted(stats.totals()) == [1, 2]
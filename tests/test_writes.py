@@ -17,11 +17,16 @@ THE SOFTWARE."""
 
 import pytest
 import struct
-from stdf.stdf_writer import Writer
+import io
+from os import path
+from stdf.stdf_writer import Writer, RecordSink
+
+TEST_JSON = path.join(path.dirname(__file__), 'stdf_test.json')
+
 
 @pytest.fixture()
 def w():
-    return Writer('/Users/cahyo/Dropbox/programming/python/STDFReader/tests/stdf_test.json')
+    return Writer(TEST_JSON)
 
 
 def test_write_unsigned(w):
@@ -34,7 +39,7 @@ def test_write_unsigned(w):
     r = w.pack_record('T1U', data)
     u = struct.unpack('<HBBBHI', r)
 
-    assert u == (8, 0x0B, 0x01, 0x81, 0x8001, 0x80000001)
+    assert u == (7, 0x0B, 0x01, 0x81, 0x8001, 0x80000001)
 
 
 def test_write_signed(w):
@@ -47,7 +52,7 @@ def test_write_signed(w):
     r = w.pack_record('T1I', data)
     u = struct.unpack('<HBBbhi', r)
 
-    assert u == (8, 0x0B, 0x02, -0x80, -0x8000, -0x80000000)
+    assert u == (7, 0x0B, 0x02, -0x80, -0x8000, -0x80000000)
 
 
 def test_write_float(w):
@@ -113,7 +118,7 @@ def test_write_arrays(w):
 
     r = w.pack_record('TA1', data)
     u = struct.unpack('<HBBBBBBHHHbbbhhhfffddd', r)
-    assert u[:3] == (60, 0x0B, 7)
+    assert u[:3] == (55, 0x0B, 7)
     assert u[3] == 3
     assert u[4:7] == (0x81, 0x81, 0x81)
     assert u[7:10] == (0x8001, 0x8001, 0x8001)
@@ -141,3 +146,210 @@ def test_write_longer_arrays(w):
     assert u[12:14] == (1, 1)
     assert u[14:17] == (2, 2, 3)
     assert u[17:] == (7, 4, 5, 6, 7, 8, 9, 10)
+
+
+@pytest.fixture()
+def w4():
+    return Writer(path.join(path.dirname(__file__), '..', 'stdf', 'stdf_v4.json'))
+
+
+def read_back(data):
+    from stdf.stdf_reader import Reader
+    rd = Reader()
+    rd.STDF_IO = io.BytesIO(data)
+    return list(rd)
+
+
+def test_pack_records_fixed(w4):
+    r = w4.pack_records('PIR', {'HEAD_NUM': 1, 'SITE_NUM': [0, 1, 2]})
+
+    assert r == b''.join(w4.pack_record('PIR', {'HEAD_NUM': 1, 'SITE_NUM': site}) for site in range(3))
+    assert [body for _, _, body in read_back(r)] == [{'HEAD_NUM': 1, 'SITE_NUM': site} for site in range(3)]
+
+
+def test_pack_records_ptr(w4):
+    columns = {
+        'TEST_NUM': [100, 101, 102],
+        'HEAD_NUM': 1,
+        'SITE_NUM': [0, 1, 0],
+        'TEST_FLG': 0,
+        'PARM_FLG': 0,
+        'RESULT': [0.5, 1.5, 2.5],
+        'TEST_TXT': ['vdd', 'idd', ''],
+    }
+    r = w4.pack_records('PTR', columns)
+    records = read_back(w4.pack_FAR() + r)
+
+    assert [rec_name for rec_name, _, _ in records] == ['FAR', 'PTR', 'PTR', 'PTR']
+    assert records[1][0:2] == ('PTR', (16, 15, 10))
+    assert [body['RESULT'] for _, _, body in records[1:]] == [0.5, 1.5, 2.5]
+    assert [body['TEST_TXT'] for _, _, body in records[1:]] == [b'vdd', b'idd', 0]
+    assert all('ALARM_ID' not in body for _, _, body in records[1:])
+
+
+def test_pack_records_big_endian_arrays(w4):
+    w4.e = '>'
+    columns = {
+        'TEST_NUM': [7, 8], 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'PARM_FLG': 0,
+        'RTN_ICNT': [3, 1], 'RSLT_CNT': [2, 0],
+        'RTN_STAT': [[1, 2, 3], [4]], 'RTN_RSLT': [[1.5, 2.5], []],
+    }
+    records = read_back(w4.pack_FAR() + w4.pack_records('MPR', columns))
+
+    assert records[1][2]['RTN_STAT'] == [1, 2, 3]
+    assert records[1][2]['RTN_RSLT'] == [1.5, 2.5]
+    assert records[2][2]['RTN_STAT'] == [4]
+    assert records[2][2].get('RTN_RSLT', []) == []
+
+
+def test_pack_records_numpy(w4):
+    np = pytest.importorskip('numpy')
+    n = 1000
+    columns = {'TEST_NUM': np.arange(n, dtype=np.uint32), 'HEAD_NUM': 1, 'SITE_NUM': np.arange(n) % 4,
+               'TEST_FLG': 0, 'PARM_FLG': 0, 'RESULT': np.linspace(0, 1, n, dtype=np.float32)}
+    r = w4.pack_records('PTR', columns)
+
+    assert len(r) == n * (4 + 12)
+    records = read_back(r)
+    assert records[999][2] == {'TEST_NUM': 999, 'HEAD_NUM': 1, 'SITE_NUM': 3, 'TEST_FLG': 0, 'PARM_FLG': 0,
+                               'RESULT': 1.0}
+
+
+@pytest.mark.parametrize('columns', [
+    {'HEAD_NUM': [1, 300], 'SITE_NUM': 0},
+    {'HEAD_NUM': 1, 'SITE_NUM': [0, -1]},
+    {'HEAD_NUM': [1.0, 1.5], 'SITE_NUM': 0},
+])
+def test_pack_records_out_of_range(w4, columns):
+    # numpy would wrap or cut these, so they go to struct, which raises with or without numpy
+    with pytest.raises(struct.error):
+        w4.pack_records('PIR', columns)
+
+
+def test_pack_records_numpy_out_of_range(w4):
+    np = pytest.importorskip('numpy')
+    with pytest.raises(struct.error):
+        w4.pack_records('PIR', {'HEAD_NUM': np.array([1, 256], dtype=np.uint16), 'SITE_NUM': 0})
+
+    columns = {'TEST_NUM': [1, 2], 'HEAD_NUM': 1, 'SITE_NUM': 0, 'TEST_FLG': 0, 'PARM_FLG': 0,
+               'RESULT': np.array([1.0, 1e300])}
+    with pytest.raises(OverflowError):
+        w4.pack_records('PTR', columns)
+    columns['RESULT'] = np.array([np.inf, 0.5])
+    assert [r[2]['RESULT'] for r in read_back(w4.pack_records('PTR', columns))] == [np.inf, 0.5]
+
+
+def test_pack_records_missing_field(w4):
+    with pytest.raises(ValueError):
+        w4.pack_records('PTR', {'TEST_NUM': [1], 'RESULT': [1.0]})
+
+    with pytest.raises(ValueError):
+        w4.pack_records('PTR', {'TEST_NUM': [1, 2], 'HEAD_NUM': [1]})
+
+
+def ftr_body(**fields):
+    body = dict(TEST_NUM=1, HEAD_NUM=1, SITE_NUM=0, TEST_FLG=0, OPT_FLAG=0xff, CYCL_CNT=0, REL_VADR=0, REPT_CNT=0,
+                NUM_FAIL=0, XFAIL_AD=0, YFAIL_AD=0, VECT_OFF=0, RTN_ICNT=0, PGM_ICNT=0, RTN_INDX=[], RTN_STAT=[],
+                PGM_INDX=[], PGM_STAT=[], FAIL_PIN=(b'\xab\xcd', 16), VECT_NAM='v', TIME_SET='t', OP_CODE='',
+                TEST_TXT='x', ALARM_ID='', PROG_TXT='', RSLT_TXT='', PATG_NUM=255, SPIN_MAP=(0x12, 0x34, 0x56))
+    body.update(fields)
+    return body
+
+
+def test_pack_decoded_multi_byte_dn(w4):
+    data = w4.pack_FAR() + w4.pack_record('FTR', ftr_body())
+    ftr = read_back(data)[1][2]
+    assert ftr['FAIL_PIN'] == (0xab, 0xcd)
+
+    # the decoder returns a Dn of 2 or more bytes as a tuple of byte values
+    assert w4.pack_FAR() + w4.pack_record('FTR', ftr) == data
+    assert w4.pack_FAR() + w4.pack_records('FTR', {field: [value] for field, value in ftr.items()}) == data
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, b):
+        self.writes += 1
+        return super().write(b)
+
+
+def test_sink_writes_far_first(w4):
+    fp = CountingStream()
+    with RecordSink(fp, w4, buffer_size=64) as sink:
+        sink.write('PIR', {'HEAD_NUM': 1, 'SITE_NUM': 0})
+        sink.write_records(('PTR', {'TEST_NUM': i, 'HEAD_NUM': 1, 'SITE_NUM': 0}) for i in range(20))
+        sink.write_columns('PRR', {'HEAD_NUM': 1, 'SITE_NUM': [0], 'PART_FLG': 0})
+
+    records = read_back(fp.getvalue())
+    assert [rec_name for rec_name, _, _ in records] == ['FAR', 'PIR'] + ['PTR'] * 20 + ['PRR']
+    assert records[0][2] == {'CPU_TYPE': 2, 'STDF_VER': 4}
+    assert sink.records == len(records)
+    assert sink.bytes == len(fp.getvalue())
+    assert 1 < fp.writes < len(records)
+
+
+def test_sink_rewrites_reader_output(w4, tmp_path):
+    from stdf.stdf_reader import Reader
+    w4.e = '>'
+    data = w4.pack_FAR() + w4.pack_record('PIR', {'HEAD_NUM': 1, 'SITE_NUM': 3})
+    data += w4.pack_record('PTR', {'TEST_NUM': 5, 'HEAD_NUM': 1, 'SITE_NUM': 3, 'TEST_FLG': 0, 'PARM_FLG': 0,
+                                   'RESULT': 0.25, 'TEST_TXT': 't5'})
+
+    rd = Reader()
+    rd.STDF_IO = io.BytesIO(data)
+    expected = list(rd)
+    assert expected[0][2]['CPU_TYPE'] == 1
+
+    rd.STDF_IO = io.BytesIO(data)
+    f = tmp_path / 'out.stdf'
+    with RecordSink(str(f)) as sink:
+        sink.write_records(rd)
+
+    records = read_back(f.read_bytes())
+    assert records[0][2]['CPU_TYPE'] == 2
+    assert [body for _, _, body in records[1:]] == [body for _, _, body in expected[1:]]
+
+
+def test_sink_rewrites_reader_output_byte_for_byte(w4, tmp_path):
+    from stdf.stdf_reader import Reader
+    data = w4.pack_FAR() + w4.pack_record('PIR', {'HEAD_NUM': 1, 'SITE_NUM': 0})
+    data += w4.pack_record('FTR', ftr_body())
+    data += w4.pack_record('FTR', ftr_body(FAIL_PIN=(b'\x01\x02\x03', 24), SPIN_MAP=(0x80, 0x01)))
+    data += w4.pack_record('PRR', {'HEAD_NUM': 1, 'SITE_NUM': 0, 'PART_FLG': 0, 'NUM_TEST': 2, 'HARD_BIN': 1,
+                                   'SOFT_BIN': 1, 'X_COORD': 0, 'Y_COORD': 0, 'TEST_T': 0, 'PART_ID': '1',
+                                   'PART_TXT': '', 'PART_FIX': (0xde, 0xad, 0xbe, 0xef)})
+    src = tmp_path / 'in.stdf'
+    src.write_bytes(data)
+
+    rd = Reader()
+    rd.load_stdf_file(str(src))
+    f = tmp_path / 'out.stdf'
+    with RecordSink(str(f)) as sink:
+        sink.write_records(rd)
+
+    assert f.read_bytes() == data
+
+
+def test_sink_writes_zero_bn_dn_empty(w4, tmp_path):
+    from stdf.stdf_reader import Reader
+    zero = w4.pack_record('FTR', ftr_body(FAIL_PIN=(b'\x00', 8), SPIN_MAP=b'\x00'))
+    empty = w4.pack_record('FTR', ftr_body(FAIL_PIN=0, SPIN_MAP=0))
+    src = tmp_path / 'in.stdf'
+    src.write_bytes(w4.pack_FAR() + zero)
+
+    rd = Reader()
+    rd.load_stdf_file(str(src))
+    f = tmp_path / 'out.stdf'
+    with RecordSink(str(f)) as sink:
+        sink.write_records(rd)
+
+    # a single zero byte decodes to 0, like an empty field, and is written back empty
+    assert len(zero) - len(empty) == 2
+    assert f.read_bytes() == w4.pack_FAR() + empty
+    (_, _, before), = read_back(w4.pack_FAR() + zero)[1:]
+    (_, _, after), = read_back(f.read_bytes())[1:]
+    assert before == after
+    assert (after['FAIL_PIN'], after['SPIN_MAP']) == (0, 0)